@@ -7,15 +7,20 @@ This script:
 - Stores embeddings in Milvus
 
 Usage:
-    python ingest_docs.py
+    python src/cron/ingest.py [--workers N]
 """
 
 import os
+import sys
 import argparse
 from dotenv import load_dotenv
 
+# test_pipeline imports its sibling modules flat (as pipeline_.py runs them),
+# so src/mvp_rag itself has to be on the path, wherever this is started from
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mvp_rag"))
+
 # Import your pipeline runner
-from mvp_rag.test_pipeline import run_parallel_indexing
+from test_pipeline import run_parallel_indexing
 
 def main():
     load_dotenv()
@@ -28,10 +33,34 @@ def main():
         help="Override number of parallel workers"
     )
 
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Override torch/OpenMP threads per worker"
+    )
+    parser.add_argument(
+        "--pin",
+        action="store_true",
+        help="Pin each worker to its own CPUs"
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Pick workers/threads from a short timed run"
+    )
+
     args = parser.parse_args()
 
+    # read by cpu_plan.resolve_plan when the run starts
     if args.workers:
         os.environ["MAX_WORKERS_OVERRIDE"] = str(args.workers)
+    if args.threads:
+        os.environ["WORKER_THREADS"] = str(args.threads)
+    if args.pin:
+        os.environ["CPU_PIN"] = "true"
+    if args.calibrate:
+        os.environ["CPU_CALIBRATE"] = "true"
 
     print("🚀 Starting RAG ingestion pipeline")
     run_parallel_indexing()
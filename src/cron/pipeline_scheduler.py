@@ -2,21 +2,34 @@ from __future__ import annotations
 
 import os
 import json
+import multiprocessing
 import boto3
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
 from src.mvp_rag.test_text_extraction_ import PDFProcessor
-from src.mvp_rag.chunker import chunk_text
-from src.mvp_rag.embedding_ import milvus_store
+from src.mvp_rag.chunker import chunk_records, estimate_tokens, split_pages
+from src.mvp_rag.embedding_ import embed_chunks, milvus_insert, delete_source
 from src.mvp_rag.metadata_ import extract_metadata
+from src.mvp_rag.workers import RecyclingPool, init_worker, get_processor, drain, startup_summary
+from src.mvp_rag.cpu_plan import describe, resolve_plan
+from src.mvp_rag.ingest_engine import IngestEngine, Stage
+from src.mvp_rag.manifest import SourceManifest
+from src.mvp_rag.s3_listing import S3Listing, list_pdfs, s3_item
+from src.mvp_rag.checkpoint import (
+    process_checkpoint, resume_extract, embed_batches, load_saved, save_progress, clear_checkpoint, is_extracted
+)
+from src.mvp_rag.s3_download import default_budget, spool_object
+from src.mvp_rag.dedup import dedupe_document, describe_dedup, register_document
+from src.mvp_rag.boilerplate import boilerplate_filter, describe_boilerplate
 
 # --------------------------------------------------
 # ENV
 # --------------------------------------------------
 load_dotenv()
 
-STATE_FILE = "/app/state/processed_files.json"
+STATE_FILE = "/app/state/processed_files.json"  # legacy, migrated into the manifest
+MANIFEST_FILE = os.getenv("CRON_MANIFEST", "/app/state/ingest_manifest.sqlite")
 COLLECTION_NAME = os.getenv("MILVUS_COLLECTION1", "vlsi")
 
 S3_BUCKET = os.getenv("S3_BUCKET")
@@ -27,20 +40,30 @@ YOLO_MODEL_PATH = os.getenv("YOLO")
 
 MAX_WORKERS = int(os.getenv("CRON_WORKERS", "3"))
 
+# I/O-bound stages run in threads of the main process
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "2"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", "1"))
+
 # --------------------------------------------------
 # State helpers
 # --------------------------------------------------
-def load_state() -> set:
-    if not os.path.exists(STATE_FILE):
-        return set()
+def migrate_state(manifest: SourceManifest, s3):
+    """
+    Seed an empty manifest from the legacy processed_files.json, taking the
+    current ETags as the ingested ones, so keys processed before the
+    manifest existed are not ingested twice.
+    """
+    if not os.path.exists(STATE_FILE) or manifest.all():
+        return
     with open(STATE_FILE, "r") as f:
-        return set(json.load(f))
-
+        processed = set(json.load(f))
 
-def save_state(processed: set):
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-    with open(STATE_FILE, "w") as f:
-        json.dump(sorted(processed), f, indent=2)
+    for item in map(s3_item, list_pdfs(s3, S3_BUCKET)):
+        if item["key"] in processed:
+            manifest.record(item["key"], item["content_hash"], item["size"], item["mtime"], COLLECTION_NAME)
+    os.rename(STATE_FILE, STATE_FILE + ".migrated")
+    print(f"🗂 Migrated {len(processed)} keys from {STATE_FILE}")
 
 # --------------------------------------------------
 # S3 client
@@ -53,84 +76,196 @@ def get_s3():
     )
 
 # --------------------------------------------------
-# Worker (single PDF)
+# Extraction (worker processes)
 # --------------------------------------------------
-def process_one_pdf(key: str, s3, processor) -> str | None:
-    try:
-        print(f"[NEW] {key}")
-
-        obj = s3.get_object(Bucket=S3_BUCKET, Key=key)
-        pdf_bytes = obj["Body"].read()
-
-        raw_text = processor.process_pdf(pdf_bytes)
-        if not raw_text.strip():
-            print(f"[SKIP] Empty PDF → {key}")
-            return key
-
-        metadata = extract_metadata(raw_text)
-        chunks = chunk_text(raw_text)
-
-        if not chunks:
-            print(f"[SKIP] No chunks → {key}")
-            return key
-
-        milvus_store(
-            collection_name=COLLECTION_NAME,
-            chunks=chunks,
-            domain=metadata["domain"],
-            stage=metadata["stage"],
-            type_=metadata["type"],
-            version=metadata["version"],
-            vendor=metadata["vendor"],
-            source=key,
-        )
+def make_processor():
+    # built once per worker process by init_worker, then reused
+    return PDFProcessor(YOLO_MODEL_PATH)
+
 
-        print(f"[DONE] {key}")
-        return key
+def extract_key(key: str, content_hash: str, pdf_path: str = None) -> str:
+    print(f"[NEW] {key}")
 
-    except Exception as e:
-        print(f"[ERROR] {key} → {e}")
-        return None
+    def pages(page_range):
+        # opened from the spooled file; pages are read from disk as needed
+        return get_processor(make_processor).iter_pages(pdf_path, page_range)
+
+    # pages already checkpointed by an earlier, interrupted run are not redone
+    return resume_extract(process_checkpoint(), key, content_hash, pages)
 
 # --------------------------------------------------
-# Main cron task
+# Stages (items are s3_item() dicts claimed in the manifest)
 # --------------------------------------------------
-def run():
-    print("⏱ Cron ingestion started")
+def extract_stage(executor, manifest, s3, budget, item: dict):
+    manifest.start(item["key"])
+    if is_extracted(item):
+        # every page is checkpointed; nothing to download
+        item["raw_text"] = executor.submit(extract_key, item["key"], item["content_hash"]).result()
+        return item
 
-    processed = load_state()
-    s3 = get_s3()
+    # streamed to local disk, then opened by the worker; the budget caps the
+    # bytes downloaded or being extracted across the extract threads
+    with spool_object(s3, S3_BUCKET, item["key"], item["size"], budget) as path:
+        item["raw_text"] = executor.submit(extract_key, item["key"], item["content_hash"], path).result()
+    return item
 
-    response = s3.list_objects_v2(Bucket=S3_BUCKET)
-    objects = response.get("Contents", [])
 
-    new_keys = [
-        obj["Key"]
-        for obj in objects
-        if obj["Key"].lower().endswith(".pdf")
-        and obj["Key"] not in processed
-    ]
+def retire_previous(item: dict):
+    # replace-by-source: a changed key's old chunks go right before the new ones land
+    previous = item.get("previous")
+    if previous and previous["collection"]:
+        delete_source(previous["collection"], item["key"])
+
+
+def skip_item(manifest, item: dict, status: str) -> str:
+    # nothing to index, but remember the ETag so the key is not retried
+    retire_previous(item)
+    manifest.record(item["key"], item["content_hash"], item["size"], item["mtime"])
+    clear_checkpoint(item["key"])
+    return status
+
+
+def metadata_stage(manifest, item: dict):
+    if not item["raw_text"].strip():
+        return skip_item(manifest, item, f"[SKIP] Empty PDF → {item['key']}")
+
+    item["metadata"] = load_saved(item)["metadata"]
+    if item["metadata"] is None:
+        item["metadata"] = extract_metadata(item["raw_text"])
+        save_progress(item, metadata=item["metadata"])
+    return item
+
+
+def chunk_stage(manifest, item: dict):
+    raw_text = item.pop("raw_text")
+    # reuse the checkpointed chunks so their embedded batches still line up;
+    # ones saved as plain strings (no page span) are chunked again
+    item["chunks"] = load_saved(item)["chunks"]
+    if item["chunks"] is None or any(isinstance(c, str) for c in item["chunks"]):
+        # the page records go through the boilerplate filter (repeated page
+        # headers / footers) into the chunker without being joined back
+        # into one text; CHUNK_MODE picks the strategy, see chunker
+        records = split_pages(raw_text)
+        boilerplate = boilerplate_filter()
+        if boilerplate is not None:
+            records = boilerplate.filter(records)
+        # {"text", "page_start", "page_end", "tokens"} records, kept
+        # through embed and store
+        item["chunks"] = list(chunk_records(records))
+        if boilerplate is not None:
+            print(describe_boilerplate(boilerplate.report(item["file_name"])))
+        save_progress(item, chunks=item["chunks"])
+    if not item["chunks"]:
+        return skip_item(manifest, item, f"[SKIP] No chunks → {item['key']}")
+    return item
 
-    if not new_keys:
-        print("✅ No new PDFs found")
-        return
 
-    print(f"📄 Found {len(new_keys)} new PDFs")
+def dedup_stage(item: dict):
+    # repeats of this key's own chunks or of another key's stored chunks
+    # are not embedded; the key is recorded on the stored chunk
+    counts = dedupe_document(item, COLLECTION_NAME)
+    print(describe_dedup(item["key"], counts))
+    return item
 
-    processor = PDFProcessor(YOLO_MODEL_PATH)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(process_one_pdf, key, s3, processor): key
-            for key in new_keys
-        }
+def embed_stage(item: dict):
+    # token counts pack each embedding request up to EMBED_BATCH_TOKENS;
+    # counted here unless the chunker already did (CHUNK_MODE=tokens)
+    texts = [c["text"] for c in item["chunks"]]
+    tokens = [c["tokens"] for c in item["chunks"]]
+    if None in tokens:
+        tokens = estimate_tokens(texts)
+    item["embeddings"] = embed_batches(
+        process_checkpoint(), item["key"], item["content_hash"], texts, embed_chunks,
+        token_counts=tokens,
+    )
+    return item
+
+
+def store_stage(manifest, item: dict):
+    metadata = item["metadata"]
+
+    # the key's only insert, after every page, chunk and batch is done
+    retire_previous(item)
+    ids = milvus_insert(
+        collection_name=COLLECTION_NAME,
+        chunks=item["chunks"],
+        embeddings=item["embeddings"],
+        domain=metadata["domain"],
+        stage=metadata["stage"],
+        type_=metadata["type"],
+        version=metadata["version"],
+        vendor=metadata["vendor"],
+        source=item["key"],
+        tool=metadata.get("Tool", "unknown").replace(" ","_"),
+    )
+    register_document(item, COLLECTION_NAME, ids)
+    manifest.record(
+        item["key"], item["content_hash"], item["size"], item["mtime"],
+        COLLECTION_NAME, len(item["chunks"])
+    )
+    clear_checkpoint(item["key"])
+    return item
+
+# --------------------------------------------------
+# Main cron task
+# --------------------------------------------------
+def run():
+    print("⏱ Cron ingestion started")
+
+    manifest = SourceManifest(MANIFEST_FILE)
+    s3 = get_s3()
+    migrate_state(manifest, s3)
+
+    # workers x threads within the CPUs; MAX_WORKERS_OVERRIDE / WORKER_THREADS / CPU_PIN
+    cpu = resolve_plan(MAX_WORKERS)
+    print(describe(cpu))
+
+    metrics = multiprocessing.Queue()
+    # worker processes (not threads) so a bloated worker can be replaced
+    # between PDFs; see WORKER_MAX_TASKS / _PAGES / _RSS_MB
+    with RecyclingPool(
+        max_workers=cpu["workers"],
+        initializer=init_worker,
+        initargs=(make_processor, metrics),
+        threads=cpu["threads"],
+        cpu_sets=cpu["cpu_sets"],
+    ) as executor:
+        # keys are claimed page by page as the bucket is listed, so the
+        # first changes are extracting while the listing is still going;
+        # a key that fails any stage is retried on a later run (backoff)
+        listing = S3Listing(s3, S3_BUCKET, manifest)
+        budget = default_budget()
+        engine = IngestEngine(
+            [
+                Stage("extract", partial(extract_stage, executor, manifest, s3, budget), cpu["workers"]),
+                Stage("metadata", partial(metadata_stage, manifest), METADATA_CONCURRENCY),
+                Stage("chunk", partial(chunk_stage, manifest)),
+                Stage("dedup", dedup_stage),
+                Stage("embed", embed_stage, EMBED_CONCURRENCY),
+                Stage("store", partial(store_stage, manifest), STORE_CONCURRENCY),
+            ],
+            on_error=lambda item, stage, e: manifest.fail(item["key"], f"{stage}: {e}"),
+        )
+        for result in engine.run(listing):
+            print(result)
 
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                processed.add(result)
+    # deleted keys are purged only after a complete listing
+    for row in listing.removed():
+        if row["collection"]:
+            delete_source(row["collection"], row["source"])
+        manifest.remove(row["source"])
+        clear_checkpoint(row["source"])
+        print(f"[PURGED] {row['source']}")
 
-    save_state(processed)
+    print(listing.summary())
+    print(budget.summary())
+    print(f"🗂 Manifest: {manifest.status_counts()}")
+    manifest.close()
+    print(engine.summary())
+    print(startup_summary(drain(metrics)))
+    print(executor.memory_summary())
+    print(executor.page_summary())
     print("✅ Cron ingestion finished")
 
 # --------------------------------------------------
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import sys
 import time
 import numpy as np
 import streamlit as st
@@ -8,6 +9,11 @@ from dotenv import load_dotenv
 from pymilvus import connections, Collection
 from pymilvus.exceptions import MilvusException
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+
+# the chunk index the ingest pipeline keeps next to the collection
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mvp_rag"))
+from dedup import hit_sources
+
 load_dotenv()
 
 COLLECTION_NAME = "ds"
@@ -132,7 +138,7 @@ def answer_from_milvus(query, top_k=TOP_K):
                 anns_field="embedding",
                 param={"metric_type": "IP", "params": {"nprobe": 8}},
                 limit=top_k,
-                output_fields=["text"],
+                output_fields=["text", "source"],
             )
             break
         except MilvusException:
@@ -156,7 +162,13 @@ def answer_from_milvus(query, top_k=TOP_K):
     response = llm.invoke(prompt)
     answer = response.content.strip()
 
-    return answer if answer else "Context insufficient"
+    if not answer or answer == "Context insufficient":
+        return "Context insufficient"
+
+    # a deduplicated chunk stands for every source that contained it
+    sources = hit_sources(COLLECTION_NAME, results[0])
+    cited = sorted({s for hit in results[0] for s in sources.get(hit.id, [])})
+    return f"{answer}\n\n**Sources:** {', '.join(cited)}" if cited else answer
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
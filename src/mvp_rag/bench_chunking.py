@@ -0,0 +1,124 @@
+"""
+Chunking memory and throughput: chunk_text vs the streaming chunk_pages.
+
+"chunk_text" reproduces the pipeline before streaming: every page is
+extracted, joined into one process_pdf-style string and split at once.
+"chunk_pages" feeds page records straight from the page source into
+chunk_pages and consumes chunks as they come out. Both read page text with
+PyMuPDF (no layout model), each in a fresh process. Peak memory is reported
+as the traced Python heap (tracemalloc) and the process peak RSS.
+
+A second table times the chunkers alone on already-extracted text.
+chunk_pages is the slower of the two there, packing line by line in
+Python: about 35 vs 28, 28 vs 18 and 33 vs 28 MB/s on the three largest
+manuals in docs/. What it buys is the heap, not speed.
+
+Usage:
+    python src/mvp_rag/bench_chunking.py [--docs 3] [--size 1000] [--overlap 200]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import time
+import tracemalloc
+
+from checkpoint import join_pages
+from chunker import chunk_pages, chunk_text, split_pages
+from document_loader import loading_docs
+from page_source import PyMuPDFPageSource
+
+
+def _records(source):
+    for i in range(source.page_count):
+        yield {"page_num": i + 1, "text": source.text(i)}
+
+
+def _chunk_text(file_path, size, overlap):
+    with PyMuPDFPageSource(file_path) as source:
+        raw_text = join_pages(list(_records(source)))
+        chunks = chunk_text(raw_text, size, overlap)
+        return source.page_count, len(chunks), sum(map(len, chunks))
+
+
+def _chunk_pages(file_path, size, overlap):
+    n = chars = 0
+    with PyMuPDFPageSource(file_path) as source:
+        for chunk in chunk_pages(_records(source), size, overlap):
+            n += 1
+            chars += len(chunk["text"])
+        return source.page_count, n, chars
+
+
+MODES = {"chunk_text": _chunk_text, "chunk_pages": _chunk_pages}
+
+
+def _run_mode(mode, file_path, size, overlap, out):
+    tracemalloc.start()
+    start = time.perf_counter()
+    pages, n, chars = MODES[mode](file_path, size, overlap)
+    elapsed = time.perf_counter() - start
+    traced_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    out.put((pages, n, chars, elapsed, traced_mb, peak_mb))
+
+
+def bench(file_path, size, overlap):
+    ctx = mp.get_context("spawn")
+    results = {}
+    for mode in MODES:
+        q = ctx.Queue()
+        p = ctx.Process(target=_run_mode, args=(mode, file_path, size, overlap, q))
+        p.start()
+        results[mode] = q.get()
+        p.join()
+    return results
+
+
+def chunker_only(file_path, size, overlap):
+    """Seconds for each chunker over the same extracted text."""
+    with PyMuPDFPageSource(file_path) as source:
+        raw_text = join_pages(list(_records(source)))
+
+    start = time.perf_counter()
+    chunk_text(raw_text, size, overlap)
+    text_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in chunk_pages(split_pages(raw_text), size, overlap):
+        pass
+    pages_s = time.perf_counter() - start
+    return len(raw_text), text_s, pages_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk_text vs streaming chunk_pages")
+    parser.add_argument("--docs", type=int, default=3, help="Largest N PDFs in docs/")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    docs = sorted(loading_docs(), key=lambda d: os.path.getsize(d["file_path"]), reverse=True)[:args.docs]
+
+    print(f"{'document':40} {'mode':12} {'pages':>5} {'chunks':>6} {'avg len':>7} "
+          f"{'pages/s':>8} {'heap MB':>8} {'RSS MB':>7}")
+    for doc in docs:
+        for mode, (pages, n, chars, elapsed, traced_mb, peak_mb) in bench(doc["file_path"], args.size, args.overlap).items():
+            rate = pages / elapsed if elapsed else 0.0
+            avg = chars / n if n else 0.0
+            print(f"{doc['file_name'][:40]:40} {mode:12} {pages:5d} {n:6d} {avg:7.0f} "
+                  f"{rate:8.1f} {traced_mb:8.1f} {peak_mb:7.1f}")
+
+    print()
+    print(f"{'document':40} {'MB text':>7} {'chunk_text MB/s':>16} {'chunk_pages MB/s':>17}")
+    for doc in docs:
+        chars, text_s, pages_s = chunker_only(doc["file_path"], args.size, args.overlap)
+        mb = chars / 1024 / 1024
+        print(f"{doc['file_name'][:40]:40} {mb:7.1f} {mb / text_s:16.1f} {mb / pages_s:17.1f}")
+
+
+if __name__ == "__main__":
+    main()
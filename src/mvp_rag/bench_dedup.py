@@ -0,0 +1,72 @@
+"""
+What chunk deduplication saves on the raw_data_*.pdf.txt dumps.
+
+Every file is chunked (CHUNK_MODE) and run through dedupe_document in turn
+against one throwaway index, as if they were ingested into one collection
+in that order; stored chunks get made-up Milvus ids. Reports the chunks and
+characters each document would no longer embed, within the document and
+against the documents before it.
+
+Usage:
+    python src/mvp_rag/bench_dedup.py [--threshold 0.9] [files ...]
+"""
+
+import argparse
+import glob
+import itertools
+import os
+import tempfile
+import time
+
+import dedup
+from chunker import chunk_document
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunks dropped by exact + MinHash/LSH dedup")
+    parser.add_argument("--threshold", type=float, default=dedup.DEDUP_THRESHOLD)
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = args.files or sorted(glob.glob(os.path.join(here, "raw_data_*.pdf.txt")))
+    dedup.DEDUP_THRESHOLD = args.threshold
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dedup.DEDUP_ENABLED = True
+        dedup._index = dedup.ChunkIndex(os.path.join(tmp, "chunk_index.sqlite"))
+        ids = itertools.count(1)
+        totals = {"chunks": 0, "kept": 0, "chars": 0, "kept_chars": 0}
+
+        print(f"{'document':36} {'chunks':>6} {'exact':>5} {'near':>5} {'stored':>6} "
+              f"{'kept':>5} {'chars saved':>11} {'s':>5}")
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                chunks = chunk_document(f.read())
+            doc = {"file_name": os.path.basename(path), "chunks": chunks}
+
+            start = time.perf_counter()
+            counts = dedup.dedupe_document(doc, "bench")
+            elapsed = time.perf_counter() - start
+            dedup.register_document(doc, "bench", [next(ids) for _ in doc["chunks"]])
+
+            chars = sum(len(c["text"]) for c in chunks)
+            kept_chars = sum(len(c["text"]) for c in doc["chunks"])
+            totals["chunks"] += len(chunks)
+            totals["kept"] += len(doc["chunks"])
+            totals["chars"] += chars
+            totals["kept_chars"] += kept_chars
+
+            name = doc["file_name"][len("raw_data_"):-len(".pdf.txt")]
+            print(f"{name[:36]:36} {len(chunks):6d} {counts['exact']:5d} {counts['near']:5d} "
+                  f"{counts['stored']:6d} {len(doc['chunks']):5d} {chars - kept_chars:11d} {elapsed:5.2f}")
+
+        dedup._index.close()
+
+    saved = totals["chunks"] - totals["kept"]
+    print(f"🧹 {saved}/{totals['chunks']} chunks not embedded "
+          f"({100.0 * (totals['chars'] - totals['kept_chars']) / max(1, totals['chars']):.1f}% of the text)")
+
+
+if __name__ == "__main__":
+    main()
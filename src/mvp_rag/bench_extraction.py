@@ -0,0 +1,91 @@
+"""
+Text extraction throughput: pypdf + PyMuPDF dual open vs single PyMuPDF source.
+
+"dual_open" reproduces the old process_pdf setup (PdfReader for text, a
+second fitz handle for rendering). "single_source" is PyMuPDFPageSource.
+Each mode runs in a fresh process so peak RSS is not shared between them.
+
+Usage:
+    python src/mvp_rag/bench_extraction.py [--pages 0]
+"""
+
+import argparse
+import multiprocessing as mp
+import resource
+import time
+
+import fitz
+from pypdf import PdfReader
+
+from document_loader import loading_docs
+from page_source import PyMuPDFPageSource
+
+
+def _dual_open(pdf_bytes, max_pages):
+    import io
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    n = min(len(reader.pages), max_pages) if max_pages else len(reader.pages)
+    chars = sum(len(reader.pages[i].extract_text() or "") for i in range(n))
+    doc.close()
+    return n, chars
+
+
+def _single_source(pdf_bytes, max_pages):
+    with PyMuPDFPageSource(pdf_bytes) as source:
+        n = min(source.page_count, max_pages) if max_pages else source.page_count
+        chars = sum(len(source.text(i)) for i in range(n))
+    return n, chars
+
+
+MODES = {"dual_open": _dual_open, "single_source": _single_source}
+
+
+def _run_mode(mode, file_path, max_pages, out):
+    with open(file_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    start = time.perf_counter()
+    n, chars = MODES[mode](pdf_bytes, max_pages)
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    out.put((n, chars, elapsed, peak_mb))
+
+
+def bench(file_path, max_pages):
+    ctx = mp.get_context("spawn")
+    results = {}
+    for mode in MODES:
+        q = ctx.Queue()
+        p = ctx.Process(target=_run_mode, args=(mode, file_path, max_pages, q))
+        p.start()
+        results[mode] = q.get()
+        p.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction")
+    parser.add_argument("--pages", type=int, default=0, help="Max pages per PDF (0 = all)")
+    args = parser.parse_args()
+
+    totals = {mode: [0, 0.0] for mode in MODES}
+
+    print(f"{'document':45} {'mode':14} {'pages':>5} {'pages/s':>9} {'chars':>9} {'peak MB':>9}")
+    for doc in loading_docs():
+        results = bench(doc["file_path"], args.pages)
+        for mode, (n, chars, elapsed, peak_mb) in results.items():
+            totals[mode][0] += n
+            totals[mode][1] += elapsed
+            rate = n / elapsed if elapsed else 0.0
+            print(f"{doc['file_name'][:45]:45} {mode:14} {n:5d} {rate:9.1f} {chars:9d} {peak_mb:9.1f}")
+
+    for mode, (n, elapsed) in totals.items():
+        rate = n / elapsed if elapsed else 0.0
+        print(f"TOTAL {mode:14} {n} pages in {elapsed:.1f}s ({rate:.1f} pages/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Layout backend accuracy vs speed: ultralytics (PyTorch) vs onnxruntime.
+
+Every page of the PDFs in docs/ is rendered once at LAYOUT_DPI and run
+through each backend in batches. The PyTorch model is the reference; for the
+other backends the per-page decisions PDFProcessor acts on (table present,
+picture present above the picture threshold) are compared against it.
+
+Usage:
+    python src/mvp_rag/layout_onnx.py export [--int8]
+    python src/mvp_rag/bench_layout.py --onnx models/yolo11m_doc_layout.onnx [--pages 0]
+    python src/mvp_rag/bench_layout.py --onnx fp32.onnx --onnx int8.onnx
+"""
+
+import argparse
+import time
+
+import fitz
+
+from document_loader import loading_docs
+from layout import LAYOUT_BATCH_SIZE, detect_layout_batch, has_label, page_batches, warm_up
+from layout_onnx import OnnxLayoutModel
+from raster import LAYOUT_DPI, render_page
+
+PICTURE_CONF = 0.7  # PDFProcessor's default yolo_conf_threshold
+
+
+def _decisions(boxes):
+    return has_label(boxes, "Table"), has_label(boxes, "Picture", PICTURE_CONF)
+
+
+def _run(model, images, batch_size):
+    warm_up(model)
+    start = time.perf_counter()
+    layouts = []
+    for batch in page_batches(range(len(images)), batch_size):
+        layouts.extend(detect_layout_batch(model, [images[i] for i in batch], dpi=LAYOUT_DPI))
+    return layouts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare layout backends on docs/")
+    parser.add_argument("--weights", default=None, help=".pt weights (defaults to the hub model)")
+    parser.add_argument("--onnx", action="append", required=True, help="Exported model; repeat to compare several")
+    parser.add_argument("--pages", type=int, default=50, help="Max pages per PDF (0 = all; pages are held in memory)")
+    parser.add_argument("--batch-size", type=int, default=LAYOUT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    images = []
+    for doc in loading_docs():
+        with fitz.open(doc["file_path"]) as pdf:
+            n = min(pdf.page_count, args.pages) if args.pages else pdf.page_count
+            images.extend(render_page(pdf[i], LAYOUT_DPI) for i in range(n))
+    print(f"📄 {len(images)} pages rendered at {LAYOUT_DPI} dpi")
+
+    if args.weights:
+        from ultralytics import YOLO
+        reference = YOLO(args.weights)
+    else:
+        from yolo_loading import get_yolo11m
+        reference = get_yolo11m()
+
+    backends = [("torch", reference)] + [(f"onnx:{path}", OnnxLayoutModel(path)) for path in args.onnx]
+
+    ref_decisions = None
+    print(f"{'backend':40} {'ms/page':>8} {'speedup':>8} {'table agr':>10} {'picture agr':>12} {'tables +/-':>11}")
+    for name, model in backends:
+        layouts, elapsed = _run(model, images, args.batch_size)
+        decisions = [_decisions(boxes) for boxes in layouts]
+        ms = elapsed / len(images) * 1000 if images else 0.0
+
+        if ref_decisions is None:
+            ref_decisions, ref_ms = decisions, ms
+
+        n = len(decisions) or 1
+        table_agree = sum(d[0] == r[0] for d, r in zip(decisions, ref_decisions)) / n
+        picture_agree = sum(d[1] == r[1] for d, r in zip(decisions, ref_decisions)) / n
+        extra = sum(d[0] and not r[0] for d, r in zip(decisions, ref_decisions))
+        missed = sum(r[0] and not d[0] for d, r in zip(decisions, ref_decisions))
+        speedup = ref_ms / ms if ms else 0.0
+        print(f"{name[:40]:40} {ms:8.1f} {speedup:7.2f}x {table_agree:10.1%} {picture_agree:12.1%} {f'+{extra}/-{missed}':>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Rasterization benchmark: legacy PNG round-trip vs zero-copy pixmap view.
+
+Each mode runs in a fresh process so peak RSS is not shared between them.
+
+Usage:
+    python src/mvp_rag/bench_rasterize.py [--pages 50] [--dpi 300]
+"""
+
+import argparse
+import io
+import multiprocessing as mp
+import resource
+import time
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from document_loader import loading_docs
+from raster import RENDER_DPI, render_page
+
+
+def _legacy(page, dpi):
+    pix = page.get_pixmap(dpi=dpi)
+    return np.array(Image.open(io.BytesIO(pix.tobytes("png"))))
+
+
+def _zero_copy(page, dpi):
+    return render_page(page, dpi)
+
+
+MODES = {"png_roundtrip": _legacy, "zero_copy": _zero_copy}
+
+
+def _run_mode(mode, file_path, max_pages, dpi, out):
+    render = MODES[mode]
+    doc = fitz.open(file_path)
+    n = min(len(doc), max_pages) if max_pages else len(doc)
+
+    start = time.perf_counter()
+    for i in range(n):
+        img = render(doc[i], dpi)
+        del img
+    elapsed = time.perf_counter() - start
+    doc.close()
+
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    out.put((n, elapsed, peak_mb))
+
+
+def bench(file_path, max_pages, dpi):
+    ctx = mp.get_context("spawn")
+    results = {}
+    for mode in MODES:
+        q = ctx.Queue()
+        p = ctx.Process(target=_run_mode, args=(mode, file_path, max_pages, dpi, q))
+        p.start()
+        results[mode] = q.get()
+        p.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page rasterization")
+    parser.add_argument("--pages", type=int, default=50, help="Max pages per PDF (0 = all)")
+    parser.add_argument("--dpi", type=int, default=RENDER_DPI)
+    args = parser.parse_args()
+
+    print(f"{'document':45} {'mode':14} {'pages':>5} {'ms/page':>9} {'peak MB':>9}")
+    for doc in loading_docs():
+        results = bench(doc["file_path"], args.pages, args.dpi)
+        for mode, (n, elapsed, peak_mb) in results.items():
+            per_page = elapsed / n * 1000 if n else 0.0
+            print(f"{doc['file_name'][:45]:45} {mode:14} {n:5d} {per_page:9.1f} {peak_mb:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+How many chunks a lookup needs: chunk_text / chunk_pages vs chunk_structure.
+
+Runs on the raw_data_*.pdf.txt files (process_pdf output, tables included).
+For every command or variable entry (a name line followed by "Syntax" or
+"Data Types") and every "--- TABLE (Page N) ---" block it counts the fewest
+chunks whose lines together contain all of the entry's (or table's) lines,
+i.e. what retrieval has to return for one lookup to be answerable. A table
+counts as split when one of its rows lands in a chunk without the table's
+header row.
+
+Usage:
+    python src/mvp_rag/bench_structure.py [--size 1000] [--overlap 200] [files ...]
+"""
+
+import argparse
+import glob
+import os
+from collections import defaultdict
+
+from chunker import ENTRY_SECTIONS, TABLE_MARKER, chunk_document, split_pages
+
+MODES = ("text", "pages", "structure")
+
+
+def _spans(raw_text):
+    """Line lists of every entry and every table (with its header row first)."""
+    entries, tables = [], []
+    for record in split_pages(raw_text):
+        lines = [line.strip() for line in (record["text"] or "").split("\n") if line.strip()]
+        for i, line in enumerate(lines):
+            if TABLE_MARKER.match(line):
+                j = i + 1
+                while j < len(lines) and "|" in lines[j]:
+                    j += 1
+                if j > i + 1:
+                    tables.append(lines[i + 1:j])
+            elif any(nxt in ENTRY_SECTIONS for nxt in lines[i + 1:i + 5]) and " " not in line:
+                entries.append((record["page_num"], i))
+
+    # an entry runs to the next one, across pages
+    flat = []
+    starts = set(entries)
+    for record in split_pages(raw_text):
+        lines = [line.strip() for line in (record["text"] or "").split("\n") if line.strip()]
+        for i, line in enumerate(lines):
+            flat.append(((record["page_num"], i) in starts, line))
+    spans, current = [], None
+    for is_start, line in flat:
+        if is_start:
+            current = []
+            spans.append(current)
+        if current is not None and not TABLE_MARKER.match(line):
+            current.append(line)
+    return spans, tables
+
+
+def _cover(lines, where):
+    """Greedy set cover: chunks needed to hold every line (None if some line is in none)."""
+    todo = set(lines)
+    if any(not where[line] for line in todo):
+        return None
+    n = 0
+    while todo:
+        counts = defaultdict(int)
+        for line in todo:
+            for c in where[line]:
+                counts[c] += 1
+        best = max(counts, key=counts.get)
+        todo = {line for line in todo if best not in where[line]}
+        n += 1
+    return n
+
+
+def measure(raw_text, mode, size, overlap):
+    chunks = chunk_document(raw_text, mode, size, overlap)
+    where = defaultdict(set)
+    for k, chunk in enumerate(chunks):
+        for line in chunk["text"].split("\n"):
+            if line.strip():
+                where[line.strip()].add(k)
+
+    entries, tables = _spans(raw_text)
+    entry_cover = [_cover(lines, where) for lines in entries]
+    table_cover = [_cover(rows, where) for rows in tables]
+    split = sum(
+        1 for rows in tables
+        if any(where[row] - where[rows[0]] for row in rows[1:])
+    )
+    return len(chunks), entry_cover, table_cover, split, len(tables)
+
+
+def _avg(values):
+    known = [v for v in values if v is not None]
+    return sum(known) / len(known) if known else 0.0
+
+
+def _within(values, k):
+    return 100.0 * sum(1 for v in values if v is not None and v <= k) / len(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunks needed per entry / table lookup")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = args.files or sorted(glob.glob(os.path.join(here, "raw_data_*.pdf.txt")))
+
+    print(f"{'document':36} {'mode':9} {'chunks':>6} {'entries':>7} {'avg':>5} {'max':>4} "
+          f"{'<=2 %':>6} {'tables':>6} {'avg':>5} {'split':>5}")
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            raw_text = f.read()
+        name = os.path.basename(path)[len("raw_data_"):-len(".pdf.txt")]
+        for mode in MODES:
+            n, entry_cover, table_cover, split, n_tables = measure(raw_text, mode, args.size, args.overlap)
+            worst = max((v for v in entry_cover if v is not None), default=0)
+            print(f"{name[:36]:36} {mode:9} {n:6d} {len(entry_cover):7d} {_avg(entry_cover):5.2f} "
+                  f"{worst:4d} {_within(entry_cover, 2):6.1f} {n_tables:6d} "
+                  f"{_avg(table_cover):5.2f} {split:5d}")
+
+
+if __name__ == "__main__":
+    main()
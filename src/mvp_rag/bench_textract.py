@@ -0,0 +1,86 @@
+"""
+Exercise TextractSubmitter against a local stub (no AWS calls).
+
+The stub sleeps to simulate AnalyzeDocument latency and raises
+ThrottlingException for a fraction of calls, or whenever more calls are
+in flight than its simulated quota allows.
+
+Usage:
+    python src/mvp_rag/bench_textract.py [--pages 40] [--latency 0.5]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from textract_client import TextractSubmitter
+
+
+class ThrottlingError(Exception):
+    def __init__(self):
+        super().__init__("Rate exceeded")
+        self.response = {"Error": {"Code": "ThrottlingException"}}
+
+
+class StubTextract:
+    def __init__(self, latency: float, throttle_rate: float, quota: int):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.quota = quota
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def analyze_document(self, Document, FeatureTypes):
+        with self._lock:
+            self._in_flight += 1
+            over_quota = self._in_flight > self.quota
+        try:
+            if over_quota or random.random() < self.throttle_rate:
+                time.sleep(self.latency * 0.1)
+                raise ThrottlingError()
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+            return {"Blocks": [], "bytes": len(Document["Bytes"])}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def run(pages, concurrency, rate, latency, throttle_rate, quota):
+    stub = StubTextract(latency, throttle_rate, quota)
+    submitter = TextractSubmitter(stub, concurrency=concurrency, rate=rate, base_delay=0.1, max_delay=2.0)
+
+    start = time.perf_counter()
+    futures = [submitter.submit(b"x" * 1024) for _ in range(pages)]
+    ok = 0
+    failed = 0
+    for f in futures:
+        try:
+            f.result()
+            ok += 1
+        except ThrottlingError:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    submitter.shutdown()
+    return elapsed, ok, failed, submitter.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TextractSubmitter stub benchmark")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean seconds per call")
+    parser.add_argument("--throttle-rate", type=float, default=0.1)
+    parser.add_argument("--quota", type=int, default=6, help="Concurrent calls before the stub throttles")
+    parser.add_argument("--rate", type=float, default=10.0, help="Token-bucket calls per second")
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>11} {'seconds':>8} {'ok':>4} {'failed':>6} {'calls':>6} {'retries':>7}")
+    for concurrency in (1, 4, 8):
+        elapsed, ok, failed, stats = run(
+            args.pages, concurrency, args.rate, args.latency, args.throttle_rate, args.quota
+        )
+        print(f"{concurrency:11d} {elapsed:8.2f} {ok:4d} {failed:6d} {stats['calls']:6d} {stats['retries']:7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Repeated header / footer stripping.
+
+Every page of the vendor manuals carries the same running header
+("Chapter 1: Synthesis Variables", the section title, "Feedback") and
+footer (manual title, release, page number), and process_pdf keeps them in
+the text, so they padded every chunk and every prompt. BoilerplateFilter
+learns them per document, in one pass over its page records:
+
+    - only the first and last BOILERPLATE_ZONE_LINES lines of a page (table
+      blocks, section headings and entry names aside) are candidates
+    - a line is keyed by its zone and its text with whitespace collapsed and
+      digits folded, so "31" and "32" or "Chapter 1" and "Chapter 2" match
+    - a key is boilerplate when it occurs in the same zone on at least
+      BOILERPLATE_MIN_RATIO of the BOILERPLATE_WINDOW pages around the page
+      (and on BOILERPLATE_MIN_PAGES of them)
+
+The window is centred on the page being cleaned, so a page waits for
+BOILERPLATE_WINDOW // 2 pages after it; a running header that changes per
+chapter or section is learned as soon as it repeats. Nothing but that
+window is held. A heading that happens to open a page is kept unless it
+opens most of the pages around it.
+"""
+
+import os
+import re
+from collections import Counter, deque
+
+try:
+    from .chunker import SECTION_HEADINGS, TABLE_MARKER, _is_entry, estimate_tokens
+except ImportError:
+    from chunker import SECTION_HEADINGS, TABLE_MARKER, _is_entry, estimate_tokens
+
+BOILERPLATE_ENABLED = os.getenv("BOILERPLATE", "true").lower() == "true"
+BOILERPLATE_ZONE_LINES = int(os.getenv("BOILERPLATE_ZONE_LINES", "4"))
+BOILERPLATE_WINDOW = int(os.getenv("BOILERPLATE_WINDOW", "8"))
+BOILERPLATE_MIN_RATIO = float(os.getenv("BOILERPLATE_MIN_RATIO", "0.5"))
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+
+
+def line_key(line: str) -> str:
+    return re.sub(r"\d+", "#", " ".join(line.split()))
+
+
+def _entry_name(lines, i: int) -> bool:
+    # a variable or command name ("compile_ultra", "MasterInstance") opening
+    # its entry; the running header's "Feedback" and the index letter ("a")
+    # are followed by "Data Types" too, but are no identifiers
+    name = lines[i].strip()
+    return len(name) > 1 and name != name.capitalize() and _is_entry(lines, i)
+
+
+def _zones(lines, zone_lines: int):
+    """{line index: zone} for the header ("top") and footer ("bottom") candidates."""
+    body = []
+    in_table = False
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if TABLE_MARKER.match(stripped):
+            in_table = True
+            continue
+        if in_table and "|" in line:
+            continue
+        in_table = False
+        # reference pages often open on a section heading ("Description",
+        # "See Also") or a variable's name; those are content, however often
+        # they come first
+        if stripped in SECTION_HEADINGS or (stripped and _entry_name(lines, i)):
+            continue
+        if stripped:
+            body.append(i)
+
+    zones = {i: "bottom" for i in body[-zone_lines:]}
+    zones.update({i: "top" for i in body[:zone_lines]})
+    return zones
+
+
+class BoilerplateFilter:
+    """
+    filter(records) yields the page records with their header and footer
+    lines removed; the counters then hold what was taken out of the document.
+    """
+
+    def __init__(
+        self,
+        window: int = BOILERPLATE_WINDOW,
+        min_ratio: float = BOILERPLATE_MIN_RATIO,
+        min_pages: int = BOILERPLATE_MIN_PAGES,
+        zone_lines: int = BOILERPLATE_ZONE_LINES,
+    ):
+        self.window = max(1, window)
+        self.min_ratio = min_ratio
+        self.min_pages = min_pages
+        self.zone_lines = zone_lines
+        self.pages = 0
+        self.chars = 0  # page text in
+        self.removed_chars = 0
+        self.removed = Counter()  # removed line → times
+
+    def filter(self, records):
+        recent = deque()  # keys of the pages in the window
+        counts = Counter()  # key → pages in the window it occurs on
+        pending = deque()  # (record, lines, zones) waiting for the pages after them
+
+        for record in records:
+            lines = (record.get("text") or "").split("\n")
+            zones = _zones(lines, self.zone_lines)
+            keys = {(zone, line_key(lines[i])) for i, zone in zones.items()}
+
+            recent.append(keys)
+            counts.update(keys)
+            if len(recent) > self.window:
+                counts.subtract(recent.popleft())
+
+            pending.append((record, lines, zones))
+            if len(pending) > self.window // 2:
+                yield self._strip(*pending.popleft(), counts, len(recent))
+
+        while pending:
+            yield self._strip(*pending.popleft(), counts, len(recent))
+
+    def _strip(self, record, lines, zones, counts, seen):
+        self.pages += 1
+        if record.get("text") is None:
+            return record
+        self.chars += len(record["text"])
+
+        needed = max(self.min_pages, self.min_ratio * seen)
+        kept = []
+        for i, line in enumerate(lines):
+            zone = zones.get(i)
+            if zone is not None and counts[(zone, line_key(line))] >= needed:
+                self.removed[line] += 1
+                self.removed_chars += len(line) + 1
+            else:
+                kept.append(line)
+        return {**record, "text": "\n".join(kept)}
+
+    def report(self, source: str, tokens: bool = True) -> dict:
+        out = {
+            "source": source,
+            "pages": self.pages,
+            "lines": sum(self.removed.values()),
+            "chars": self.removed_chars,
+            "share": self.removed_chars / self.chars if self.chars else 0.0,
+            "tokens": None,
+        }
+        if tokens and self.removed:
+            lines = list(self.removed)
+            out["tokens"] = sum(n * self.removed[line] for line, n in zip(lines, estimate_tokens(lines)))
+        return out
+
+
+def boilerplate_filter():
+    """A BoilerplateFilter for one document, or None when BOILERPLATE=false."""
+    return BoilerplateFilter() if BOILERPLATE_ENABLED else None
+
+
+def describe_boilerplate(report: dict) -> str:
+    tokens = f", {report['tokens']} tokens" if report["tokens"] is not None else ""
+    return (f"[BOILERPLATE] {report['source']}: removed {report['lines']} header/footer lines "
+            f"from {report['pages']} pages, {report['chars']} chars{tokens} "
+            f"({100.0 * report['share']:.1f}% of the text)")
@@ -0,0 +1,298 @@
+"""
+Durable per-document ingestion checkpoints.
+
+A document that fails half way (a worker crash, Textract giving up on page
+700 of 800) used to start over from page 1 on the next run. Progress is now
+written to a local SQLite file as it is made, keyed by source and content
+hash, so a rerun of the same content picks up where it stopped:
+
+    pages       text of every extracted page, written as each page finishes
+    documents   page count, metadata and chunk list once they are known
+    embeddings  each embedded batch of chunks (EMBED_BATCH_SIZE / EMBED_BATCH_TOKENS)
+
+Nothing reaches Milvus until the store stage, which inserts the whole
+document at once; after that the document's checkpoint is cleared.
+Checkpoints of an older content hash are ignored and cleared with it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT", "true").lower() == "true"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "data/ingest_checkpoints.sqlite")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# below the embeddings endpoint's per-request token limit
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "250000"))
+
+
+class IngestCheckpoint:
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # one connection per process (workers write pages, the main process
+        # the rest); the stage threads share it through _lock
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                source TEXT,
+                content_hash TEXT,
+                page_num INTEGER,
+                text TEXT,
+                PRIMARY KEY (source, content_hash, page_num)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                source TEXT,
+                content_hash TEXT,
+                page_count INTEGER,
+                metadata TEXT,
+                chunks TEXT,
+                updated_at REAL,
+                PRIMARY KEY (source, content_hash)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                source TEXT,
+                content_hash TEXT,
+                batch INTEGER,
+                digest TEXT,
+                vectors BLOB,
+                PRIMARY KEY (source, content_hash, batch)
+            )
+        """)
+        self.conn.commit()
+
+    # ---------------- pages ----------------
+    def pages(self, source: str, content_hash: str) -> dict:
+        """{page_num: text} of every checkpointed page."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT page_num, text FROM pages WHERE source = ? AND content_hash = ?",
+                (source, content_hash)
+            ).fetchall()
+        return dict(rows)
+
+    def put_page(self, source: str, content_hash: str, page_num: int, text):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (source, content_hash, page_num, text) VALUES (?, ?, ?, ?)",
+                (source, content_hash, page_num, text)
+            )
+            self.conn.commit()
+
+    # ---------------- documents ----------------
+    def load(self, source: str, content_hash: str) -> dict:
+        """Checkpointed "page_count", "metadata" and "chunks" (None when not reached)."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT page_count, metadata, chunks FROM documents WHERE source = ? AND content_hash = ?",
+                (source, content_hash)
+            ).fetchone()
+        if row is None:
+            return {"page_count": None, "metadata": None, "chunks": None}
+        page_count, metadata, chunks = row
+        return {
+            "page_count": page_count,
+            "metadata": json.loads(metadata) if metadata else None,
+            "chunks": json.loads(chunks) if chunks else None,
+        }
+
+    def save(self, source: str, content_hash: str, **fields):
+        """Update page_count, metadata and/or chunks for this document."""
+        values = {
+            k: (v if k == "page_count" else json.dumps(v, ensure_ascii=False))
+            for k, v in fields.items()
+        }
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO documents (source, content_hash) VALUES (?, ?)",
+                (source, content_hash)
+            )
+            for name, value in values.items():
+                self.conn.execute(
+                    f"UPDATE documents SET {name} = ?, updated_at = ? WHERE source = ? AND content_hash = ?",
+                    (value, time.time(), source, content_hash)
+                )
+            self.conn.commit()
+
+    # ---------------- embeddings ----------------
+    def batch(self, source: str, content_hash: str, batch: int, digest: str, n: int):
+        """Checkpointed vectors of one batch, or None if missing or for other chunks."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT digest, vectors FROM embeddings WHERE source = ? AND content_hash = ? AND batch = ?",
+                (source, content_hash, batch)
+            ).fetchone()
+        if row is None or row[0] != digest:
+            return None
+        return np.frombuffer(row[1], dtype=np.float32).reshape(n, -1).tolist()
+
+    def put_batch(self, source: str, content_hash: str, batch: int, digest: str, vectors):
+        # Milvus stores float32, so nothing is lost
+        blob = np.asarray(vectors, dtype=np.float32).tobytes()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings (source, content_hash, batch, digest, vectors) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, content_hash, batch, digest, blob)
+            )
+            self.conn.commit()
+
+    # ---------------- cleanup ----------------
+    def clear(self, source: str):
+        """Drop every checkpoint of source, whatever its content hash."""
+        with self._lock:
+            for table in ("pages", "documents", "embeddings"):
+                self.conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+_checkpoint = None
+
+
+def process_checkpoint():
+    """
+    This process's checkpoint store, or None when CHECKPOINT=false. A
+    forked worker opens its own connection instead of reusing the parent's.
+    """
+    global _checkpoint
+    if not CHECKPOINT_ENABLED:
+        return None
+    if _checkpoint is None or _checkpoint[0] != os.getpid():
+        _checkpoint = (os.getpid(), IngestCheckpoint())
+    return _checkpoint[1]
+
+
+# the helpers below take the pipelines' document dicts ("file_name", "content_hash")
+# and do nothing when checkpointing is off
+def load_saved(doc: dict) -> dict:
+    """Metadata / chunks an earlier run of the same content got to."""
+    checkpoint = process_checkpoint()
+    if checkpoint is None:
+        return {"page_count": None, "metadata": None, "chunks": None}
+    return checkpoint.load(doc["file_name"], doc["content_hash"])
+
+
+def is_extracted(doc: dict) -> bool:
+    """True when every page of the document is checkpointed, so it need not be opened."""
+    checkpoint = process_checkpoint()
+    if checkpoint is None:
+        return False
+    page_count = checkpoint.load(doc["file_name"], doc["content_hash"])["page_count"]
+    return page_count is not None and len(checkpoint.pages(doc["file_name"], doc["content_hash"])) >= page_count
+
+
+def save_progress(doc: dict, **fields):
+    checkpoint = process_checkpoint()
+    if checkpoint is not None:
+        checkpoint.save(doc["file_name"], doc["content_hash"], **fields)
+
+
+def clear_checkpoint(source: str):
+    checkpoint = process_checkpoint()
+    if checkpoint is not None:
+        checkpoint.clear(source)
+
+
+def join_pages(records) -> str:
+    # the same layout as PDFProcessor.process_pdf
+    final_text = []
+    for record in records:
+        final_text.append(f"\n----------- page number {record['page_num']} -----------")
+        if record["text"] is not None:
+            final_text.append(record["text"])
+    return "\n".join(final_text)
+
+
+def resume_extract(checkpoint, source: str, content_hash: str, extract_fn, page_range=None) -> str:
+    """
+    Text of page_range (the whole document when None) as process_pdf would
+    return it, extracting only what is not checkpointed yet.
+
+    extract_fn(page_range) returns iter_pages records for that range. It
+    starts at the first page without a checkpoint and is not called at all
+    when every page is done. Each page is checkpointed as it is yielded.
+    """
+    if checkpoint is None:
+        return join_pages(extract_fn(page_range or (0, sys.maxsize)))
+
+    start, stop = page_range or (0, checkpoint.load(source, content_hash)["page_count"])
+    done = checkpoint.pages(source, content_hash)
+
+    resume = start
+    while resume + 1 in done and (stop is None or resume < stop):
+        resume += 1
+
+    if stop is None or resume < stop:
+        if resume > start:
+            print(f"[RESUME] {source} from page {resume + 1} ({resume - start} pages checkpointed)")
+        for record in extract_fn((resume, stop if stop is not None else sys.maxsize)):
+            checkpoint.put_page(source, content_hash, record["page_num"], record["text"])
+            done[record["page_num"]] = record["text"]
+        if page_range is None:
+            # lets a later resume know the document is complete without opening it
+            stop = max(done, default=0)
+            checkpoint.save(source, content_hash, page_count=stop)
+
+    return join_pages({"page_num": n, "text": done[n]} for n in range(start + 1, stop + 1))
+
+
+def pack_batches(token_counts, max_items: int = EMBED_BATCH_SIZE, max_tokens: int = EMBED_BATCH_TOKENS):
+    """
+    (start, stop) ranges over the chunks with at most max_items chunks and
+    max_tokens tokens each (a single larger chunk gets a range of its own).
+    """
+    ranges = []
+    start = tokens = 0
+    for i, n in enumerate(token_counts):
+        if i > start and (i - start >= max_items or tokens + n > max_tokens):
+            ranges.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(token_counts):
+        ranges.append((start, len(token_counts)))
+    return ranges
+
+
+def embed_batches(checkpoint, source: str, content_hash: str, chunks, embed_fn,
+                  batch_size: int = EMBED_BATCH_SIZE, token_counts=None):
+    """
+    embed_fn over chunks in batches, reusing and checkpointing each batch.
+    With token_counts, batches are packed up to EMBED_BATCH_TOKENS as well.
+    """
+    if token_counts is not None:
+        ranges = pack_batches(token_counts, batch_size)
+    else:
+        ranges = [(start, start + batch_size) for start in range(0, len(chunks), batch_size)]
+
+    vectors = []
+    for k, (start, stop) in enumerate(ranges):
+        batch = chunks[start:stop]
+        # the digest also invalidates batches checkpointed with other boundaries
+        digest = hashlib.sha256("\x00".join(batch).encode("utf-8")).hexdigest()
+
+        saved = checkpoint.batch(source, content_hash, k, digest, len(batch)) if checkpoint is not None else None
+        if saved is None:
+            saved = embed_fn(batch)
+            if checkpoint is not None:
+                checkpoint.put_batch(source, content_hash, k, digest, saved)
+        vectors.extend(saved)
+    return vectors
@@ -1,5 +1,34 @@
+import os
+import re
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import Iterable, List
+from typing import Iterable, Iterator, List
+
+try:
+    from .checkpoint import join_pages
+except ImportError:
+    from checkpoint import join_pages
+
+# text      → chunk_text over the whole document (page markers included)
+# pages     → chunk_pages over its page records (CHUNK_SIZE characters)
+# tokens    → chunk_tokens over its page records (CHUNK_TOKENS tokens)
+# structure → chunk_structure: chunk_pages with tables and command blocks kept whole
+CHUNK_MODE = os.getenv("CHUNK_MODE", "text")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+# the tokenizer of text-embedding-3-large
+EMBED_ENCODING = os.getenv("EMBED_ENCODING", "cl100k_base")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "512"))
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "64"))
+# characters per token when the tokenizer cannot be loaded; English runs
+# about 4, so estimated embedding batches err on the small side
+TOKEN_ESTIMATE_CHARS = int(os.getenv("TOKEN_ESTIMATE_CHARS", "3"))
+
+# the page separator PDFProcessor.process_pdf writes, with the newline it is joined by
+PAGE_MARKER = re.compile(r"\n?\n----------- page number (\d+) -----------(?:\n|$)")
 
 
 def normalize_block(text: str) -> str:
@@ -21,4 +50,394 @@ def chunk_text(
     return splitter.split_text(text)
 
 
+# --------------------------------------------------
+# Streaming, page-aware chunking
+# --------------------------------------------------
+def split_pages(raw_text: str) -> Iterator[dict]:
+    """Page records ({"page_num", "text"}) back out of process_pdf output."""
+    markers = list(PAGE_MARKER.finditer(raw_text))
+    for k, m in enumerate(markers):
+        end = markers[k + 1].start() if k + 1 < len(markers) else len(raw_text)
+        yield {"page_num": int(m.group(1)), "text": raw_text[m.end():end]}
+
+
+def _units(text: str, chunk_size: int, splitter) -> Iterator[str]:
+    # lines are the unit of packing and overlap; a line longer than a whole
+    # chunk is cut by the recursive splitter
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        if len(line) <= chunk_size:
+            yield line
+        else:
+            yield from splitter.split_text(line)
+
+
+def _pack(units, size: int, overlap: int, sep: int, min_fill: int = None):
+    """
+    Greedy packing shared by the streaming chunkers. units yields
+    (line, page_num, length); yields (lines, length) windows of at most size,
+    each starting with the tail (up to overlap) of the one before. sep is
+    the length of the "\n" lines are joined with. With min_fill, a unit
+    carrying a fourth, true element starts a new window without overlap
+    once the current one is longer than min_fill.
+    """
+    window = deque()  # (line, page_num, length)
+    total = 0  # length of the window, one separator per line
+    fresh = False  # the window holds lines no chunk has had yet
+
+    for unit in units:
+        n = unit[2]
+        if min_fill is not None and len(unit) > 3 and unit[3] and fresh and total - sep > min_fill:
+            yield window, total - sep
+            window, total = deque(), 0
+        elif window and total + n > size:
+            yield window, total - sep
+            fresh = False
+            while window and (total > overlap or total + n > size):
+                total -= window.popleft()[2] + sep
+        window.append(unit[:3])
+        total += n + sep
+        fresh = True
+
+    if fresh:
+        yield window, total - sep
+
+
+def chunk_pages(
+    records: Iterable[dict],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+) -> Iterator[dict]:
+    """
+    Chunk a stream of page records (as iter_pages yields them) into
+    {"text", "page_start", "page_end", "tokens"} dicts, each yielded as soon
+    as it is full ("tokens" is None here). Lines are packed up to chunk_size
+    characters, and the last lines of a chunk (up to chunk_overlap) start
+    the next one, across page boundaries too. Only the current chunk is
+    held, never the document.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
+    units = (
+        (unit, record["page_num"], len(unit))
+        for record in records if record.get("text")
+        for unit in _units(record["text"], chunk_size, splitter)
+    )
+    for window, _ in _pack(units, chunk_size, chunk_overlap, sep=1):
+        yield _page_chunk(window)
+
+
+# --------------------------------------------------
+# Token-budgeted chunking
+# --------------------------------------------------
+@lru_cache(maxsize=None)
+def get_encoding(name: str = EMBED_ENCODING):
+    # loading the BPE ranks is the slow part; once per process
+    import tiktoken
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(texts: List[str], encoding: str = EMBED_ENCODING) -> List[int]:
+    return [len(ids) for ids in get_encoding(encoding).encode_ordinary_batch(list(texts))]
+
+
+_encoding_error = None
+
+
+def estimate_tokens(texts: List[str], encoding: str = EMBED_ENCODING) -> List[int]:
+    """
+    count_tokens, or a character estimate if the tokenizer cannot be loaded
+    (tiktoken downloads its BPE file on first use, which fails offline).
+    Only CHUNK_MODE=tokens needs the exact counts.
+    """
+    global _encoding_error
+    texts = list(texts)
+    if _encoding_error is None:
+        try:
+            enc = get_encoding(encoding)
+        except Exception as e:
+            # tried once per process; the download would only time out again
+            _encoding_error = e
+            print(f"⚠️ {encoding} tokenizer unavailable ({e}); estimating tokens from characters")
+        else:
+            return [len(ids) for ids in enc.encode_ordinary_batch(texts)]
+    return [-(-len(t) // TOKEN_ESTIMATE_CHARS) for t in texts]
+
+
+def _token_units(text: str, max_tokens: int, enc):
+    # one batched encode per page; lines over the budget are cut where a run
+    # of max_tokens tokens ends, moved back to the start of the character
+    # that token is in (a token can hold part of a multi-byte character),
+    # and each piece is re-counted, so every piece is counted exactly
+    lines = [line for line in text.split("\n") if line.strip()]
+    for line, ids in zip(lines, enc.encode_ordinary_batch(lines)):
+        if len(ids) <= max_tokens:
+            yield line, len(ids)
+            continue
+        # offsets[k]: the character token k starts in
+        _, offsets = enc.decode_with_offsets(ids)
+        start = 0
+        while start < len(line):
+            stop = bisect_left(offsets, start) + max_tokens
+            while True:
+                end = offsets[stop] if stop < len(ids) else len(line)
+                # a piece holds at least one character
+                end = max(end, start + 1)
+                n = len(enc.encode_ordinary(line[start:end]))
+                # the piece can merge differently on its own; back off a token
+                if n <= max_tokens or end == start + 1:
+                    break
+                stop -= 1
+            yield line[start:end], n
+            start = end
+
+
+def chunk_tokens(
+    records: Iterable[dict],
+    chunk_tokens: int = CHUNK_TOKENS,
+    chunk_overlap: int = CHUNK_TOKEN_OVERLAP,
+    encoding: str = EMBED_ENCODING,
+) -> Iterator[dict]:
+    """
+    chunk_pages with sizes in tokens of the embedding model's tokenizer.
+    Each line is tokenized once; the overlap carried into the next chunk
+    reuses those counts. "tokens" is the chunk's token count: the sum of its
+    lines plus one per "\n", which can only overcount (by a whitespace merge
+    at a line join), so requests packed with it stay within their limits.
+    """
+    enc = get_encoding(encoding)
+    sep = len(enc.encode_ordinary("\n"))
+    units = (
+        (unit, record["page_num"], n)
+        for record in records if record.get("text")
+        for unit, n in _token_units(record["text"], chunk_tokens, enc)
+    )
+    for window, tokens in _pack(units, chunk_tokens, chunk_overlap, sep):
+        yield _page_chunk(window, tokens)
+
+
+def _page_chunk(window, tokens: int = None) -> dict:
+    return {
+        "text": "\n".join(unit for unit, _, _ in window),
+        "page_start": window[0][1],
+        "page_end": window[-1][1],
+        "tokens": tokens,
+    }
+
+
+def text_chunk(text: str) -> dict:
+    # chunk_text output (and older callers' plain strings) as a chunk record
+    return {"text": text, "page_start": None, "page_end": None, "tokens": None}
+
+
+# --------------------------------------------------
+# Structure-aware chunking
+# --------------------------------------------------
+# the block header tables.format_table writes
+TABLE_MARKER = re.compile(r"^--- TABLE \(Page \d+\) ---$")
+# a shell or Tcl prompt at the start of an example command
+PROMPT_LINE = re.compile(r"^\s*(?:[\w-]*shell[\w-]*>|prompt>|unix>|%)\s")
+# "Table 3  Compile options" above a table
+TABLE_CAPTION = re.compile(r"^Table \d+\b")
+# the section headings of the command and variable reference pages
+SECTION_HEADINGS = {
+    "Syntax", "Arguments", "Description", "Examples", "Data Types", "Group",
+    "See Also", "Options", "Usage", "Return Value", "Returns",
+}
+# a command or variable name on its own line ...
+ENTRY_NAME = re.compile(r"^[A-Za-z_][\w\-:.]*$")
+# ... starts an entry when one of these follows within ENTRY_LOOKAHEAD lines
+ENTRY_SECTIONS = {"Syntax", "Data Types"}
+ENTRY_LOOKAHEAD = 4
+# a chunk is closed at an entry heading once it is this full
+STRUCTURE_MIN_FILL = float(os.getenv("STRUCTURE_MIN_FILL", "0.25"))
+
+
+def _table_units(marker: str, rows: List[str], chunk_size: int, splitter) -> Iterator[str]:
+    # the whole block when it fits, else row groups that each repeat the
+    # marker and the header row so every piece reads as a table on its own
+    block = "\n".join([marker] + rows)
+    if len(block) <= chunk_size:
+        yield block
+        return
+
+    # the repeated marker and header row take at most half a chunk; a longer
+    # header row is kept whole once, ahead of the groups, and repeated cut short
+    header = rows[0] if rows else ""
+    limit = chunk_size // 2 - len(marker) - 1
+    if len(header) > limit:
+        whole = f"{marker}\n{header}"
+        yield from [whole] if len(whole) <= chunk_size else splitter.split_text(whole)
+        header = header[:limit - 1].rstrip() + "…" if limit > 1 else ""
+    head = [marker] + ([header] if header else [])
+    room = max(1, chunk_size - len("\n".join(head)) - 1)
+    group, size = [], 0
+    for row in rows[1:]:
+        if len(row) > room:
+            # a single row wider than a chunk: cut it on its own
+            if group:
+                yield "\n".join(head + group)
+                group, size = [], 0
+            for piece in splitter.split_text(row):
+                yield piece
+            continue
+        if group and size + len(row) + 1 > room:
+            yield "\n".join(head + group)
+            group, size = [], 0
+        group.append(row)
+        size += len(row) + 1
+    if group:
+        yield "\n".join(head + group)
+
+
+def _is_entry(lines: List[str], i: int) -> bool:
+    if not ENTRY_NAME.match(lines[i].strip()):
+        return False
+    ahead = lines[i + 1:i + 1 + ENTRY_LOOKAHEAD]
+    return any(line.strip() in ENTRY_SECTIONS for line in ahead)
+
+
+def _blocks(text: str, chunk_size: int, splitter) -> Iterator[tuple]:
+    """
+    (text, kind) blocks of one page: "table" (one per row group), "command"
+    (a Syntax section or a run of prompt lines), "heading" (also table
+    captions), "entry" (a command or variable name) and plain "line".
+    """
+    lines = [line for line in text.split("\n") if line.strip()]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if TABLE_MARKER.match(stripped):
+            j = i + 1
+            while j < len(lines) and "|" in lines[j]:
+                j += 1
+            if j == i + 1:
+                # no "|" rows: a one-column table from before tables.table_row
+                # marked them, whose end cannot be told from the text after it;
+                # the marker travels with the lines that follow, as a heading
+                yield line, "heading"
+            else:
+                for unit in _table_units(stripped, lines[i + 1:j], chunk_size, splitter):
+                    yield unit, "table"
+            i = j
+            continue
+
+        if stripped == "Syntax" or PROMPT_LINE.match(line):
+            # the synopsis runs to the next section heading; example commands
+            # to the last consecutive prompt line
+            j = i + 1
+            if stripped == "Syntax":
+                while j < len(lines) and lines[j].strip() not in SECTION_HEADINGS:
+                    j += 1
+            else:
+                while j < len(lines) and PROMPT_LINE.match(lines[j]):
+                    j += 1
+            block = "\n".join(lines[i:j])
+            if len(block) <= chunk_size:
+                yield block, "command"
+            else:
+                for part in lines[i:j]:
+                    for unit in _units(part, chunk_size, splitter):
+                        yield unit, "line"
+            i = j
+            continue
+
+        if stripped in SECTION_HEADINGS or (TABLE_CAPTION.match(stripped) and len(stripped) <= 120):
+            yield line, "heading"
+        elif _is_entry(lines, i):
+            yield line, "entry"
+        else:
+            for unit in _units(line, chunk_size, splitter):
+                yield unit, "line"
+        i += 1
+
+
+def _structure_units(text: str, chunk_size: int, splitter) -> Iterator[tuple]:
+    # headings are glued to the block after them so none ends a chunk;
+    # yields (text, starts_entry)
+    pending, entry = [], False
+    for block, kind in _blocks(text, chunk_size, splitter):
+        if kind in ("heading", "entry"):
+            pending.append(block)
+            entry = entry or kind == "entry"
+            continue
+        if pending:
+            glued = "\n".join(pending + [block])
+            if len(glued) <= chunk_size:
+                block = glued
+            else:
+                yield "\n".join(pending), entry
+                entry = False
+            pending = []
+        yield block, entry
+        entry = False
+    if pending:
+        yield "\n".join(pending), entry
+
+
+def chunk_structure(
+    records: Iterable[dict],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+) -> Iterator[dict]:
+    """
+    chunk_pages over structural blocks instead of lines. A table block (up
+    to the first line without a "|"), a command synopsis and a run of
+    example commands are packed as one unit, so no chunk ends inside them; a
+    table over chunk_size is split into row groups that repeat its marker
+    and header row (cut short when it would take over half a chunk). Section
+    headings travel with the block after them, and once a chunk is
+    STRUCTURE_MIN_FILL full a new command or variable entry starts a fresh
+    chunk with no overlap, so an entry is rarely split from its name.
+    Overlap otherwise works as in chunk_pages, but is never part of a table
+    or command block that would not fit.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
+    units = (
+        (unit, record["page_num"], len(unit), starts_entry)
+        for record in records if record.get("text")
+        for unit, starts_entry in _structure_units(record["text"], chunk_size, splitter)
+    )
+    for window, _ in _pack(units, chunk_size, chunk_overlap, sep=1,
+                           min_fill=int(chunk_size * STRUCTURE_MIN_FILL)):
+        yield _page_chunk(window)
+
+
+def chunk_records(
+    records: Iterable[dict],
+    mode: str = CHUNK_MODE,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> Iterator[dict]:
+    """
+    chunk_document over page records (as split_pages or iter_pages yield
+    them). The page-aware modes take the records one at a time; "text" mode
+    joins them back into the whole document first.
+    """
+    if mode == "tokens":
+        return chunk_tokens(records)
+    if mode == "pages":
+        return chunk_pages(records, chunk_size, chunk_overlap)
+    if mode == "structure":
+        return chunk_structure(records, chunk_size, chunk_overlap)
+    if mode == "text":
+        return (text_chunk(c) for c in chunk_text(join_pages(records), chunk_size, chunk_overlap))
+    raise ValueError(f"Unknown CHUNK_MODE: {mode}")
+
 
+def chunk_document(
+    raw_text: str,
+    mode: str = CHUNK_MODE,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> List[dict]:
+    """
+    Chunks of a process_pdf document as {"text", "page_start", "page_end",
+    "tokens"} dicts. Pages are None in "text" mode and tokens are only
+    counted in "tokens" mode (sized by CHUNK_TOKENS / CHUNK_TOKEN_OVERLAP).
+    """
+    if mode == "text":
+        return [text_chunk(c) for c in chunk_text(raw_text, chunk_size, chunk_overlap)]
+    return list(chunk_records(split_pages(raw_text), mode, chunk_size, chunk_overlap))
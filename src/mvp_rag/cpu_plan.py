@@ -0,0 +1,225 @@
+"""
+CPU planning for the ingestion workers.
+
+Every worker process runs layout inference with its own intra-op thread
+pool (torch, OpenMP/MKL, onnxruntime, OpenCV). Left alone, each one sizes
+that pool to the whole machine, so N workers on C cores run N x C busy
+threads. The plan fixes workers x threads_per_worker <= available CPUs,
+applies the thread count inside each worker before the model is loaded,
+and can pin each worker to its own CPU set.
+
+Environment:
+    MAX_WORKERS_OVERRIDE  worker count (cron/ingest.py --workers)
+    WORKER_THREADS        threads per worker (default: CPUs // workers)
+    CPU_PIN               "true" pins each worker to its own CPUs
+    CPU_CALIBRATE         "true" picks workers/threads from a short timed run
+                          (result cached in CPU_PLAN_PATH)
+"""
+
+import json
+import math
+import os
+import sys
+import time
+
+try:
+    from .layout import detect_layouts, page_batches
+    from .page_source import PyMuPDFPageSource
+except ImportError:
+    from layout import detect_layouts, page_batches
+    from page_source import PyMuPDFPageSource
+
+CPU_PLAN_PATH = os.getenv("CPU_PLAN_PATH", "data/cpu_plan.json")
+CALIBRATION_PAGES = int(os.getenv("CALIBRATION_PAGES", "16"))  # per worker
+
+_THREAD_ENV = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "LAYOUT_THREADS",
+)
+
+
+def _env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _env_flag(name):
+    return os.getenv(name, "false").lower() == "true"
+
+
+def allowed_cpus() -> list:
+    """CPU ids this process may run on."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def available_cpus() -> int:
+    """Usable CPUs: the affinity mask, capped by a cgroup v2 CPU quota."""
+    cpus = len(allowed_cpus())
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def plan(workers: int = None, threads: int = None, max_workers: int = 4, cpus: int = None):
+    """(workers, threads_per_worker), keeping workers x threads within the CPUs."""
+    cpus = cpus or available_cpus()
+    workers = max(1, workers or min(cpus, max_workers))
+    threads = max(1, threads or cpus // workers)
+    return workers, threads
+
+
+def cpu_sets(workers: int, threads: int):
+    """One disjoint CPU list per worker slot, or None if they do not fit."""
+    cpus = allowed_cpus()
+    if workers * threads > len(cpus):
+        return None
+    return [cpus[k * threads:(k + 1) * threads] for k in range(workers)]
+
+
+def configure_threads(threads: int):
+    """
+    Size this process's native thread pools. Call before the model is
+    loaded (the env vars are read at library init) and again after, for
+    libraries that were already imported.
+    """
+    for name in _THREAD_ENV:
+        os.environ[name] = str(threads)
+
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # only allowed before the first parallel op
+            pass
+
+
+def _layout_pages(factory, pdf_path, start, count):
+    """Calibration task: render + layout-detect count pages, nothing else."""
+    try:
+        from .workers import get_processor
+    except ImportError:
+        from workers import get_processor
+
+    processor = get_processor(factory)
+    with PyMuPDFPageSource(pdf_path) as source:
+        start %= max(1, source.page_count)
+        pages = range(start, min(start + count, source.page_count))
+        for batch in page_batches(pages, processor.layout_batch_size):
+            detect_layouts(processor.yolo, source, batch, processor.layout_dpi)
+    return len(pages)
+
+
+def _noop():
+    return None
+
+
+def calibrate(factory, pdf_path, max_workers: int = 4, pages_per_worker: int = CALIBRATION_PAGES,
+              pin: bool = False, cpus: int = None):
+    """
+    Time layout throughput for each workers x threads split of the CPUs
+    (workers = 1, 2, 4, ... up to max_workers) on pdf_path and return the
+    fastest (workers, threads). Worker startup is excluded from the timing.
+    """
+    try:
+        from .workers import RecyclingPool, init_worker
+    except ImportError:
+        from workers import RecyclingPool, init_worker
+
+    cpus = cpus or available_cpus()
+    candidates = []
+    workers = 1
+    while workers <= min(cpus, max_workers):
+        candidates.append((workers, max(1, cpus // workers)))
+        workers *= 2
+
+    best = None
+    for workers, threads in candidates:
+        with RecyclingPool(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(factory,),
+            threads=threads,
+            cpu_sets=cpu_sets(workers, threads) if pin else None,
+            max_tasks=0, max_pages=0, max_rss_mb=0,
+        ) as pool:
+            # start (and warm up) every worker before the clock runs
+            for f in [pool.submit(_noop) for _ in range(workers)]:
+                f.result()
+
+            start = time.perf_counter()
+            futures = [
+                pool.submit(_layout_pages, factory, pdf_path, k * pages_per_worker, pages_per_worker)
+                for k in range(workers)
+            ]
+            pages = sum(f.result() for f in futures)
+            elapsed = time.perf_counter() - start
+
+        rate = pages / elapsed if elapsed else 0.0
+        print(f"[CALIBRATE] {workers} workers x {threads} threads → {rate:.1f} pages/s")
+        if best is None or rate > best[2]:
+            best = (workers, threads, rate)
+
+    return best
+
+
+def resolve_plan(default_workers: int, factory=None, sample_pdf: str = None):
+    """
+    The plan for this run: explicit MAX_WORKERS_OVERRIDE / WORKER_THREADS win,
+    then a cached or fresh calibration when CPU_CALIBRATE=true, then the
+    default worker count with the CPUs split evenly.
+
+    Returns {"workers", "threads", "cpus", "cpu_sets"}.
+    """
+    cpus = available_cpus()
+    workers = _env_int("MAX_WORKERS_OVERRIDE")
+    threads = _env_int("WORKER_THREADS")
+    pin = _env_flag("CPU_PIN")
+
+    if workers is None and threads is None and _env_flag("CPU_CALIBRATE") and factory and sample_pdf:
+        key = f"{cpus}:{default_workers}"
+        cached = {}
+        if os.path.exists(CPU_PLAN_PATH):
+            with open(CPU_PLAN_PATH) as f:
+                cached = json.load(f)
+
+        if key in cached:
+            workers, threads = cached[key]["workers"], cached[key]["threads"]
+        else:
+            workers, threads, rate = calibrate(factory, sample_pdf, default_workers, pin=pin, cpus=cpus)
+            cached[key] = {"workers": workers, "threads": threads, "pages_per_s": rate}
+            if os.path.dirname(CPU_PLAN_PATH):
+                os.makedirs(os.path.dirname(CPU_PLAN_PATH), exist_ok=True)
+            with open(CPU_PLAN_PATH, "w") as f:
+                json.dump(cached, f, indent=2)
+
+    workers, threads = plan(workers, threads, max_workers=default_workers, cpus=cpus)
+    return {
+        "workers": workers,
+        "threads": threads,
+        "cpus": cpus,
+        "cpu_sets": cpu_sets(workers, threads) if pin else None,
+    }
+
+
+def describe(p: dict) -> str:
+    pinned = ", pinned" if p["cpu_sets"] else ""
+    return f"🧮 CPU plan: {p['workers']} workers x {p['threads']} threads on {p['cpus']} CPUs{pinned}"
@@ -0,0 +1,356 @@
+"""
+Duplicate chunk elimination before embedding.
+
+The Synopsys guides repeat a lot: copyright blocks, the same option tables
+in the VHDL, Verilog and SystemVerilog HDL compiler guides. Every copy used
+to be embedded and stored as a vector of its own. Each chunk is now checked,
+before embedding, against the chunks already kept for the same document and
+for the same Milvus collection:
+
+    exact   SHA-256 of the normalized text (case and whitespace folded)
+    near    MinHash of its word shingles, looked up through LSH bands; a
+            candidate is a duplicate when the estimated Jaccard similarity
+            is at least DEDUP_THRESHOLD
+
+A duplicate is not embedded. If the chunk it repeats belongs to another
+source, the source is recorded on that surviving chunk (chunk_sources)
+instead. When the owner is re-ingested or deleted, embedding_.delete_source
+first hands each shared chunk over to one of its other sources, so nothing
+they relied on disappears; a re-ingested owner repeats those chunks like
+any other source instead of storing them again.
+
+The index is a local SQLite file (DEDUP_PATH) kept by the main process.
+Documents in flight at the same time are checked against what was stored
+before them and against themselves, not against each other.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+DEDUP_ENABLED = os.getenv("DEDUP", "true").lower() == "true"
+DEDUP_PATH = os.getenv("DEDUP_PATH", "data/chunk_index.sqlite")
+# the reference manuals repeat whole paragraphs that differ only in the
+# variable they document; those measure about 0.85 and must stay
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+SHINGLE_WORDS = int(os.getenv("DEDUP_SHINGLE_WORDS", "5"))
+
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard share a band, the rest are
+# compared exactly on their signatures
+MINHASH_PERM = 128
+LSH_BANDS = 16
+# candidates read per band bucket; a bucket this full is mostly the same text anyway
+LSH_BUCKET_LIMIT = 50
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# fixed seed: signatures are stored and compared across runs
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 1 << 31, size=MINHASH_PERM).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=MINHASH_PERM).astype(np.uint64)
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+def minhash(text: str) -> np.ndarray:
+    """MINHASH_PERM uint32 minimums over the word shingles of text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hv = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    phv = ((np.outer(hv, _A) + _B) % _MERSENNE) & _MAX_HASH
+    return phv.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+def bands(signature: np.ndarray):
+    rows = MINHASH_PERM // LSH_BANDS
+    return [
+        hashlib.blake2b(signature[b * rows:(b + 1) * rows].tobytes(), digest_size=8).hexdigest()
+        for b in range(LSH_BANDS)
+    ]
+
+
+class ChunkIndex:
+    def __init__(self, path: str = DEDUP_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # used by the dedup and store stage threads; every access goes through _lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT,
+                source TEXT,
+                digest TEXT,
+                signature BLOB,
+                milvus_id INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_digest ON chunks (collection, digest)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (collection, source)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                collection TEXT,
+                band INTEGER,
+                bucket TEXT,
+                chunk_id INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (collection, band, bucket)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk_id)")
+        # the other sources a stored chunk stands in for
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_sources (
+                chunk_id INTEGER,
+                source TEXT,
+                PRIMARY KEY (chunk_id, source)
+            )
+        """)
+        self.conn.commit()
+
+    # ---------------- lookup ----------------
+    def find(self, collection: str, source: str, chunk_digest: str, signature: np.ndarray, buckets=None):
+        """
+        chunk_id of a stored chunk that text repeats, or None: a chunk of
+        another source, or one of source's own that other sources rely on.
+        The latter matter on a re-ingest: delete_source hands them over to
+        those sources instead of deleting them, so the new copy of source
+        has to repeat them rather than store them a second time.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT chunk_id FROM chunks c WHERE collection = ? AND digest = ? AND {self._OTHERS} LIMIT 1",
+                (collection, chunk_digest, source, source)
+            ).fetchone()
+            if row:
+                return row[0]
+
+            seen = set()
+            for band, bucket in enumerate(buckets or bands(signature)):
+                rows = self.conn.execute(
+                    "SELECT c.chunk_id, c.signature FROM bands b JOIN chunks c ON c.chunk_id = b.chunk_id "
+                    f"WHERE b.collection = ? AND b.band = ? AND b.bucket = ? AND {self._OTHERS} LIMIT ?",
+                    (collection, band, bucket, source, source, LSH_BUCKET_LIMIT)
+                ).fetchall()
+                for chunk_id, blob in rows:
+                    if chunk_id in seen:
+                        continue
+                    seen.add(chunk_id)
+                    if similarity(signature, np.frombuffer(blob, dtype=np.uint32)) >= DEDUP_THRESHOLD:
+                        return chunk_id
+        return None
+
+    # chunks c a source may repeat: not its own unless another source shares it
+    _OTHERS = ("(c.source != ? OR EXISTS (SELECT 1 FROM chunk_sources s "
+               "WHERE s.chunk_id = c.chunk_id AND s.source != ?))")
+
+    def sources(self, collection: str, milvus_ids) -> dict:
+        """{milvus_id: [owner, other sources...]} for search hits."""
+        ids = [int(i) for i in milvus_ids]
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT c.milvus_id, c.source, s.source FROM chunks c "
+                f"LEFT JOIN chunk_sources s ON s.chunk_id = c.chunk_id "
+                f"WHERE c.collection = ? AND c.milvus_id IN ({marks}) ORDER BY s.source",
+                [collection] + ids
+            ).fetchall()
+        out = {}
+        for milvus_id, owner, extra in rows:
+            out.setdefault(milvus_id, [owner])
+            if extra:
+                out[milvus_id].append(extra)
+        return out
+
+    # ---------------- updates ----------------
+    def add(self, collection: str, source: str, digests, signatures, milvus_ids):
+        """Register stored chunks (in insert order) so later ones can match them."""
+        with self._lock:
+            for chunk_digest, signature, milvus_id in zip(digests, signatures, milvus_ids):
+                cur = self.conn.execute(
+                    "INSERT INTO chunks (collection, source, digest, signature, milvus_id) VALUES (?, ?, ?, ?, ?)",
+                    (collection, source, chunk_digest, signature.tobytes(), int(milvus_id))
+                )
+                self.conn.executemany(
+                    "INSERT INTO bands (collection, band, bucket, chunk_id) VALUES (?, ?, ?, ?)",
+                    [(collection, band, bucket, cur.lastrowid) for band, bucket in enumerate(bands(signature))]
+                )
+            self.conn.commit()
+
+    def add_sources(self, chunk_ids, source: str):
+        # a source is never listed on a chunk it owns
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO chunk_sources (chunk_id, source) "
+                "SELECT chunk_id, ? FROM chunks WHERE chunk_id = ? AND source != ?",
+                [(source, chunk_id, source) for chunk_id in set(chunk_ids)]
+            )
+            self.conn.commit()
+
+    def handover(self, collection: str, source: str):
+        """
+        (chunk_id, milvus_id, new_owner) for every chunk of source that other
+        sources also rely on; new_owner is the first of them by name.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT c.chunk_id, c.milvus_id, MIN(s.source) FROM chunks c "
+                "JOIN chunk_sources s ON s.chunk_id = c.chunk_id "
+                "WHERE c.collection = ? AND c.source = ? AND s.source != ? GROUP BY c.chunk_id",
+                (collection, source, source)
+            ).fetchall()
+
+    def moved(self, chunk_id: int, milvus_id: int, new_owner: str):
+        # the chunk's vector was re-inserted under new_owner
+        with self._lock:
+            self.conn.execute(
+                "UPDATE chunks SET source = ?, milvus_id = ? WHERE chunk_id = ?",
+                (new_owner, int(milvus_id), chunk_id)
+            )
+            self.conn.execute(
+                "DELETE FROM chunk_sources WHERE chunk_id = ? AND source = ?", (chunk_id, new_owner)
+            )
+            self.conn.commit()
+
+    def release(self, collection: str, source: str):
+        """Forget the chunks source owns and its mentions on other chunks."""
+        with self._lock:
+            owned = "SELECT chunk_id FROM chunks WHERE collection = ? AND source = ?"
+            self.conn.execute(f"DELETE FROM bands WHERE chunk_id IN ({owned})", (collection, source))
+            self.conn.execute(f"DELETE FROM chunk_sources WHERE chunk_id IN ({owned})", (collection, source))
+            self.conn.execute("DELETE FROM chunks WHERE collection = ? AND source = ?", (collection, source))
+            self.conn.execute(
+                "DELETE FROM chunk_sources WHERE source = ? AND chunk_id IN "
+                "(SELECT chunk_id FROM chunks WHERE collection = ?)",
+                (source, collection)
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def chunk_index():
+    """The process's chunk index, or None when DEDUP=false."""
+    global _index
+    if not DEDUP_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = ChunkIndex()
+    return _index
+
+
+# the helpers below take the pipelines' document dicts ("file_name" and
+# "chunks", the chunker's records) and do nothing when DEDUP=false
+def dedupe_document(doc: dict, collection: str) -> dict:
+    """
+    Drop the chunks of doc that repeat an earlier chunk of the document or a
+    stored chunk in collection (see ChunkIndex.find). doc["chunks"] keeps
+    the surviving chunk records in order; doc["dedup"] carries their
+    digests and signatures plus the stored chunks the rest repeat, for
+    register_document. Returns the counts.
+    """
+    counts = {"chunks": len(doc["chunks"]), "exact": 0, "near": 0, "stored": 0}
+    index = chunk_index()
+    if index is None:
+        return counts
+
+    source = doc["file_name"]
+
+    kept, digests, signatures = [], [], []
+    seen = set()
+    local = {}  # (band, bucket) → positions in kept
+    repeats = []  # chunk_ids of stored chunks of other sources
+
+    for chunk in doc["chunks"]:
+        text = chunk["text"]
+        chunk_digest = digest(text)
+        if chunk_digest in seen:
+            counts["exact"] += 1
+            continue
+        signature = minhash(text)
+        buckets = bands(signature)
+        candidates = {k for band, bucket in enumerate(buckets) for k in local.get((band, bucket), ())}
+        if any(similarity(signature, signatures[k]) >= DEDUP_THRESHOLD for k in candidates):
+            counts["near"] += 1
+            continue
+        stored = index.find(collection, source, chunk_digest, signature, buckets)
+        if stored is not None:
+            counts["stored"] += 1
+            repeats.append(stored)
+            continue
+
+        seen.add(chunk_digest)
+        for band, bucket in enumerate(buckets):
+            local.setdefault((band, bucket), []).append(len(kept))
+        kept.append(chunk)
+        digests.append(chunk_digest)
+        signatures.append(signature)
+
+    doc["chunks"] = kept
+    doc["dedup"] = {"digests": digests, "signatures": signatures, "repeats": repeats}
+    return counts
+
+
+def register_document(doc: dict, collection: str, milvus_ids):
+    """After the insert: index the stored chunks and add the source to the ones it repeated."""
+    index = chunk_index()
+    dedup = doc.get("dedup")
+    if index is None or dedup is None:
+        return
+    index.add(collection, doc["file_name"], dedup["digests"], dedup["signatures"], milvus_ids)
+    if dedup["repeats"]:
+        index.add_sources(dedup["repeats"], doc["file_name"])
+
+
+def hit_sources(collection: str, hits) -> dict:
+    """
+    {milvus_id: [sources]} for search hits (with the "source" output
+    field): the chunk's owner and every source deduplicated against it.
+    Just the owner when there is no chunk index here (DEDUP=false, or a
+    query host without the ingest side's DEDUP_PATH).
+    """
+    owners = {hit.id: hit.entity.get("source") for hit in hits}
+    index = chunk_index() if os.path.exists(DEDUP_PATH) else None
+    shared = index.sources(collection, list(owners)) if index is not None else {}
+    return {
+        milvus_id: shared.get(milvus_id) or ([owner] if owner else [])
+        for milvus_id, owner in owners.items()
+    }
+
+
+def describe_dedup(source: str, counts: dict) -> str:
+    dropped = counts["exact"] + counts["near"] + counts["stored"]
+    return (f"[DEDUP] {source}: {counts['chunks'] - dropped}/{counts['chunks']} chunks kept "
+            f"({counts['exact']} exact and {counts['near']} near repeats within the document, "
+            f"{counts['stored']} already stored)")
@@ -4,7 +4,16 @@ from pymilvus import (
     DataType, Collection, utility
 )
 
+try:
+    from .chunker import text_chunk
+    from .dedup import chunk_index, dedupe_document, describe_dedup, register_document
+except ImportError:
+    from chunker import text_chunk
+    from dedup import chunk_index, dedupe_document, describe_dedup, register_document
+
 EMBED_DIM = 3072
+# first and last page of each chunk (1-based, 0 when not known: CHUNK_MODE=text)
+PAGE_FIELDS = ("page_start", "page_end")
 MILVUS_HOST = "localhost"
 MILVUS_PORT = "19530"
 
@@ -53,7 +62,9 @@ def get_or_create_collection(collection_name: str):
         FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=256),
         FieldSchema(name="version", dtype=DataType.VARCHAR, max_length=256),
         FieldSchema(name="stage", dtype=DataType.VARCHAR, max_length=256),
-        FieldSchema(name="tool",dtype=DataType.VARCHAR,max_length=50)
+        FieldSchema(name="tool",dtype=DataType.VARCHAR,max_length=50),
+        FieldSchema(name="page_start", dtype=DataType.INT64),
+        FieldSchema(name="page_end", dtype=DataType.INT64),
     ]
 
     schema = CollectionSchema(fields, description="RAG PDF chunks")
@@ -62,9 +73,16 @@ def get_or_create_collection(collection_name: str):
     collection.load()
     return collection
 
-def milvus_store(
+def has_page_fields(collection) -> bool:
+    # collections created before the page fields were added go on without them
+    names = {field.name for field in collection.schema.fields}
+    return all(name in names for name in PAGE_FIELDS)
+
+
+def milvus_insert(
     collection_name: str,
-    chunks: list[str],
+    chunks: list[dict],
+    embeddings: list[list[float]],
     domain: str,
     stage: str,
     type_: str,
@@ -73,15 +91,16 @@ def milvus_store(
     source: str,
     tool: str
 ):
-    collection = get_or_create_collection(collection_name)
-
-    embeddings = embed_chunks(chunks)
-
     n = len(chunks)
+    if n == 0:
+        # every chunk was a duplicate
+        return []
+
+    collection = get_or_create_collection(collection_name)
 
-    collection.insert([
+    columns = [
         embeddings,
-        chunks,
+        [c["text"] for c in chunks],
         [domain] * n,
         [type_] * n,
         [vendor] * n,
@@ -89,7 +108,89 @@ def milvus_store(
         [version] * n,
         [stage] * n,
         [tool] * n
-    ])
+    ]
+    if has_page_fields(collection):
+        columns += [[c[field] or 0 for c in chunks] for field in PAGE_FIELDS]
+    result = collection.insert(columns)
 
     collection.flush()
     print(f"Inserted {n} records into '{collection_name}','{tool}'")
+    return list(result.primary_keys)
+
+
+def hand_over(collection, collection_name: str, source: str) -> int:
+    """
+    Re-insert the chunks of source that deduplicated sources also rely on
+    under one of those sources, so deleting source keeps them. Returns how
+    many were moved.
+    """
+    index = chunk_index()
+    moves = index.handover(collection_name, source) if index is not None else []
+    if not moves:
+        return 0
+
+    fields = ["embedding", "text", "domain", "type", "vendor", "source", "version", "stage", "tool"]
+    if has_page_fields(collection):
+        fields += PAGE_FIELDS
+    rows = collection.query(
+        expr=f"id in {[milvus_id for _, milvus_id, _ in moves]}",
+        output_fields=[field for field in fields if field != "source"],
+    )
+    by_id = {row["id"]: row for row in rows}
+    moves = [m for m in moves if m[1] in by_id]
+    if not moves:
+        return 0
+
+    copies = [dict(by_id[milvus_id], source=new_owner) for _, milvus_id, new_owner in moves]
+    result = collection.insert([[row[field] for row in copies] for field in fields])
+    for (chunk_id, _, new_owner), milvus_id in zip(moves, result.primary_keys):
+        index.moved(chunk_id, milvus_id, new_owner)
+    print(f"Handed {len(moves)} shared records of '{source}' over to their other sources")
+    return len(moves)
+
+
+def delete_source(collection_name: str, source: str) -> int:
+    """Delete every chunk of source from a collection; returns the count."""
+    if not collection_name or not utility.has_collection(collection_name):
+        return 0
+
+    collection = get_or_create_collection(collection_name)
+    # chunks other sources were deduplicated against stay, under a new owner
+    hand_over(collection, collection_name, source)
+    escaped = source.replace("\\", "\\\\").replace('"', '\\"')
+    result = collection.delete(f'source == "{escaped}"')
+    collection.flush()
+    index = chunk_index()
+    if index is not None:
+        index.release(collection_name, source)
+    print(f"Deleted {result.delete_count} records of '{source}' from '{collection_name}'")
+    return result.delete_count
+
+
+def milvus_store(
+    collection_name: str,
+    chunks: list[str],
+    domain: str,
+    stage: str,
+    type_: str,
+    version: str,
+    vendor: str,
+    source: str,
+    tool: str
+):
+    # repeated chunks are not embedded again; see dedup
+    doc = {"file_name": source, "chunks": [text_chunk(c) for c in chunks]}
+    print(describe_dedup(source, dedupe_document(doc, collection_name)))
+    ids = milvus_insert(
+        collection_name=collection_name,
+        chunks=doc["chunks"],
+        embeddings=embed_chunks([c["text"] for c in doc["chunks"]]) if doc["chunks"] else [],
+        domain=domain,
+        stage=stage,
+        type_=type_,
+        version=version,
+        vendor=vendor,
+        source=source,
+        tool=tool
+    )
+    register_document(doc, collection_name, ids)
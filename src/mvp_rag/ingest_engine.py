@@ -0,0 +1,158 @@
+"""
+Staged ingestion engine.
+
+Documents flow through a chain of stages (extract → metadata → chunk →
+embed → store), each with its own worker threads and a bounded inbox, so
+CPU-bound extraction (run in a process pool by its stage) overlaps with the
+network-bound OpenAI and Milvus calls of the documents ahead of it. A full
+inbox blocks the stage feeding it, which is how backpressure propagates back
+to extraction.
+
+A stage function takes the item (a dict) and returns:
+    the item (possibly updated)  → handed to the next stage
+    a str                        → final status line; the item stops here
+Exceptions become "[ERROR] <name> (<stage>) → <error>" status lines (and
+are passed to on_error(item, stage_name, exc) when given), and an item that
+makes it through the last stage reports "[DONE] <name>".
+"""
+
+import os
+import queue
+import threading
+import time
+
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", "4"))
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = STAGE_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._remaining = self.workers
+        self.stats = {
+            "items": 0,
+            "errors": 0,
+            "busy_s": 0.0,     # time spent inside fn
+            "idle_s": 0.0,     # waiting for upstream
+            "blocked_s": 0.0,  # waiting for room downstream (backpressure)
+            "max_depth": 0,    # deepest this stage's inbox got
+        }
+
+    def _add(self, key, value):
+        with self._lock:
+            self.stats[key] += value
+
+    def put(self, item, stats_of):
+        """Put item into this inbox, charging any wait to stats_of (the producer)."""
+        start = time.perf_counter()
+        self.inbox.put(item)
+        stats_of._add("blocked_s", time.perf_counter() - start)
+        with self._lock:
+            self.stats["max_depth"] = max(self.stats["max_depth"], self.inbox.qsize())
+
+
+class IngestEngine:
+    def __init__(self, stages, name_of=lambda item: item["file_name"], on_error=None):
+        self.stages = list(stages)
+        self.name_of = name_of
+        self.on_error = on_error
+        # stats holder for the feeder, so its blocked time is reported too
+        self.source = Stage("source", None)
+        self.elapsed = 0.0
+        self._results = queue.Queue()
+
+    def _worker(self, k):
+        stage = self.stages[k]
+        nxt = self.stages[k + 1] if k + 1 < len(self.stages) else None
+
+        while True:
+            start = time.perf_counter()
+            item = stage.inbox.get()
+            stage._add("idle_s", time.perf_counter() - start)
+
+            if item is _DONE:
+                with stage._lock:
+                    stage._remaining -= 1
+                    last = stage._remaining == 0
+                if last:
+                    # the whole stage has drained; close the next one
+                    if nxt is None:
+                        self._results.put(_DONE)
+                    else:
+                        for _ in range(nxt.workers):
+                            nxt.put(_DONE, stage)
+                return
+
+            start = time.perf_counter()
+            try:
+                out = stage.fn(item)
+            except Exception as e:
+                stage._add("errors", 1)
+                out = f"[ERROR] {self.name_of(item)} ({stage.name}) → {str(e)}"
+                if self.on_error is not None:
+                    try:
+                        self.on_error(item, stage.name, e)
+                    except Exception as hook_error:
+                        out += f" (on_error failed: {hook_error})"
+            stage._add("busy_s", time.perf_counter() - start)
+            stage._add("items", 1)
+
+            if isinstance(out, str):
+                self._results.put(out)
+            elif nxt is None:
+                self._results.put(f"[DONE] {self.name_of(item)}")
+            else:
+                nxt.put(out, stage)
+
+    def _feed(self, items):
+        first = self.stages[0]
+        try:
+            for item in items:
+                first.put(item, self.source)
+                self.source._add("items", 1)
+        finally:
+            for _ in range(first.workers):
+                first.put(_DONE, self.source)
+
+    def run(self, items):
+        """Push items through every stage; yields status lines as items finish."""
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self._feed, args=(items,), name="ingest-source", daemon=True)]
+        for k, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._worker, args=(k,), name=f"ingest-{stage.name}-{n}", daemon=True)
+                for n in range(stage.workers)
+            ]
+        for t in threads:
+            t.start()
+
+        while True:
+            result = self._results.get()
+            if result is _DONE:
+                break
+            yield result
+
+        for t in threads:
+            t.join()
+        self.elapsed = time.perf_counter() - start
+
+    def summary(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        lines = [
+            f"📊 Stages ({elapsed:.1f}s wall)",
+            f"   {'stage':10} {'workers':>7} {'items':>6} {'errors':>6} {'items/s':>8} "
+            f"{'util':>6} {'idle s':>8} {'blocked s':>10} {'max queue':>10}",
+        ]
+        for stage in [self.source] + self.stages:
+            s = stage.stats
+            util = s["busy_s"] / (stage.workers * elapsed)
+            lines.append(
+                f"   {stage.name:10} {stage.workers:7d} {s['items']:6d} {s['errors']:6d} "
+                f"{s['items'] / elapsed:8.2f} {util:6.0%} {s['idle_s']:8.1f} {s['blocked_s']:10.1f} {s['max_depth']:10d}"
+            )
+        return "\n".join(lines)
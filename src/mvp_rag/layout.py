@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+
+try:
+    from .page_cache import make_key
+except ImportError:
+    from page_cache import make_key
+
+# --------------------------------------------------
+# Batched YOLO layout detection
+# --------------------------------------------------
+LAYOUT_CONF = 0.25
+LAYOUT_BATCH_SIZE = int(os.getenv("LAYOUT_BATCH_SIZE", "8"))
+
+
+def page_batches(pages: range, batch_size: int = LAYOUT_BATCH_SIZE):
+    """Yield sub-ranges of the page indices in pages, batch_size at a time."""
+    batch_size = max(1, int(batch_size))
+    for start in range(pages.start, pages.stop, batch_size):
+        yield range(start, min(start + batch_size, pages.stop))
+
+
+def detect_layout_batch(yolo, images, conf: float = LAYOUT_CONF, dpi: int = 72):
+    """
+    Run the layout model once over a list of page images rendered at dpi.
+
+    Returns one list of boxes per image, in input order. Each box is
+    {"label": str, "conf": float, "bbox": (x0, y0, x1, y1)} in PDF points,
+    so it can be used as a clip rectangle at any render resolution.
+    """
+    if not images:
+        return []
+
+    scale = 72.0 / dpi
+
+    results = yolo(list(images), conf=conf, verbose=False)
+
+    layouts = []
+    for result in results:
+        boxes = []
+        for b in result.boxes:
+            boxes.append({
+                "label": yolo.names[int(b.cls[0])],
+                "conf": float(b.conf[0]),
+                "bbox": tuple(float(v) * scale for v in b.xyxy[0]),
+            })
+        layouts.append(boxes)
+    return layouts
+
+
+def warm_up(yolo, size: int = 640):
+    """One inference on a blank page so lazy model setup is paid before real work."""
+    yolo([np.full((size, size, 3), 255, dtype=np.uint8)], conf=LAYOUT_CONF, verbose=False)
+
+
+def detect_layouts(yolo, source, batch, dpi: int, cache=None, version: str = ""):
+    """
+    Layouts for the pages in batch, in order.
+
+    With a cache, pages whose content fingerprint is already known are
+    served from it without being rendered; only the misses go through one
+    batched YOLO call, and their detections are stored.
+    """
+    keys = {}
+    layouts = {}
+    if cache is not None:
+        for i in batch:
+            keys[i] = make_key(source.fingerprint(i), "layout", version)
+            hit = cache.get(keys[i])
+            if hit is not None:
+                layouts[i] = hit
+
+    misses = [i for i in batch if i not in layouts]
+    if misses:
+        # cheap low-DPI render; only pages sent to Textract are re-rendered
+        page_imgs = [source.render(i, dpi) for i in misses]
+        detected = detect_layout_batch(yolo, page_imgs, dpi=dpi)
+        del page_imgs
+
+        for i, boxes in zip(misses, detected):
+            layouts[i] = boxes
+            if cache is not None:
+                cache.put(keys[i], "layout", boxes)
+
+    return [layouts[i] for i in batch]
+
+
+def has_label(boxes, label: str, min_conf: float = 0.0) -> bool:
+    return any(b["label"] == label and b["conf"] >= min_conf for b in boxes)
+
+
+def _overlap_area(a, b) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def table_regions(boxes, padding: float = 0.0):
+    """
+    Padded "Table" boxes (PDF points), with overlapping boxes merged so the
+    same table is never cropped twice. Sorted top to bottom.
+    """
+    regions = []
+    for b in boxes:
+        if b["label"] != "Table":
+            continue
+        x0, y0, x1, y1 = b["bbox"]
+        regions.append([max(0.0, x0 - padding), max(0.0, y0 - padding), x1 + padding, y1 + padding])
+
+    merged = []
+    for r in sorted(regions, key=lambda r: r[1]):
+        for m in merged:
+            if _overlap_area(r, m) > 0:
+                m[0], m[1] = min(m[0], r[0]), min(m[1], r[1])
+                m[2], m[3] = max(m[2], r[2]), max(m[3], r[3])
+                break
+        else:
+            merged.append(r)
+    return [tuple(m) for m in merged]
+
+
+def covered_by(bbox, regions, min_ratio: float = 0.5) -> bool:
+    """True if at least min_ratio of bbox's area lies inside one of regions."""
+    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    if area <= 0:
+        return False
+    return any(_overlap_area(bbox, r) / area >= min_ratio for r in regions)
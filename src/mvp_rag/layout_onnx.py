@@ -0,0 +1,284 @@
+"""
+ONNX Runtime backend for the layout model.
+
+The PyTorch ultralytics path dominates CPU ingest time. This module exports
+the yolo11m_doc_layout weights to ONNX (optionally INT8-quantized) and runs
+them with onnxruntime behind the same interface PDFProcessor already uses:
+
+    results = model(images, conf=..., verbose=False)
+    results[k].boxes -> b.cls[0], b.conf[0], b.xyxy[0]
+    model.names      -> {class_id: label}
+
+Boxes are filtered on the best class score and de-duplicated with per-class
+NMS, as ultralytics does, so confidence thresholds mean the same thing on
+both backends.
+
+CLI:
+    python src/mvp_rag/layout_onnx.py export
+    python src/mvp_rag/layout_onnx.py export --int8
+    python src/mvp_rag/layout_onnx.py export --int8 --calibration-dir docs
+"""
+
+import argparse
+import ast
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+try:
+    from .raster import LAYOUT_DPI
+except ImportError:
+    from raster import LAYOUT_DPI
+
+# --------------------------------------------------
+# Backend selection
+# --------------------------------------------------
+# "torch" → ultralytics YOLO on the .pt weights
+# "onnx"  → onnxruntime on the exported artifact at LAYOUT_ONNX_PATH
+LAYOUT_BACKEND = os.getenv("LAYOUT_BACKEND", "torch")
+LAYOUT_ONNX_PATH = os.getenv("LAYOUT_ONNX_PATH", "models/yolo11m_doc_layout.onnx")
+LAYOUT_IMGSZ = 640
+LAYOUT_IOU = 0.7
+LAYOUT_MAX_DET = 300
+
+
+class _Box:
+    def __init__(self, cls, conf, xyxy):
+        self.cls = [cls]
+        self.conf = [conf]
+        self.xyxy = [xyxy]
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def _letterbox(img, size):
+    """Resize keeping aspect ratio and pad to size x size, as ultralytics does."""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR) if (nw, nh) != (w, h) else img
+    top = (size - nh) // 2
+    left = (size - nw) // 2
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = resized
+    return out, r, left, top
+
+
+def _nms(boxes, scores, iou):
+    x0, y0, x1, y1 = boxes.T
+    areas = (x1 - x0) * (y1 - y0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]), 0, None)
+        h = np.clip(np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]), 0, None)
+        inter = w * h
+        order = rest[inter / (areas[i] + areas[rest] - inter + 1e-9) <= iou]
+    return np.array(keep, dtype=np.int64)
+
+
+class OnnxLayoutModel:
+    """YOLO-compatible callable over an exported layout model."""
+
+    def __init__(self, path: str, iou: float = LAYOUT_IOU, max_det: int = LAYOUT_MAX_DET, threads: int = None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        # 0 lets onnxruntime use every core; cpu_plan sets LAYOUT_THREADS per worker
+        opts.intra_op_num_threads = threads if threads is not None else int(os.getenv("LAYOUT_THREADS", "0"))
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.ckpt_path = path
+        self.iou = iou
+        self.max_det = max_det
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = {int(k): v for k, v in ast.literal_eval(meta["names"]).items()}
+
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        # static exports fix batch and size; dynamic ones leave them symbolic
+        self.fixed_batch = inp.shape[0] if isinstance(inp.shape[0], int) else None
+        if isinstance(inp.shape[2], int):
+            self.imgsz = inp.shape[2]
+        else:
+            self.imgsz = int(ast.literal_eval(meta.get("imgsz", str([LAYOUT_IMGSZ])))[0])
+
+    def _postprocess(self, pred, conf, r, left, top):
+        pred = pred.T  # (anchors, 4 + classes)
+        scores = pred[:, 4:]
+        cls = scores.argmax(1)
+        best = scores[np.arange(len(cls)), cls]
+        mask = best >= conf
+        if not mask.any():
+            return []
+
+        cx, cy, w, h = pred[mask, :4].T
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        cls = cls[mask]
+        best = best[mask]
+
+        # offset each class so NMS never suppresses across classes
+        keep = _nms(boxes + cls[:, None] * 4096.0, best, self.iou)[:self.max_det]
+
+        out = []
+        for k in keep:
+            x0, y0, x1, y1 = boxes[k]
+            xyxy = np.array([(x0 - left) / r, (y0 - top) / r, (x1 - left) / r, (y1 - top) / r], dtype=np.float32)
+            out.append(_Box(int(cls[k]), float(best[k]), xyxy))
+        return out
+
+    def __call__(self, images, conf: float = 0.25, verbose: bool = False, **_):
+        if isinstance(images, np.ndarray):
+            images = [images]
+
+        prepared = [_letterbox(img, self.imgsz) for img in images]
+        # BGR HWC uint8 → RGB CHW float
+        batch = np.stack([p[0] for p in prepared])[..., ::-1].transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+        step = self.fixed_batch or len(batch)
+        preds = []
+        for start in range(0, len(batch), step):
+            preds.append(self.session.run(None, {self.input_name: batch[start:start + step]})[0])
+        preds = np.concatenate(preds)
+
+        return [
+            _Result(self._postprocess(pred, conf, r, left, top))
+            for pred, (_, r, left, top) in zip(preds, prepared)
+        ]
+
+
+def load_layout_model(weights: str = None, backend: str = LAYOUT_BACKEND):
+    """
+    The layout model for weights. A .onnx path, or backend="onnx", selects
+    onnxruntime (LAYOUT_ONNX_PATH when weights is a .pt); anything else goes
+    through ultralytics.
+    """
+    if weights and weights.endswith(".onnx"):
+        return OnnxLayoutModel(weights)
+    if backend == "onnx":
+        return OnnxLayoutModel(LAYOUT_ONNX_PATH)
+
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+
+# --------------------------------------------------
+# Export
+# --------------------------------------------------
+class _PageCalibrationReader:
+    """Feeds rendered PDF pages to onnxruntime's static INT8 calibration."""
+
+    def __init__(self, input_name, pdf_dir, imgsz, max_pages=64):
+        import fitz
+
+        try:
+            from .raster import render_page
+        except ImportError:
+            from raster import render_page
+
+        self.input_name = input_name
+        self.images = []
+        for name in sorted(os.listdir(pdf_dir)):
+            if not name.lower().endswith(".pdf"):
+                continue
+            with fitz.open(os.path.join(pdf_dir, name)) as doc:
+                for page in doc:
+                    if len(self.images) >= max_pages:
+                        break
+                    self.images.append(render_page(page, LAYOUT_DPI))
+        self.imgsz = imgsz
+        self._it = iter(self.images)
+
+    def get_next(self):
+        img = next(self._it, None)
+        if img is None:
+            return None
+        boxed = _letterbox(img, self.imgsz)[0][..., ::-1].transpose(2, 0, 1)[None]
+        return {self.input_name: np.ascontiguousarray(boxed, dtype=np.float32) / 255.0}
+
+
+def _copy_metadata(src_path, dst_path):
+    # quantization drops the names/imgsz metadata ultralytics writes
+    import onnx
+
+    src = onnx.load(src_path, load_external_data=False)
+    dst = onnx.load(dst_path)
+    existing = {p.key for p in dst.metadata_props}
+    for prop in src.metadata_props:
+        if prop.key not in existing:
+            dst.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(dst, dst_path)
+
+
+def export_onnx(weights: str, out_path: str = LAYOUT_ONNX_PATH, imgsz: int = LAYOUT_IMGSZ,
+                int8: bool = False, calibration_dir: str = None) -> str:
+    """
+    Export the .pt layout weights to ONNX at out_path (dynamic batch).
+
+    With int8, the graph is quantized: statically from rendered pages of
+    calibration_dir when given, otherwise dynamically (weights only).
+    """
+    from ultralytics import YOLO
+
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    if not int8:
+        shutil.move(exported, out_path)
+        return out_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic, quantize_static
+
+    if calibration_dir:
+        import onnxruntime as ort
+
+        input_name = ort.InferenceSession(exported, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        reader = _PageCalibrationReader(input_name, calibration_dir, imgsz)
+        quantize_static(exported, out_path, reader, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    else:
+        quantize_dynamic(exported, out_path, weight_type=QuantType.QUInt8)
+
+    _copy_metadata(exported, out_path)
+    os.remove(exported)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the layout model for the ONNX backend")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export .pt weights to ONNX")
+    export.add_argument("--weights", default=None, help="Defaults to the yolo11m_doc_layout hub weights")
+    export.add_argument("--out", default=LAYOUT_ONNX_PATH)
+    export.add_argument("--imgsz", type=int, default=LAYOUT_IMGSZ)
+    export.add_argument("--int8", action="store_true", help="Quantize to INT8")
+    export.add_argument("--calibration-dir", default=None, help="PDFs for static INT8 calibration")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        weights = args.weights
+        if weights is None:
+            from huggingface_hub import hf_hub_download
+
+            weights = hf_hub_download(
+                repo_id="Armaggheddon/yolo11-document-layout",
+                filename="yolo11m_doc_layout.pt",
+            )
+        path = export_onnx(weights, args.out, args.imgsz, args.int8, args.calibration_dir)
+        print(f"✅ Exported {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
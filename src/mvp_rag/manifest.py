@@ -0,0 +1,248 @@
+"""
+Per-source ingestion manifest.
+
+One row per ingested source (a file name in docs/ or an S3 key) with the
+content hash it was ingested from, the Milvus collection its chunks went
+to and how many there were. diff() sorts the current sources into new,
+changed, unchanged and removed, so a run only re-ingests what actually
+changed and replaces (or purges) the old vectors of changed and removed
+sources.
+
+Files whose size and mtime match the manifest are not re-hashed, so a run
+over an unchanged corpus only stats the files.
+
+Each row also carries an ingestion status for the cron job, which claims
+sources one at a time while the S3 listing is still running:
+
+    pending      claimed by a run, not started yet
+    in-progress  extraction started
+    done         chunks stored (or nothing to store)
+    failed       a stage raised; retried on a later run once its backoff
+                 (RETRY_BASE_S doubling per attempt, capped at RETRY_MAX_S)
+                 has passed, up to RETRY_MAX_ATTEMPTS
+
+A pending or in-progress row left behind by an interrupted run is retried
+on the next one.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "data/ingest_manifest.sqlite")
+
+RETRY_BASE_S = float(os.getenv("RETRY_BASE_S", "900"))
+RETRY_MAX_S = float(os.getenv("RETRY_MAX_S", "86400"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "8"))
+
+# claim() decisions that mean "ingest this source now"
+CLAIMED = ("new", "changed", "retry")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class SourceManifest:
+    _COLUMNS = (
+        "source", "content_hash", "size", "mtime", "collection", "chunks", "updated_at",
+        "status", "attempts", "last_error", "next_attempt_at",
+    )
+    # added after the first release; older files get them on open
+    _STATUS_COLUMNS = {
+        "status": "TEXT DEFAULT 'done'",
+        "attempts": "INTEGER DEFAULT 0",
+        "last_error": "TEXT",
+        "next_attempt_at": "REAL DEFAULT 0",
+    }
+
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # written from the store stage threads; every access goes through _lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sources (
+                source TEXT PRIMARY KEY,
+                content_hash TEXT,
+                size INTEGER,
+                mtime REAL,
+                collection TEXT,
+                chunks INTEGER,
+                updated_at REAL
+            )
+        """)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(sources)")}
+        for name, decl in self._STATUS_COLUMNS.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE sources ADD COLUMN {name} {decl}")
+        self.conn.commit()
+
+    def get(self, source: str):
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM sources WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(zip(self._COLUMNS, row)) if row else None
+
+    def all(self) -> dict:
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(self._COLUMNS)} FROM sources").fetchall()
+        return {row[0]: dict(zip(self._COLUMNS, row)) for row in rows}
+
+    def record(self, source: str, content_hash: str, size: int, mtime: float, collection: str = None, chunks: int = 0):
+        """Mark source as ingested from content_hash."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources "
+                "(source, content_hash, size, mtime, collection, chunks, updated_at, "
+                "status, attempts, last_error, next_attempt_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'done', 0, NULL, 0)",
+                (source, content_hash, size, mtime, collection, chunks, time.time())
+            )
+            self.conn.commit()
+
+    def claim(self, item: dict, now: float = None) -> str:
+        """
+        Decide whether item (a dict with "source", "content_hash", "size" and
+        "mtime") should be ingested by this run. Returns one of
+
+            new, changed, retry      → claimed: the row is now pending and
+                                       item["previous"] holds the old row
+            unchanged                → already done with this content
+            backoff, gave-up         → failed before; not due / out of attempts
+
+        The row keeps its collection, so the vectors of the last successful
+        ingest can still be found and replaced.
+        """
+        now = now or time.time()
+        prev = self.get(item["source"])
+
+        if prev is None:
+            decision = "new"
+        elif prev["content_hash"] != item["content_hash"] or prev["size"] != item["size"]:
+            decision = "changed"
+        elif prev["status"] == "done":
+            if prev["mtime"] != item["mtime"]:
+                self.touch(item["source"], item["size"], item["mtime"])
+            return "unchanged"
+        elif prev["status"] == "failed":
+            if prev["attempts"] >= RETRY_MAX_ATTEMPTS:
+                return "gave-up"
+            if now < (prev["next_attempt_at"] or 0):
+                return "backoff"
+            decision = "retry"
+        else:
+            # pending / in-progress: the run that claimed it never finished
+            decision = "retry"
+
+        # attempts restart when the content changes
+        attempts = prev["attempts"] if decision == "retry" else 0
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO sources (source, content_hash, size, mtime, chunks, updated_at, status, attempts) "
+                "VALUES (?, ?, ?, ?, 0, ?, 'pending', ?) "
+                "ON CONFLICT(source) DO UPDATE SET content_hash = excluded.content_hash, "
+                "size = excluded.size, mtime = excluded.mtime, updated_at = excluded.updated_at, "
+                "status = 'pending', attempts = excluded.attempts",
+                (item["source"], item["content_hash"], item["size"], item["mtime"], now, attempts)
+            )
+            self.conn.commit()
+
+        item["previous"] = prev
+        return decision
+
+    def start(self, source: str):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE sources SET status = 'in-progress', updated_at = ? WHERE source = ?",
+                (time.time(), source)
+            )
+            self.conn.commit()
+
+    def fail(self, source: str, error: str):
+        """Mark source failed and schedule its retry with exponential backoff."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT attempts FROM sources WHERE source = ?", (source,)).fetchone()
+            attempts = (row[0] or 0) + 1 if row else 1
+            delay = min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (attempts - 1))
+            self.conn.execute(
+                "UPDATE sources SET status = 'failed', attempts = ?, last_error = ?, "
+                "next_attempt_at = ?, updated_at = ? WHERE source = ?",
+                (attempts, error[:1000], now + delay, now, source)
+            )
+            self.conn.commit()
+        return attempts
+
+    def status_counts(self) -> dict:
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM sources GROUP BY status").fetchall()
+        return dict(rows)
+
+    def touch(self, source: str, size: int, mtime: float):
+        # same content, new mtime (copied / re-downloaded): skip hashing next time
+        with self._lock:
+            self.conn.execute("UPDATE sources SET size = ?, mtime = ? WHERE source = ?", (size, mtime, source))
+            self.conn.commit()
+
+    def remove(self, source: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self.conn.commit()
+
+    def diff(self, items, hash_fn=None) -> dict:
+        """
+        Compare the current sources against the manifest.
+
+        items are dicts with "source", "size" and "mtime", plus either
+        "content_hash" or a hash_fn(item) that computes it (only called when
+        size or mtime differ from the manifest). Returns
+        {"new": [...], "changed": [...], "unchanged": [...], "removed": [...]}
+        where new/changed items gain "content_hash" and "previous" (the old
+        manifest row or None) and removed lists the manifest rows of sources
+        that no longer exist.
+        """
+        known = self.all()
+        out = {"new": [], "changed": [], "unchanged": [], "removed": []}
+
+        for item in items:
+            prev = known.pop(item["source"], None)
+            # rows the cron job left pending / failed never count as ingested
+            done = prev is not None and prev["status"] == "done"
+            if done and prev["size"] == item["size"] and prev["mtime"] == item["mtime"]:
+                out["unchanged"].append(item)
+                continue
+
+            if "content_hash" not in item:
+                item["content_hash"] = hash_fn(item)
+
+            if done and prev["content_hash"] == item["content_hash"]:
+                self.touch(item["source"], item["size"], item["mtime"])
+                out["unchanged"].append(item)
+                continue
+
+            item["previous"] = prev
+            out["changed" if prev else "new"].append(item)
+
+        out["removed"] = list(known.values())
+        return out
+
+    def close(self):
+        self.conn.close()
+
+
+def describe_diff(diff: dict) -> str:
+    return (f"🗂 Manifest: {len(diff['new'])} new, {len(diff['changed'])} changed, "
+            f"{len(diff['unchanged'])} unchanged, {len(diff['removed'])} removed")
@@ -0,0 +1,262 @@
+"""
+Content-addressed per-page extraction cache.
+
+Entries are keyed by a hash of the page content (content stream, images,
+fonts, size) plus the model and parameter version that produced them, so a
+re-run over unchanged pages skips rendering, YOLO and Textract entirely.
+Stored values are YOLO detections ("layout") and parsed Textract output
+("textract"). The cache is a single SQLite file with size-bounded LRU
+eviction.
+
+CLI:
+    python src/mvp_rag/page_cache.py stats
+    python src/mvp_rag/page_cache.py prune --max-mb 256
+    python src/mvp_rag/page_cache.py prune --older-than-days 30
+    python src/mvp_rag/page_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "true").lower() == "true"
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "data/page_cache.sqlite")
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "512"))
+# lookups only touch memory; hit/miss counters and last_access reach the
+# file with the next put, every PAGE_CACHE_FLUSH_EVERY lookups or
+# PAGE_CACHE_FLUSH_S seconds, and on close
+PAGE_CACHE_FLUSH_EVERY = int(os.getenv("PAGE_CACHE_FLUSH_EVERY", "256"))
+PAGE_CACHE_FLUSH_S = float(os.getenv("PAGE_CACHE_FLUSH_S", "30"))
+
+# bump when the stored value format or extraction logic changes
+CACHE_VERSION = "1"
+
+
+def make_key(fingerprint: str, kind: str, *params) -> str:
+    raw = "|".join([CACHE_VERSION, kind, fingerprint, *map(str, params)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    def __init__(self, path: str = PAGE_CACHE_PATH, max_mb: int = PAGE_CACHE_MAX_MB):
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # not yet written: counter deltas and key → (last_access, hits)
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_access = {}
+        self._pending_n = 0
+        self._flushed_at = time.monotonic()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # shared by the Textract threads; every access goes through _lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                value TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)")
+        # covers SUM(size), so the total is read without touching the values
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_size ON entries (size)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def _total_bytes(self) -> int:
+        # every worker writes the same file, so only the table knows the size
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str):
+        """Cached value for key, or None on a miss. Reads only; see flush()."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                self._pending_counts["misses"] += 1
+            else:
+                self.hits += 1
+                self._pending_counts["hits"] += 1
+                _, hits = self._pending_access.get(key, (None, 0))
+                self._pending_access[key] = (time.time(), hits + 1)
+            self._pending_n += 1
+            if (self._pending_n >= PAGE_CACHE_FLUSH_EVERY
+                    or time.monotonic() - self._flushed_at >= PAGE_CACHE_FLUSH_S):
+                self._flush()
+                self.conn.commit()
+        return json.loads(row[0]) if row is not None else None
+
+    def _flush(self):
+        # caller holds _lock and commits
+        for name, n in self._pending_counts.items():
+            if n:
+                self.conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (name, n)
+                )
+        self.conn.executemany(
+            "UPDATE entries SET last_access = MAX(last_access, ?), hits = hits + ? WHERE key = ?",
+            [(at, hits, key) for key, (at, hits) in self._pending_access.items()]
+        )
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_access = {}
+        self._pending_n = 0
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+            self.conn.commit()
+
+    def put(self, key: str, kind: str, value):
+        data = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, data, len(data), now, now)
+            )
+            # one write transaction anyway; eviction also needs fresh last_access
+            self._flush()
+            # the INSERT holds the write lock until commit, so no other worker
+            # changes the size between this read and the eviction
+            if self._total_bytes() > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self.conn.commit()
+
+    def _evict(self, target_bytes: int) -> int:
+        """Drop least recently used entries until the cache fits target_bytes."""
+        removed = 0
+        total = self._total_bytes()
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= target_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        return removed
+
+    def prune(self, max_mb: float = None, older_than_days: float = None) -> int:
+        removed = 0
+        with self._lock:
+            self._flush()
+            if older_than_days is not None:
+                cutoff = time.time() - older_than_days * 86400
+                cur = self.conn.execute("DELETE FROM entries WHERE last_access < ?", (cutoff,))
+                removed += cur.rowcount
+            if max_mb is not None:
+                removed += self._evict(int(max_mb * 1024 * 1024))
+            self.conn.commit()
+        self.conn.execute("VACUUM")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._pending_access = {}
+            self._pending_n = 0
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM counters")
+            self.conn.commit()
+        self.conn.execute("VACUUM")
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush()
+            self.conn.commit()
+            by_kind = {
+                kind: {"entries": n, "bytes": size}
+                for kind, n, size in self.conn.execute(
+                    "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY kind"
+                )
+            }
+            counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+
+        lookups = self.hits + self.misses
+        total_lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "entries": sum(k["entries"] for k in by_kind.values()),
+            "bytes": sum(k["bytes"] for k in by_kind.values()),
+            "by_kind": by_kind,
+            "session_hits": self.hits,
+            "session_misses": self.misses,
+            "session_hit_rate": self.hits / lookups if lookups else 0.0,
+            "total_hits": counters.get("hits", 0),
+            "total_misses": counters.get("misses", 0),
+            "total_hit_rate": counters.get("hits", 0) / total_lookups if total_lookups else 0.0,
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+# PDFProcessor(page_cache=...) default; an explicit None turns the cache off
+DEFAULT_CACHE = object()
+
+
+def default_page_cache():
+    """The shared on-disk cache, or None when PAGE_CACHE=false."""
+    return PageCache() if PAGE_CACHE_ENABLED else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and prune the page extraction cache")
+    parser.add_argument("--path", default=PAGE_CACHE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Show size, entry counts and hit rate")
+    prune = sub.add_parser("prune", help="Evict entries")
+    prune.add_argument("--max-mb", type=float, default=None, help="Evict LRU entries down to this size")
+    prune.add_argument("--older-than-days", type=float, default=None, help="Drop entries not used for N days")
+    sub.add_parser("clear", help="Remove every entry")
+
+    args = parser.parse_args()
+    cache = PageCache(args.path)
+
+    if args.command == "stats":
+        s = cache.stats()
+        print(f"📦 Cache file     : {args.path}")
+        print(f"   Entries        : {s['entries']}")
+        print(f"   Size           : {s['bytes'] / 1024 / 1024:.1f} MB (limit {PAGE_CACHE_MAX_MB} MB)")
+        for kind, k in sorted(s["by_kind"].items()):
+            print(f"   {kind:14} : {k['entries']} entries, {k['bytes'] / 1024 / 1024:.1f} MB")
+        print(f"   Hit rate       : {s['total_hit_rate']:.1%} ({s['total_hits']} hits / {s['total_misses']} misses)")
+
+    elif args.command == "prune":
+        if args.max_mb is None and args.older_than_days is None:
+            parser.error("prune needs --max-mb and/or --older-than-days")
+        removed = cache.prune(max_mb=args.max_mb, older_than_days=args.older_than_days)
+        print(f"🧹 Removed {removed} entries")
+
+    elif args.command == "clear":
+        cache.clear()
+        print("🧹 Cache cleared")
+
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
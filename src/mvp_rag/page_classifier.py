@@ -0,0 +1,155 @@
+"""
+Cheap per-page pre-classification: does a page need layout detection?
+
+Only the text layer and the vector drawing list are read (no rendering).
+Pages that cannot hold a table or a picture skip the render + YOLO pass and
+go straight to the native text path.
+
+Modes (PAGE_SKIP_MODE):
+    off          → every page gets layout detection
+    conservative → skip blank pages and table-of-contents / index pages
+    aggressive   → also skip plain prose pages and near-empty pages
+
+Any page with images, or vertical rulings that could frame a table, is
+always sent to layout detection.
+
+Report how many pages each mode would skip:
+    python src/mvp_rag/page_classifier.py
+"""
+
+import argparse
+import os
+import re
+from collections import Counter
+
+import fitz
+
+PAGE_SKIP_MODE = os.getenv("PAGE_SKIP_MODE", "conservative")
+SKIP_MODES = ("off", "conservative", "aggressive")
+
+RULE_MIN_LENGTH = 20.0  # points; shorter strokes are glyph decoration
+RULE_MAX_THICKNESS = 2.0
+
+# "Setting Clocks ........ 3-12", "create_clock, 23, 45", bare page numbers
+_TOC_LINE = re.compile(
+    r"(?:\.\s*){4,}\s*[\w-]*\d+$"
+    r"|,\s*\d+(?:-\d+)?(?:\s*,\s*\d+(?:-\d+)?)*$"
+    r"|^(?:\d+(?:-\d+)?|[ivxlc]+)$",
+    re.IGNORECASE,
+)
+
+
+def _rules(drawings):
+    """Count (horizontal, vertical) ruling lines in a get_drawings() list."""
+    h = v = 0
+    for path in drawings:
+        for item in path["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                dx, dy = abs(p2.x - p1.x), abs(p2.y - p1.y)
+            elif item[0] == "re":
+                dx, dy = item[1].width, item[1].height
+            else:
+                continue
+
+            if dx >= RULE_MIN_LENGTH and dy <= RULE_MAX_THICKNESS:
+                h += 1
+            elif dy >= RULE_MIN_LENGTH and dx <= RULE_MAX_THICKNESS:
+                v += 1
+    return h, v
+
+
+def page_features(page) -> dict:
+    text = page.get_text()
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    drawings = page.get_drawings()
+    h_rules, v_rules = _rules(drawings)
+
+    n = len(lines) or 1
+    return {
+        "chars": len(text.strip()),
+        "lines": len(lines),
+        "images": len(page.get_images()),
+        "drawings": len(drawings),
+        "h_rules": h_rules,
+        "v_rules": v_rules,
+        "toc_ratio": sum(bool(_TOC_LINE.search(line)) for line in lines) / n,
+        "short_ratio": sum(len(line.split()) <= 3 for line in lines) / n,
+    }
+
+
+def skip_reason(features: dict, mode: str = PAGE_SKIP_MODE):
+    """Why the page can skip layout detection under mode, or None if it needs it."""
+    if mode == "off":
+        return None
+
+    # anything that could be a picture, scan or ruled table
+    if features["images"] or features["v_rules"] >= 2:
+        return None
+
+    if not features["chars"]:
+        # vector-only pages may be diagrams
+        return "blank" if not features["drawings"] else None
+
+    if features["lines"] >= 5 and features["toc_ratio"] >= 0.5:
+        return "toc"
+
+    if mode != "aggressive":
+        return None
+
+    if features["drawings"] > 12 or features["h_rules"] > 3:
+        return None
+    if features["chars"] < 200:
+        return "sparse"
+    # borderless tables show up as many short cell lines
+    if features["short_ratio"] <= 0.35:
+        return "prose"
+    return None
+
+
+def classify_page(page, mode: str = PAGE_SKIP_MODE):
+    if mode == "off":
+        return None
+    return skip_reason(page_features(page), mode)
+
+
+def main():
+    try:
+        from .document_loader import loading_docs
+    except ImportError:
+        from document_loader import loading_docs
+
+    parser = argparse.ArgumentParser(description="Count pages in docs/ each skip mode sends past layout detection")
+    parser.parse_args()
+
+    docs = loading_docs()
+    modes = [m for m in SKIP_MODES if m != "off"]
+    totals = {m: Counter() for m in modes}
+    total_pages = 0
+
+    print(f"{'document':45} {'pages':>6} " + " ".join(f"{m:>13}" for m in modes))
+    for doc in docs:
+        counts = {m: Counter() for m in modes}
+        with fitz.open(doc["file_path"]) as pdf:
+            for page in pdf:
+                features = page_features(page)
+                for m in modes:
+                    counts[m][skip_reason(features, m) or "detect"] += 1
+            pages = pdf.page_count
+
+        total_pages += pages
+        cells = []
+        for m in modes:
+            totals[m].update(counts[m])
+            cells.append(f"{pages - counts[m]['detect']:13d}")
+        print(f"{doc['file_name'][:45]:45} {pages:6d} " + " ".join(cells))
+
+    for m in modes:
+        skipped = total_pages - totals[m]["detect"]
+        reasons = ", ".join(f"{r} {n}" for r, n in sorted(totals[m].items()) if r != "detect")
+        share = skipped / total_pages if total_pages else 0.0
+        print(f"TOTAL {m:12} skipped {skipped}/{total_pages} pages ({share:.1%}): {reasons or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import hashlib
+import io
+import mmap
+
+import fitz
+
+try:
+    from .raster import render_page
+except ImportError:
+    from raster import render_page
+
+# --------------------------------------------------
+# Page sources
+# --------------------------------------------------
+# A page source gives PDFProcessor everything it needs from a document:
+#   page_count, text(i), text_blocks(i), has_text(i, clip=None),
+#   render(i, dpi, clip=None), page(i), fingerprint(i), close()
+# Any object with that interface can be passed as PDFProcessor(page_source=...).
+
+
+class PyMuPDFPageSource:
+    """
+    Text, page images and page count from a single PyMuPDF handle.
+
+    pdf_input is a file path or the raw PDF bytes. A path is read from disk
+    as pages are used rather than loaded whole. pypdf is only used as an
+    optional per-page fallback when PyMuPDF fails to extract text from a page
+    that has fonts; its reader is created lazily the first time that happens,
+    over a memory map of the file (pypdf would otherwise read it all into
+    memory).
+    """
+
+    def __init__(self, pdf_input, pypdf_fallback: bool = True):
+        self._pdf_input = pdf_input
+        self._pypdf_fallback = pypdf_fallback
+        self._reader = None
+        self._mmap = None
+        self._xref_digests = {}
+        self._fingerprints = {}
+        self.fallback_pages = 0
+
+        if isinstance(pdf_input, (bytes, bytearray)):
+            self.doc = fitz.open(stream=pdf_input, filetype="pdf")
+        else:
+            self.doc = fitz.open(pdf_input)
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def page(self, i):
+        return self.doc[i]
+
+    def render(self, i, dpi, clip=None):
+        return render_page(self.doc[i], dpi, clip)
+
+    def text(self, i) -> str:
+        page = self.doc[i]
+        try:
+            text = page.get_text()
+        except Exception:
+            text = ""
+
+        if not text.strip() and self._pypdf_fallback and page.get_fonts():
+            fallback = self._pypdf_text(i)
+            if fallback:
+                self.fallback_pages += 1
+                return fallback
+
+        return text
+
+    def has_text(self, i, clip=None) -> bool:
+        """False for scanned / image-only pages (or regions) with no text layer."""
+        return bool(self.doc[i].get_text(clip=clip).strip())
+
+    def text_blocks(self, i):
+        """Native text blocks as (x0, y0, x1, y1, text) in PDF points, top to bottom."""
+        blocks = self.doc[i].get_text("blocks", sort=True)
+        return [b[:5] for b in blocks if b[6] == 0]
+
+    def fingerprint(self, i) -> str:
+        """
+        Content hash of page i: size, rotation, content stream, and the raw
+        streams of its images and form XObjects plus its font names. Identical
+        pages hash the same across files and runs; nothing is rendered.
+        """
+        if i in self._fingerprints:
+            return self._fingerprints[i]
+
+        page = self.doc[i]
+        h = hashlib.blake2b(digest_size=20)
+        h.update(repr((tuple(page.rect), page.rotation)).encode())
+        h.update(page.read_contents())
+        for img in page.get_images(full=True):
+            h.update(self._xref_digest(img[0]))
+        for xobj in page.get_xobjects():
+            h.update(self._xref_digest(xobj[0]))
+        for font in page.get_fonts(full=True):
+            h.update(font[3].encode("utf-8", "replace"))
+
+        self._fingerprints[i] = h.hexdigest()
+        return self._fingerprints[i]
+
+    def _xref_digest(self, xref) -> bytes:
+        # images and forms are often shared between pages; hash each once
+        if xref not in self._xref_digests:
+            raw = self.doc.xref_stream_raw(xref) or b""
+            self._xref_digests[xref] = hashlib.blake2b(raw, digest_size=20).digest()
+        return self._xref_digests[xref]
+
+    def _pypdf_text(self, i) -> str:
+        try:
+            if self._reader is None:
+                from pypdf import PdfReader
+
+                if isinstance(self._pdf_input, (bytes, bytearray)):
+                    self._reader = PdfReader(io.BytesIO(self._pdf_input))
+                else:
+                    with open(self._pdf_input, "rb") as f:
+                        self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._reader = PdfReader(self._mmap)
+            return self._reader.pages[i].extract_text() or ""
+        except Exception:
+            return ""
+
+    def close(self):
+        self.doc.close()
+        self._reader = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,75 +1,222 @@
 import os
 import sys
 from dotenv import load_dotenv
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from functools import partial
 
 sys.path.append("src/mvp_rag")
 
 from text_extraction_ import PDFProcessor
-from chunker import chunk_text
-from embedding_ import milvus_store
+from chunker import chunk_records, estimate_tokens, split_pages
+from embedding_ import embed_chunks, milvus_insert, delete_source
 from metadata_ import extract_metadata
 from document_loader import loading_docs
+from sharding import SHARD_PAGES, plan_shards, document_tasks, extract_document
+from workers import RecyclingPool, init_worker, get_processor, drain, startup_summary
+from cpu_plan import describe, resolve_plan
+from ingest_engine import IngestEngine, Stage
+from manifest import SourceManifest, describe_diff, file_sha256
+from checkpoint import process_checkpoint, resume_extract, embed_batches, load_saved, save_progress, clear_checkpoint
+from dedup import dedupe_document, describe_dedup, register_document
+from boilerplate import boilerplate_filter, describe_boilerplate
 
 load_dotenv()
 
 YOLO_MODEL_PATH = os.getenv("YOLO")
 MAX_WORKERS = min(os.cpu_count() or 1, 4)
 
+# I/O-bound stages run in threads of the main process
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "2"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", "1"))
 
-def process_single_document(doc: dict):
-    file_path = doc.get("file_path")
-    file_name = doc.get("file_name")
 
-    try:
-        print(f"[START] {file_name}")
+def make_processor():
+    # built once per worker process by init_worker, then reused
+    return PDFProcessor(YOLO_MODEL_PATH)
 
-        processor = PDFProcessor(YOLO_MODEL_PATH)
-        raw_text = processor.process_pdf(file_path)
 
-        if not raw_text or not raw_text.strip():
-            return f"[SKIP] Empty PDF: {file_name}"
+def extract_shard(task: dict) -> str:
+    start, stop = task["page_range"]
+    print(f"[START] {task['file_name']} pages {start + 1}-{stop} ({task['shard'] + 1}/{task['shards']})")
 
+    processor = get_processor(make_processor)
+    # pages already checkpointed by an earlier, interrupted run are not redone
+    return resume_extract(
+        process_checkpoint(), task["file_name"], task["content_hash"],
+        lambda page_range: processor.iter_pages(task["file_path"], page_range),
+        task["page_range"],
+    )
+
+
+def retire_previous(doc: dict, collection_name: str = None):
+    # replace-by-source: a changed file's old chunks go right before the new ones land
+    previous = doc.get("previous")
+    if previous and previous["collection"]:
+        delete_source(previous["collection"], doc["file_name"])
+    elif collection_name:
+        # not in the manifest: on the first run after it was introduced every
+        # file is "new", but its chunks from earlier runs are already stored
+        delete_source(collection_name, doc["file_name"])
+
+
+def skip_document(manifest, doc: dict, status: str) -> str:
+    # nothing to index, but remember the content so it is not retried
+    retire_previous(doc)
+    manifest.record(doc["file_name"], doc["content_hash"], doc["size"], doc["mtime"])
+    clear_checkpoint(doc["file_name"])
+    return status
+
+
+def metadata_stage(manifest, doc: dict):
+    raw_text = doc.get("raw_text")
+    if not raw_text or not raw_text.strip():
+        return skip_document(manifest, doc, f"[SKIP] Empty PDF: {doc['file_name']}")
+
+    doc["metadata"] = load_saved(doc)["metadata"]
+    if doc["metadata"] is None:
         metadata = extract_metadata(raw_text)
         print(metadata)
-        domain = metadata.get("domain", "default")
-        stage = metadata.get("stage", "unknown")
-        doc_type = metadata.get("type", "unknown")
-        version = metadata.get("version", "unknown")
-        vendor = metadata.get("vendor", "unknown")
-        tool = metadata.get("Tool", "unknown")
-
-        collection_name = domain.replace(" ","_")
-        tool = tool.replace(" ","_")
-        chunks = chunk_text(raw_text)
-        if not chunks:
-            return f"[SKIP] No chunks: {file_name}"
-
-        milvus_store(
-            collection_name=collection_name,
-            chunks=chunks,
-            domain=domain,
-            stage=stage,
-            type_=doc_type,
-            version=version,
-            vendor=vendor,
-            source=file_name,
-            tool=tool
-        )
-
-        return f"[DONE] {file_name}"
-
-    except Exception as e:
-        return f"[ERROR] {file_name} → {str(e)}"
+        doc["metadata"] = {
+            "domain": metadata.get("domain", "default"),
+            "stage": metadata.get("stage", "unknown"),
+            "type": metadata.get("type", "unknown"),
+            "version": metadata.get("version", "unknown"),
+            "vendor": metadata.get("vendor", "unknown"),
+            "tool": metadata.get("Tool", "unknown").replace(" ","_"),
+        }
+        save_progress(doc, metadata=doc["metadata"])
+    return doc
+
+
+def chunk_stage(manifest, doc: dict):
+    raw_text = doc.pop("raw_text")
+    # reuse the checkpointed chunks so their embedded batches still line up;
+    # ones saved as plain strings (no page span) are chunked again
+    doc["chunks"] = load_saved(doc)["chunks"]
+    if doc["chunks"] is None or any(isinstance(c, str) for c in doc["chunks"]):
+        # the page records go through the boilerplate filter (repeated page
+        # headers / footers) into the chunker without being joined back
+        # into one text; CHUNK_MODE picks the strategy, see chunker
+        records = split_pages(raw_text)
+        boilerplate = boilerplate_filter()
+        if boilerplate is not None:
+            records = boilerplate.filter(records)
+        # {"text", "page_start", "page_end", "tokens"} records, kept
+        # through embed and store
+        doc["chunks"] = list(chunk_records(records))
+        if boilerplate is not None:
+            print(describe_boilerplate(boilerplate.report(doc["file_name"])))
+        save_progress(doc, chunks=doc["chunks"])
+    if not doc["chunks"]:
+        return skip_document(manifest, doc, f"[SKIP] No chunks: {doc['file_name']}")
+    return doc
+
+
+def dedup_stage(doc: dict):
+    # repeats of this document's own chunks or of another source's stored
+    # chunks are not embedded; the source is recorded on the stored chunk
+    counts = dedupe_document(doc, doc["metadata"]["domain"].replace(" ","_"))
+    print(describe_dedup(doc["file_name"], counts))
+    return doc
+
+
+def embed_stage(doc: dict):
+    # token counts pack each embedding request up to EMBED_BATCH_TOKENS;
+    # counted here unless the chunker already did (CHUNK_MODE=tokens)
+    texts = [c["text"] for c in doc["chunks"]]
+    tokens = [c["tokens"] for c in doc["chunks"]]
+    if None in tokens:
+        tokens = estimate_tokens(texts)
+    doc["embeddings"] = embed_batches(
+        process_checkpoint(), doc["file_name"], doc["content_hash"], texts, embed_chunks,
+        token_counts=tokens,
+    )
+    return doc
+
+
+def store_stage(manifest, doc: dict):
+    metadata = doc["metadata"]
+    collection_name = metadata["domain"].replace(" ","_")
+
+    # the document's only insert, after every page, chunk and batch is done
+    retire_previous(doc, collection_name)
+    ids = milvus_insert(
+        collection_name=collection_name,
+        chunks=doc["chunks"],
+        embeddings=doc["embeddings"],
+        domain=metadata["domain"],
+        stage=metadata["stage"],
+        type_=metadata["type"],
+        version=metadata["version"],
+        vendor=metadata["vendor"],
+        source=doc["file_name"],
+        tool=metadata["tool"]
+    )
+    register_document(doc, collection_name, ids)
+    manifest.record(
+        doc["file_name"], doc["content_hash"], doc["size"], doc["mtime"],
+        collection_name, len(doc["chunks"])
+    )
+    clear_checkpoint(doc["file_name"])
+    return doc
 
 
 def run_parallel_indexing():
-    documents = loading_docs()
-
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_single_document, doc) for doc in documents]
-        for future in as_completed(futures):
-            print(future.result())
+    # only new and changed files are ingested; removed ones are purged
+    manifest = SourceManifest()
+    items = []
+    for doc in loading_docs():
+        st = os.stat(doc["file_path"])
+        items.append({**doc, "source": doc["file_name"], "size": st.st_size, "mtime": st.st_mtime})
+    diff = manifest.diff(items, hash_fn=lambda d: file_sha256(d["file_path"]))
+    print(describe_diff(diff))
+
+    for row in diff["removed"]:
+        if row["collection"]:
+            delete_source(row["collection"], row["source"])
+        manifest.remove(row["source"])
+        clear_checkpoint(row["source"])
+        print(f"[PURGED] {row['source']}")
+
+    documents = diff["new"] + diff["changed"]
+    if not documents:
+        print("✅ Nothing to ingest")
+        return
+
+    tasks = plan_shards(documents, SHARD_PAGES)
+
+    # workers x threads within the CPUs; MAX_WORKERS_OVERRIDE / WORKER_THREADS /
+    # CPU_PIN / CPU_CALIBRATE (timed on the largest document)
+    cpu = resolve_plan(MAX_WORKERS, make_processor, tasks[0]["file_path"] if tasks else None)
+    print(describe(cpu))
+
+    metrics = multiprocessing.Queue()
+    # workers are replaced between tasks past WORKER_MAX_TASKS / _PAGES / _RSS_MB
+    with RecyclingPool(
+        max_workers=cpu["workers"],
+        initializer=init_worker,
+        initargs=(make_processor, metrics),
+        threads=cpu["threads"],
+        cpu_sets=cpu["cpu_sets"],
+    ) as executor:
+        # extraction in worker processes; the rest overlaps in threads here
+        engine = IngestEngine([
+            Stage("extract", partial(extract_document, executor, extract_fn=extract_shard), cpu["workers"]),
+            Stage("metadata", partial(metadata_stage, manifest), METADATA_CONCURRENCY),
+            Stage("chunk", partial(chunk_stage, manifest)),
+            Stage("dedup", dedup_stage),
+            Stage("embed", embed_stage, EMBED_CONCURRENCY),
+            Stage("store", partial(store_stage, manifest), STORE_CONCURRENCY),
+        ])
+        for result in engine.run(document_tasks(tasks)):
+            print(result)
+
+    print(engine.summary())
+    print(startup_summary(drain(metrics)))
+    print(executor.memory_summary())
+    print(executor.page_summary())
+    manifest.close()
 
 
 if __name__ == "__main__":
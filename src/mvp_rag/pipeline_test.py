@@ -2,14 +2,18 @@ from __future__ import annotations
 
 import os
 import json
+import multiprocessing
 from dotenv import load_dotenv
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import as_completed
 import boto3
 
 from test_text_extraction_ import PDFProcessor
 from chunker import chunk_text
 from embedding_ import milvus_store
 from metadata_ import extract_metadata
+from workers import RecyclingPool, init_worker, get_processor, drain, startup_summary
+from cpu_plan import describe, resolve_plan
+from s3_download import spool_object
 
 # --------------------------------------------------
 # ENV
@@ -81,16 +85,19 @@ def list_s3_pdfs():
 # --------------------------------------------------
 # PER-DOCUMENT WORKER
 # --------------------------------------------------
+def make_processor():
+    # built once per worker process by init_worker, then reused
+    return PDFProcessor(YOLO_MODEL_PATH)
+
+
 def process_single_document(doc):
     try:
         print(f"[START] {doc['file_name']}")
 
-        s3 = get_s3_client()
-        obj = s3.get_object(Bucket=doc["bucket"], Key=doc["key"])
-        pdf_bytes = obj["Body"].read()
-
-        processor = PDFProcessor(YOLO_MODEL_PATH)
-        raw_text = processor.process_pdf(pdf_bytes)
+        # streamed to a temp file and opened from disk, not held in memory
+        processor = get_processor(make_processor)
+        with spool_object(get_s3_client(), doc["bucket"], doc["key"]) as path:
+            raw_text = processor.process_pdf(path)
 
         if not raw_text.strip():
             return f"[SKIP] Empty PDF: {doc['file_name']}"
@@ -138,7 +145,19 @@ def run_scheduled_pipeline():
         print("🚫 No new documents found.")
         return
 
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    # workers x threads within the CPUs; MAX_WORKERS_OVERRIDE / WORKER_THREADS / CPU_PIN
+    cpu = resolve_plan(MAX_WORKERS)
+    print(describe(cpu))
+
+    metrics = multiprocessing.Queue()
+    # workers are replaced between tasks past WORKER_MAX_TASKS / _PAGES / _RSS_MB
+    with RecyclingPool(
+        max_workers=cpu["workers"],
+        initializer=init_worker,
+        initargs=(make_processor, metrics),
+        threads=cpu["threads"],
+        cpu_sets=cpu["cpu_sets"],
+    ) as executor:
         futures = [
             executor.submit(process_single_document, doc)
             for doc in new_docs
@@ -147,6 +166,10 @@ def run_scheduled_pipeline():
         for future in as_completed(futures):
             print(future.result())
 
+    print(startup_summary(drain(metrics)))
+    print(executor.memory_summary())
+    print(executor.page_summary())
+
 # --------------------------------------------------
 # ENTRY
 # --------------------------------------------------
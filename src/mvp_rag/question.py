@@ -9,6 +9,11 @@ from openai import OpenAI
 import json 
 import boto3
 
+try:
+    from .dedup import hit_sources
+except ImportError:
+    from dedup import hit_sources
+
 # -----------------------------
 # Load environment
 # -----------------------------
@@ -153,8 +158,10 @@ def answer_from_milvus(query: str, top_k: int = 20):
         anns_field="embedding",
         param={"metric_type": "IP", "params": {"nprobe": 8}},
         limit=top_k,
-        output_fields=["text"],
+        output_fields=["text", "source"],
     )
+    # a deduplicated chunk stands for every source that contained it
+    sources = hit_sources(collection_name, results[0])
 
     chunks = []
     bedrock = get_bedrock_client()
@@ -192,7 +199,8 @@ def answer_from_milvus(query: str, top_k: int = 20):
             chunks.append({
                 "id": str(hit.id),
                 "score": float(hit.score),
-                "text": text
+                "text": text,
+                "sources": sources.get(hit.id, []),
             })
 
     # Build context correctly
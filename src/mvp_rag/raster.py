@@ -0,0 +1,55 @@
+import os
+
+import cv2
+import fitz
+import numpy as np
+
+# --------------------------------------------------
+# Zero-copy page rasterization
+# --------------------------------------------------
+RENDER_DPI = 300
+# The layout model letterboxes to ~640px, so a letter page at 72 DPI
+# (612x792) already carries all the detail it will use.
+LAYOUT_DPI = int(os.getenv("LAYOUT_DPI", "72"))
+# PIL's default quality, which the Textract path used before
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "75"))
+
+
+class _PixmapBuffer:
+    """Exposes a pixmap's sample buffer to NumPy and keeps the pixmap alive."""
+
+    def __init__(self, pix):
+        self.pix = pix
+        self.__array_interface__ = {
+            "version": 3,
+            "shape": (pix.h, pix.w, pix.n),
+            "strides": (pix.stride, pix.n, 1),
+            "typestr": "|u1",
+            "data": (pix.samples_ptr, False),
+        }
+
+
+def render_page(page, dpi: int = RENDER_DPI, clip=None) -> np.ndarray:
+    """
+    Render a PyMuPDF page straight into an HxWx3 uint8 array in BGR order
+    (the layout ultralytics and OpenCV expect for NumPy input).
+
+    The array is a view over the pixmap's own samples: no PNG round-trip and
+    no extra full-resolution copy. The RGB -> BGR swap is done in place.
+    clip is an optional (x0, y0, x1, y1) rectangle in PDF points; only that
+    region is rasterized.
+    """
+    if clip is not None:
+        clip = fitz.Rect(clip) & page.rect
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False, clip=clip)
+    img = np.asarray(_PixmapBuffer(pix))
+    cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+    return img
+
+
+def encode_jpeg(img: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+    """JPEG-encode a BGR page image (only needed for Textract calls)."""
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buf.tobytes()
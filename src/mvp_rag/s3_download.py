@@ -0,0 +1,87 @@
+"""
+Streaming S3 downloads for the ingestion pipelines.
+
+obj["Body"].read() held each PDF in memory and the worker then opened it
+from those bytes, so every concurrent document cost several times its size
+in RAM. spool_object() streams the body to a temp file in S3_DOWNLOAD_CHUNK_MB
+pieces and hands back the path; PyMuPDF reads pages from disk as it needs
+them. A ByteBudget shared by the download threads caps how many bytes are
+spooled or being processed at once.
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager, nullcontext
+
+S3_SPOOL_DIR = os.getenv("S3_SPOOL_DIR") or None  # None → the system temp dir
+S3_DOWNLOAD_CHUNK_MB = int(os.getenv("S3_DOWNLOAD_CHUNK_MB", "8"))
+S3_MAX_INFLIGHT_MB = int(os.getenv("S3_MAX_INFLIGHT_MB", "1024"))
+
+
+class ByteBudget:
+    """
+    Blocks acquire(n) until n more bytes fit under the limit. An object
+    larger than the whole limit is let through once nothing else is in
+    flight, so it waits rather than deadlocks.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int):
+        with self._cond:
+            if self.in_flight and self.in_flight + n > self.limit:
+                self.waits += 1
+            while self.in_flight and self.in_flight + n > self.limit:
+                self._cond.wait()
+            self.in_flight += n
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, n: int):
+        with self._cond:
+            self.in_flight -= n
+            self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, n: int):
+        self.acquire(n)
+        try:
+            yield
+        finally:
+            self.release(n)
+
+    def summary(self) -> str:
+        return (f"📥 Downloads: peak {self.peak / 1024 / 1024:.0f} MB in flight "
+                f"(limit {self.limit / 1024 / 1024:.0f} MB), {self.waits} waited for room")
+
+
+def default_budget() -> ByteBudget:
+    return ByteBudget(S3_MAX_INFLIGHT_MB * 1024 * 1024)
+
+
+@contextmanager
+def spool_object(s3, bucket: str, key: str, size: int = None, budget: ByteBudget = None):
+    """
+    Download s3://bucket/key to a temp file and yield its path; the file is
+    removed on exit. With a budget, size bytes (the listing's Size, or a
+    HEAD request) are held from before the download until the caller is
+    done with the file.
+    """
+    if budget is not None and size is None:
+        size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+
+    with (budget.hold(size) if budget is not None else nullcontext()):
+        fd, path = tempfile.mkstemp(suffix=".pdf", prefix="s3_", dir=S3_SPOOL_DIR)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+                for chunk in body.iter_chunks(S3_DOWNLOAD_CHUNK_MB * 1024 * 1024):
+                    f.write(chunk)
+            yield path
+        finally:
+            os.remove(path)
@@ -0,0 +1,153 @@
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import fitz
+
+# --------------------------------------------------
+# Page-range sharding for large PDFs
+# --------------------------------------------------
+SHARD_PAGES = int(os.getenv("SHARD_PAGES", "150"))
+
+
+def pdf_page_count(pdf_input) -> int:
+    if isinstance(pdf_input, (bytes, bytearray)):
+        doc = fitz.open(stream=pdf_input, filetype="pdf")
+    else:
+        doc = fitz.open(pdf_input)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def split_page_ranges(page_count: int, shard_pages: int = SHARD_PAGES):
+    """Split [0, page_count) into near-equal (start, stop) ranges of <= shard_pages."""
+    if page_count <= 0:
+        return []
+    if shard_pages <= 0 or page_count <= shard_pages:
+        return [(0, page_count)]
+
+    n = math.ceil(page_count / shard_pages)
+    size = math.ceil(page_count / n)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def plan_shards(documents, shard_pages: int = SHARD_PAGES):
+    """
+    Turn documents ({"file_name", "file_path"}) into extraction tasks.
+
+    Large PDFs become several page-range shards; small ones stay whole.
+    Tasks are ordered largest-first so the long shards start early and the
+    small documents fill the remaining workers, keeping the pool saturated
+    at the tail of the run.
+
+    Each task is the document dict plus
+    "page_range": (start, stop), "shard": k, "shards": n, "pages": stop - start.
+    """
+    tasks = []
+    for doc in documents:
+        page_count = pdf_page_count(doc["file_path"])
+        ranges = split_page_ranges(page_count, shard_pages)
+        for k, (start, stop) in enumerate(ranges):
+            tasks.append({
+                **doc,
+                "page_range": (start, stop),
+                "shard": k,
+                "shards": len(ranges),
+                "pages": stop - start,
+            })
+
+    tasks.sort(key=lambda t: t["pages"], reverse=True)
+    return tasks
+
+
+def document_tasks(tasks):
+    """
+    Group plan_shards tasks back per document, largest document first:
+    the document dict plus "tasks" (its shard tasks) and "pages".
+    """
+    docs = {}
+    for task in tasks:
+        doc = docs.get(task["file_name"])
+        if doc is None:
+            doc = docs[task["file_name"]] = {
+                k: v for k, v in task.items() if k not in ("page_range", "shard", "shards", "pages")
+            }
+            doc["tasks"] = []
+            doc["pages"] = 0
+        doc["tasks"].append(task)
+        doc["pages"] += task["pages"]
+    return sorted(docs.values(), key=lambda d: d["pages"], reverse=True)
+
+
+def merge_shards(parts) -> str:
+    """
+    Join shard outputs back in page order.
+
+    parts is an iterable of (page_range, text). Each shard's text starts
+    with its own page markers, so the result matches a single-pass run.
+    """
+    ordered = sorted(parts, key=lambda p: p[0][0])
+    return "\n".join(text for _, text in ordered)
+
+
+def run_sharded(executor, tasks, extract_fn, finish_fn):
+    """
+    Drive shard extraction and per-document finishing on one executor.
+
+    extract_fn(task) -> text runs for every shard. Once all shards of a
+    document are in, they are merged and finish_fn(task, raw_text) is
+    submitted to the same executor, so indexing of finished documents
+    overlaps with extraction of the rest. Yields finish_fn results, or an
+    "[ERROR] ..." line for a document whose shard failed.
+    """
+    pending = {executor.submit(extract_fn, t): ("extract", t) for t in tasks}
+    parts = {}
+    failed = set()
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, task = pending.pop(future)
+            name = task["file_name"]
+
+            if kind == "finish":
+                yield future.result()
+                continue
+
+            if name in failed:
+                continue
+
+            try:
+                text = future.result()
+            except Exception as e:
+                failed.add(name)
+                parts.pop(name, None)
+                start, stop = task["page_range"]
+                yield f"[ERROR] {name} (pages {start + 1}-{stop}) → {str(e)}"
+                continue
+
+            parts.setdefault(name, []).append((task["page_range"], text))
+            if len(parts[name]) == task["shards"]:
+                raw_text = merge_shards(parts.pop(name))
+                pending[executor.submit(finish_fn, task, raw_text)] = ("finish", task)
+
+
+def extract_document(executor, doc, extract_fn):
+    """
+    Run every shard of one document_tasks() entry on executor and merge them.
+
+    Returns doc with "raw_text" set. A failed shard raises with its page
+    range in the message.
+    """
+    futures = [(task, executor.submit(extract_fn, task)) for task in doc["tasks"]]
+    parts = []
+    for task, future in futures:
+        try:
+            parts.append((task["page_range"], future.result()))
+        except Exception as e:
+            start, stop = task["page_range"]
+            raise RuntimeError(f"pages {start + 1}-{stop}: {e}") from e
+    doc["raw_text"] = merge_shards(parts)
+    return doc
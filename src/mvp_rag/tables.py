@@ -0,0 +1,264 @@
+import os
+import sqlite3
+from concurrent.futures import Future
+
+import fitz
+
+try:
+    from .layout import covered_by, table_regions
+    from .raster import encode_jpeg
+    from .page_cache import make_key
+except ImportError:
+    from layout import covered_by, table_regions
+    from raster import encode_jpeg
+    from page_cache import make_key
+
+# --------------------------------------------------
+# Table output helpers
+# --------------------------------------------------
+# "page"   → send the whole page to Textract and rebuild all of its text
+# "region" → send only the padded YOLO table crops; the rest of the page
+#            comes from the native text layer
+TEXTRACT_MODE = os.getenv("TEXTRACT_MODE", "region")
+TABLE_PADDING = float(os.getenv("TABLE_PADDING", "8"))
+# "textract" → every table goes to Textract
+# "native"   → PyMuPDF's table finder on the text layer only (fully offline)
+# "auto"     → native where the table has a text layer, Textract for
+#              scanned / image-only pages and regions
+TABLE_ENGINE = os.getenv("TABLE_ENGINE", "auto")
+
+
+def table_row(cells) -> str:
+    # every row line holds a "|", one-cell rows too: the chunker takes a
+    # table block to run as far as its rows do
+    if len(cells) == 1:
+        return f"| {cells[0]} |"
+    return " | ".join(cells)
+
+
+def format_table(table, page_num):
+    """Lines for one {row: {col: text}} table, with the usual page header."""
+    lines = [f"\n--- TABLE (Page {page_num}) ---"]
+    for r in sorted(table):
+        row = [table[r].get(c, "") for c in sorted(table[r])]
+        lines.append(table_row(row))
+    return lines
+
+
+def region_lines(ordered, page_num):
+    """
+    Lines for one table crop from extract_ordered_content output.
+
+    Only the tables are kept (text around them is already in the native
+    layer). If Textract found no table in the crop, its plain lines are
+    returned so a YOLO false positive does not lose any text.
+    """
+    tables = [item["content"] for item in ordered if item["type"] == "table"]
+    if not tables:
+        return [item["content"] for item in ordered]
+
+    lines = []
+    for table in tables:
+        lines.extend(format_table(table, page_num))
+    return lines
+
+
+class _Cached:
+    """Stands in for a Textract future when the result came from the page cache."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def done(self):
+        return True
+
+    def result(self):
+        return self._value
+
+
+def ordered_to_cache(ordered):
+    # JSON would turn the int row/col keys of a table into strings
+    out = []
+    for item in ordered:
+        if item["type"] == "table":
+            cells = [[r, c, text] for r, row in item["content"].items() for c, text in row.items()]
+            out.append({"type": "table", "cells": cells})
+        else:
+            out.append(item)
+    return out
+
+
+def ordered_from_cache(data):
+    ordered = []
+    for item in data:
+        if item["type"] == "table":
+            table = {}
+            for r, c, text in item["cells"]:
+                table.setdefault(r, {})[c] = text
+            ordered.append({"type": "table", "content": table})
+        else:
+            ordered.append(item)
+    return ordered
+
+
+def submit_ordered(pool, render, parse, cache=None, key=None):
+    """
+    Textract one image and parse it with parse(blocks) (extract_ordered_content).
+
+    render() is only called on a cache miss. Returns an object whose
+    result() is the parsed ordered content; fresh results are written to
+    the cache as they arrive.
+    """
+    if cache is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return _Cached(ordered_from_cache(hit))
+
+    out = Future()
+
+    def _done(f):
+        try:
+            ordered = parse(f.result()["Blocks"])
+        except Exception as e:
+            out.set_exception(e)
+            return
+        if cache is not None:
+            try:
+                cache.put(key, "textract", ordered_to_cache(ordered))
+            except sqlite3.Error:
+                pass
+        out.set_result(ordered)
+
+    pool.submit(encode_jpeg(render())).add_done_callback(_done)
+    return out
+
+
+def submit_page(pool, source, i, dpi, parse, cache=None):
+    """Whole-page Textract submission; returns [("page", result)]."""
+    key = make_key(source.fingerprint(i), "textract", "page", dpi) if cache is not None else None
+    return [("page", submit_ordered(pool, lambda: source.render(i, dpi), parse, cache, key))]
+
+
+def _interleave(source, i, regions, resolve):
+    """
+    Page i's native text blocks outside the table regions, plus
+    ("region", resolve(region)) for each region, sorted by vertical position.
+    """
+    parts = []
+    for x0, y0, x1, y1, text in source.text_blocks(i):
+        if not covered_by((x0, y0, x1, y1), regions) and text.strip():
+            parts.append((y0, "text", text.strip()))
+
+    for region in regions:
+        parts.append((region[1], "region", resolve(region)))
+
+    parts.sort(key=lambda p: p[0])
+    return [(kind, value) for _, kind, value in parts]
+
+
+def _submit_region(pool, source, i, region, dpi, parse, cache=None):
+    key = None
+    if cache is not None:
+        key = make_key(source.fingerprint(i), "textract", "region", dpi, *(round(v, 1) for v in region))
+    render = lambda: source.render(i, dpi, clip=region)
+    return submit_ordered(pool, render, parse, cache, key)
+
+
+def submit_table_regions(pool, source, i, regions, dpi, parse, cache=None):
+    """
+    Submit each table region of page i to Textract as its own crop and
+    interleave the results with the page's native text blocks by vertical
+    position.
+
+    Returns [(kind, value)] in reading order, where kind is "text" (value
+    is a string) or "region" (value.result() is the parsed crop).
+    """
+    return _interleave(
+        source, i, regions,
+        lambda region: _submit_region(pool, source, i, region, dpi, parse, cache)
+    )
+
+
+# a word box may overlap a cell edge by this much (points) before the
+# table is taken to have cut it in two
+CELL_EDGE_TOLERANCE = 1.0
+
+
+def _splits_words(tab, words) -> bool:
+    """True if a vertical cell edge of tab runs through one of the words."""
+    for row in tab.rows:
+        for cell in row.cells:
+            if cell is None:
+                continue
+            x0, y0, x1, y1 = cell
+            for wx0, wy0, wx1, wy1, *_ in words:
+                if not y0 <= (wy0 + wy1) / 2 <= y1:
+                    continue
+                if any(wx0 + CELL_EDGE_TOLERANCE < x < wx1 - CELL_EDGE_TOLERANCE for x in (x0, x1)):
+                    return True
+    return False
+
+
+def _is_table(rows) -> bool:
+    # at least two rows with two filled cells; framed figures and text
+    # boxes come back as one-column or mostly empty grids
+    return sum(1 for row in rows if sum(1 for cell in row if cell) >= 2) >= 2
+
+
+def native_region_tables(page, region):
+    """
+    extract_ordered_content-style items for one region, from PyMuPDF's
+    table finder on the vector rulings (no network).
+
+    Cells fill the same 1-based {row: {col: text}} structure Textract
+    produces. A table is kept only if it has two filled rows and columns
+    and no cell edge cuts through a word; otherwise the region's plain
+    text is returned, as for a crop Textract finds no table in.
+    """
+    clip = fitz.Rect(region)
+    words = [w for w in page.get_text("words") if fitz.Rect(w[:4]).intersects(clip)]
+
+    ordered = []
+    for tab in page.find_tables(clip=clip).tables:
+        rows = [[" ".join((cell or "").split()) for cell in row] for row in tab.extract()]
+        rows = [row for row in rows if any(row)]
+        if not _is_table(rows) or _splits_words(tab, words):
+            # region_lines keeps only the tables of a region, so one bad
+            # table sends the whole region down the plain-text path
+            ordered = []
+            break
+
+        table = {
+            r: {c: cell for c, cell in enumerate(row, start=1)}
+            for r, row in enumerate(rows, start=1)
+        }
+        ordered.append({"type": "table", "content": table})
+
+    if not ordered:
+        text = page.get_text(clip=clip).strip()
+        if text:
+            ordered.append({"type": "text", "content": text})
+    return ordered
+
+
+def table_parts(source, i, boxes, engine, mode, padding, pool, dpi, parse, cache=None):
+    """
+    Table handling for page i according to the table engine and Textract mode.
+
+    Returns [(kind, value)] parts for PDFProcessor._finish_page: "text"
+    parts carry native text, "region"/"page" parts have value.result()
+    returning extract_ordered_content-style items.
+    """
+    regions = table_regions(boxes, padding)
+
+    if engine == "textract" or (engine == "auto" and not source.has_text(i)):
+        if mode == "region" and regions:
+            return submit_table_regions(pool, source, i, regions, dpi, parse, cache)
+        return submit_page(pool, source, i, dpi, parse, cache)
+
+    def resolve(region):
+        if engine == "auto" and not source.has_text(i, clip=region):
+            return _submit_region(pool, source, i, region, dpi, parse, cache)
+        return _Cached(native_region_tables(source.page(i), region))
+
+    return _interleave(source, i, regions, resolve)
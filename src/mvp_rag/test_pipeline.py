@@ -1,12 +1,15 @@
 import os
 from dotenv import load_dotenv
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 
 from test_extraction_ import PDFProcessor
 from chunker import chunk_text
 from embedding_ import milvus_store
 from metadata_ import extract_metadata
 from document_loader import loading_docs
+from sharding import SHARD_PAGES, plan_shards, run_sharded
+from workers import RecyclingPool, init_worker, get_processor, drain, startup_summary
+from cpu_plan import describe, resolve_plan
 
 load_dotenv()
 
@@ -16,18 +19,22 @@ MAX_WORKERS = min(os.cpu_count(), 4)
 # --------------------------------------------------
 # Worker
 # --------------------------------------------------
-def process_single_document(doc: dict):
-    try:
-        file_path = doc["file_path"]
-        file_name = doc["file_name"]
+def make_processor():
+    # built once per worker process by init_worker, then reused
+    return PDFProcessor()
+
+
+def extract_shard(task: dict) -> str:
+    start, stop = task["page_range"]
+    print(f"[START] {task['file_name']} pages {start + 1}-{stop} ({task['shard'] + 1}/{task['shards']})")
 
-        print(f"[START] {file_name}")
+    processor = get_processor(make_processor)
+    return processor.process_pdf(task["file_path"], page_range=task["page_range"])
 
-        # ✅ NO YOLO PATH — singleton model is used internally
-        processor = PDFProcessor()
 
-        # 1️⃣ Extract text
-        raw_text = processor.process_pdf(file_path)
+def index_document(doc: dict, raw_text: str):
+    file_name = doc["file_name"]
+    try:
         if not raw_text.strip():
             return f"[SKIP] Empty PDF: {file_name}"
 
@@ -64,14 +71,29 @@ def process_single_document(doc: dict):
 def run_parallel_indexing():
     documents = loading_docs()
 
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [
-            executor.submit(process_single_document, doc)
-            for doc in documents
-        ]
-
-        for future in as_completed(futures):
-            print(future.result())
+    # large manuals are split into page-range shards, merged back in order
+    tasks = plan_shards(documents, SHARD_PAGES)
+
+    # workers x threads within the CPUs; MAX_WORKERS_OVERRIDE / WORKER_THREADS /
+    # CPU_PIN / CPU_CALIBRATE (timed on the largest document)
+    cpu = resolve_plan(MAX_WORKERS, make_processor, tasks[0]["file_path"] if tasks else None)
+    print(describe(cpu))
+
+    metrics = multiprocessing.Queue()
+    # workers are replaced between tasks past WORKER_MAX_TASKS / _PAGES / _RSS_MB
+    with RecyclingPool(
+        max_workers=cpu["workers"],
+        initializer=init_worker,
+        initargs=(make_processor, metrics),
+        threads=cpu["threads"],
+        cpu_sets=cpu["cpu_sets"],
+    ) as executor:
+        for result in run_sharded(executor, tasks, extract_shard, index_document):
+            print(result)
+
+    print(startup_summary(drain(metrics)))
+    print(executor.memory_summary())
+    print(executor.page_summary())
 
 
 if __name__ == "__main__":
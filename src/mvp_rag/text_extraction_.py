@@ -1,12 +1,16 @@
-import fitz
-from pypdf import PdfReader
-from PIL import Image
-import numpy as np
-import io
+from collections import Counter, deque
 import boto3
-from ultralytics import YOLO
 from dotenv import load_dotenv
 import os
+
+from layout_onnx import load_layout_model
+from layout import LAYOUT_BATCH_SIZE, LAYOUT_CONF, page_batches, detect_layouts, has_label
+from raster import RENDER_DPI, LAYOUT_DPI, render_page
+from page_source import PyMuPDFPageSource
+from textract_client import TEXTRACT_CONCURRENCY, TEXTRACT_RATE, TextractSubmitter
+from tables import TEXTRACT_MODE, TABLE_PADDING, TABLE_ENGINE, region_lines, table_parts, table_row
+from page_cache import DEFAULT_CACHE, default_page_cache
+from page_classifier import PAGE_SKIP_MODE, classify_page
 load_dotenv()
 
 os.environ["AWS_ACCESS_KEY_ID"] = os.getenv("AWS_ACCESS_KEY_ID")
@@ -21,16 +25,54 @@ class PDFProcessor:
         self,
         yolo_model_path: os.getenv("YOLO"),
         aws_region: str = "us-east-1",
-        yolo_conf_threshold: float = 0.7
+        yolo_conf_threshold: float = 0.7,
+        layout_batch_size: int = LAYOUT_BATCH_SIZE,
+        layout_dpi: int = LAYOUT_DPI,
+        textract_dpi: int = RENDER_DPI,
+        page_source=PyMuPDFPageSource,
+        textract_concurrency: int = TEXTRACT_CONCURRENCY,
+        textract_rate: float = TEXTRACT_RATE,
+        textract_mode: str = TEXTRACT_MODE,
+        table_padding: float = TABLE_PADDING,
+        table_engine: str = TABLE_ENGINE,
+        page_cache=DEFAULT_CACHE,
+        page_skip_mode: str = PAGE_SKIP_MODE
     ):
-        self.yolo = YOLO(yolo_model_path)
+        # ultralytics on .pt weights, onnxruntime on .onnx / LAYOUT_BACKEND=onnx
+        self.yolo = load_layout_model(yolo_model_path)
         self.yolo_conf_threshold = yolo_conf_threshold
+        self.layout_batch_size = layout_batch_size
+        # pages iter_pages may hold back while an earlier page waits on Textract
+        self.max_waiting_pages = max(8, layout_batch_size * 4)
+        self.layout_dpi = layout_dpi
+        self.textract_dpi = textract_dpi
+        self.page_source = page_source
+        self.textract_mode = textract_mode
+        self.table_padding = table_padding
+        self.table_engine = table_engine
+        self.page_cache = default_page_cache() if page_cache is DEFAULT_CACHE else page_cache
+        # off | conservative | aggressive; counts per skip reason (or "detect")
+        self.page_skip_mode = page_skip_mode
+        self.skip_stats = Counter()
+        # cached layouts are only valid for the same model and render settings
+        self.layout_version = f"{getattr(self.yolo, 'ckpt_path', '')}:{layout_dpi}:{LAYOUT_CONF}"
         self.textract = boto3.client("textract", region_name=aws_region)
+        self.textract_pool = TextractSubmitter(
+            self.textract,
+            concurrency=textract_concurrency,
+            rate=textract_rate,
+        )
+
+    def close(self):
+        # workers.init_worker calls this when the worker process exits
+        self.textract_pool.shutdown()
+        if self.page_cache is not None:
+            self.page_cache.close()
 
     @staticmethod
-    def pdf_page_to_image(page, dpi=300):
-        pix = page.get_pixmap(dpi=dpi)
-        return Image.open(io.BytesIO(pix.tobytes("png")))
+    def pdf_page_to_image(page, dpi=RENDER_DPI):
+        # BGR ndarray backed by the pixmap itself (no PNG round-trip)
+        return render_page(page, dpi)
 
     @staticmethod
     def extract_ordered_content(blocks):
@@ -78,66 +120,140 @@ class PDFProcessor:
 
         return ordered_output
 
-    def process_pdf(self, pdf_path: str):
-        reader = PdfReader(pdf_path)
-        doc = fitz.open(pdf_path)
-
+    def process_pdf(self, pdf_path: str, page_range=None):
         final_text = []
+        for record in self.iter_pages(pdf_path, page_range):
+            final_text.append(f"\n----------- page number {record['page_num']} -----------")
+            if record["text"] is not None:
+                final_text.append(record["text"])
+
+        return "\n".join(final_text)
+
+    def iter_pages(self, pdf_path: str, page_range=None):
+        """
+        Yield one record per page, in page order, as soon as the page is done:
+
+        {
+            "page_num": int,          # 1-based
+            "kind": "text" | "table" | "picture",
+            "text": str | None,       # None when the page adds no text
+            "tables": [{row: {col: text}}],
+            "regions": [{"label", "conf", "bbox"}],  # layout boxes, PDF points
+        }
 
-        for i, page in enumerate(reader.pages):
-            page_num = i + 1
-            final_text.append(f"\n----------- page number {page_num} -----------")
+        Table pages wait for their Textract results; pages behind them are
+        held back (to keep page order) but never more than max_waiting_pages.
+        """
+        source = self.page_source(pdf_path)
+        waiting = deque()  # (record, Textract parts or None), oldest first
 
-            text = page.extract_text() or ""
+        try:
+            start, stop = page_range or (0, source.page_count)
+            pages = range(max(0, start), min(stop, source.page_count))
 
-            page_img = self.pdf_page_to_image(doc[i])
-            page_np = np.array(page_img)
+            for batch in page_batches(pages, self.layout_batch_size):
+                # pages the pre-classifier rules out go straight to the text path
+                need = [i for i in batch if not self._skip_layout(source, i)]
+                # cache hits are not rendered; misses share one YOLO call
+                layouts = dict(zip(need, detect_layouts(
+                    self.yolo, source, need, self.layout_dpi,
+                    self.page_cache, self.layout_version
+                )))
 
-            detections = self.yolo(page_np, conf=0.25, verbose=False)[0]
+                for i in batch:
+                    waiting.append(self._process_page(source, i, layouts.get(i, [])))
 
-            has_table = any(self.yolo.names[int(b.cls[0])] == "Table" for b in detections.boxes)
-            has_picture = any(
-                self.yolo.names[int(b.cls[0])] == "Picture"
-                and float(b.conf[0]) >= self.yolo_conf_threshold
-                for b in detections.boxes
+                while waiting and (
+                    self._page_ready(waiting[0][1])
+                    or len(waiting) > self.max_waiting_pages
+                ):
+                    yield self._finish_page(*waiting.popleft())
+
+            while waiting:
+                yield self._finish_page(*waiting.popleft())
+        finally:
+            source.close()
+
+    def _skip_layout(self, source, i):
+        reason = classify_page(source.page(i), self.page_skip_mode)
+        self.skip_stats[reason or "detect"] += 1
+        return reason is not None
+
+    def _process_page(self, source, i, boxes):
+        page_num = i + 1
+        record = {"page_num": page_num, "kind": "text", "text": None, "tables": [], "regions": boxes}
+        parts = None
+
+        text = source.text(i)
+
+        has_table = has_label(boxes, "Table")
+        has_picture = has_label(boxes, "Picture", self.yolo_conf_threshold)
+        if (has_table and table_extraction) and (has_picture and image_summary):
+            record["kind"] = "picture"
+        elif has_table and table_extraction:
+            # native tables resolve now; Textract ones are queued and the
+            # page loop keeps going while they run
+            parts = table_parts(
+                source, i, boxes, self.table_engine, self.textract_mode,
+                self.table_padding, self.textract_pool, self.textract_dpi,
+                self.extract_ordered_content, self.page_cache
             )
-            if (has_table and table_extraction) and (has_picture and image_summary):
-                pass
-            elif has_table and table_extraction:
-                img_bytes = io.BytesIO()
-                page_img.save(img_bytes, format="JPEG")
-
-                response = self.textract.analyze_document(
-                    Document={"Bytes": img_bytes.getvalue()},
-                    FeatureTypes=["TABLES"]
-                )
-
-                ordered = self.extract_ordered_content(response["Blocks"])
-                skip_text_after_table = False
-
-                for item in ordered:
-                    if item["type"] == "table":
-                        final_text.append(f"\n--- TABLE (Page {page_num}) ---")
-                        table = item["content"]
-                        for r in sorted(table):
-                            row = [table[r].get(c, "") for c in sorted(table[r])]
-                            final_text.append(" | ".join(row))
-                        skip_text_after_table = True
-                        continue
-
-                    if skip_text_after_table:
-                        txt = item["content"]
-                        if "|" in txt or len(txt.split()) <= 6:
-                            continue
-                        else:
-                            skip_text_after_table = False
-
-                    final_text.append(item["content"])
-
-            elif has_picture and image_summary:
-                pass
+            record["kind"] = "table"
+
+        elif has_picture and image_summary:
+            record["kind"] = "picture"
 
+        else:
+            record["text"] = text
+
+        return record, parts
+
+    def _textract_lines(self, ordered, page_num):
+        lines = []
+        skip_text_after_table = False
+
+        for item in ordered:
+            if item["type"] == "table":
+                lines.append(f"\n--- TABLE (Page {page_num}) ---")
+                table = item["content"]
+                for r in sorted(table):
+                    row = [table[r].get(c, "") for c in sorted(table[r])]
+                    lines.append(table_row(row))
+                skip_text_after_table = True
+                continue
+
+            if skip_text_after_table:
+                txt = item["content"]
+                if "|" in txt or len(txt.split()) <= 6:
+                    continue
+                else:
+                    skip_text_after_table = False
+
+            lines.append(item["content"])
+
+        return lines
+
+    @staticmethod
+    def _page_ready(parts):
+        return not parts or all(value.done() for kind, value in parts if kind != "text")
+
+    def _finish_page(self, record, parts):
+        if not parts:
+            return record
+
+        page_num = record["page_num"]
+        lines = []
+        for kind, value in parts:
+            if kind == "text":
+                lines.append(value)
+                continue
+
+            ordered = value.result()
+            record["tables"].extend(item["content"] for item in ordered if item["type"] == "table")
+            if kind == "region":
+                lines.extend(region_lines(ordered, page_num))
             else:
-                final_text.append(text)
+                lines.extend(self._textract_lines(ordered, page_num))
 
-        return "\n".join(final_text)
+        record["text"] = "\n".join(lines) if lines else None
+        return record
@@ -0,0 +1,130 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --------------------------------------------------
+# Bounded, rate-limited Textract submission
+# --------------------------------------------------
+TEXTRACT_CONCURRENCY = int(os.getenv("TEXTRACT_CONCURRENCY", "4"))
+# AnalyzeDocument default TPS quota is low; stay under it by default. The
+# rate is for the whole account: every process that submits takes a share
+TEXTRACT_RATE = float(os.getenv("TEXTRACT_RATE", "2"))
+TEXTRACT_MAX_RETRIES = int(os.getenv("TEXTRACT_MAX_RETRIES", "6"))
+
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "ProvisionedThroughputExceededException",
+    "LimitExceededException",
+    "InternalServerError",
+    "ServiceUnavailable",
+}
+
+
+# how many processes split TEXTRACT_RATE; RecyclingPool sets it in each worker
+_rate_share = 1
+
+
+def set_rate_share(processes: int):
+    global _rate_share
+    _rate_share = max(1, processes)
+
+
+def _error_code(exc) -> str:
+    response = getattr(exc, "response", None) or {}
+    return response.get("Error", {}).get("Code", "")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TextractSubmitter:
+    """
+    Runs analyze_document calls in the background.
+
+    At most `concurrency` calls are in flight, calls start at no more than
+    `rate` per second summed over the processes sharing it (set_rate_share),
+    and throttling/5xx errors are retried with full-jitter exponential
+    backoff. submit() blocks once `max_pending` pages are queued
+    so JPEG payloads cannot pile up without bound.
+    """
+
+    def __init__(
+        self,
+        client,
+        concurrency: int = TEXTRACT_CONCURRENCY,
+        rate: float = TEXTRACT_RATE,
+        max_retries: int = TEXTRACT_MAX_RETRIES,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        max_pending: int = None,
+    ):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate / _rate_share
+        self.bucket = TokenBucket(self.rate)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="textract")
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, concurrency) * 4)
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _call(self, image_bytes: bytes, feature_types):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self._count("calls")
+            try:
+                return self.client.analyze_document(
+                    Document={"Bytes": image_bytes},
+                    FeatureTypes=feature_types
+                )
+            except Exception as e:
+                if _error_code(e) not in RETRYABLE_ERRORS or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                attempt += 1
+
+    def submit(self, image_bytes: bytes, feature_types=("TABLES",)):
+        """Queue one page image; returns a Future of the Textract response."""
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._call, image_bytes, list(feature_types))
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,309 @@
+"""
+Per-process state for the ingestion pools.
+
+ProcessPoolExecutor(initializer=init_worker, initargs=(factory, metrics))
+builds one PDFProcessor per worker process (layout model, Textract client
+and submitter, page cache), runs a warm-up inference, and reports how long
+that took. Tasks then call get_processor() and reuse it for every document
+and shard the worker handles.
+
+RecyclingPool runs the same workers but replaces a worker between tasks
+once it has handled too many tasks or pages, or its RSS has grown past a
+ceiling, so long runs do not creep towards the container memory limit.
+"""
+
+import os
+import queue
+import multiprocessing.util
+import resource
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+try:
+    from .layout import warm_up
+    from .cpu_plan import configure_threads
+    from .textract_client import set_rate_share
+except ImportError:
+    from layout import warm_up
+    from cpu_plan import configure_threads
+    from textract_client import set_rate_share
+
+# --------------------------------------------------
+# Worker recycling (0 disables a limit)
+# --------------------------------------------------
+WORKER_MAX_TASKS = int(os.getenv("WORKER_MAX_TASKS", "0"))
+WORKER_MAX_PAGES = int(os.getenv("WORKER_MAX_PAGES", "5000"))
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "4096"))
+
+_processor = None
+_stats = {}
+
+
+def init_worker(factory, metrics=None, warmup: bool = True):
+    """
+    Pool initializer. factory() must build a PDFProcessor and be picklable
+    (a module-level function or functools.partial of the class). The startup
+    record is put on metrics (a multiprocessing.Queue) if one is given.
+    """
+    global _processor
+
+    start = time.perf_counter()
+    _processor = factory()
+    if hasattr(_processor, "close"):
+        # runs when the worker exits (recycled or pool shut down), so its
+        # Textract threads and cache are closed rather than abandoned
+        multiprocessing.util.Finalize(_processor, _processor.close, exitpriority=10)
+    loaded = time.perf_counter()
+    if warmup:
+        warm_up(_processor.yolo)
+    ready = time.perf_counter()
+
+    _stats.update(
+        pid=os.getpid(),
+        load_s=loaded - start,
+        warmup_s=ready - loaded,
+        startup_s=ready - start,
+        tasks=0,
+    )
+    print(f"[WORKER] pid {os.getpid()} ready in {_stats['startup_s']:.2f}s "
+          f"(load {_stats['load_s']:.2f}s, warm-up {_stats['warmup_s']:.2f}s)")
+
+    if metrics is not None:
+        metrics.put(dict(_stats))
+
+
+def get_processor(factory):
+    """This worker's processor; built on first use when not run under init_worker."""
+    if _processor is None:
+        init_worker(factory)
+    return _processor
+
+
+def drain(metrics) -> list:
+    """Every record currently on a metrics queue."""
+    records = []
+    while True:
+        try:
+            records.append(metrics.get(timeout=0.1))
+        except queue.Empty:
+            return records
+
+
+def startup_summary(records) -> str:
+    if not records:
+        return "⏱ Worker startup: no workers reported"
+    n = len(records)
+    mean = sum(r["startup_s"] for r in records) / n
+    load = sum(r["load_s"] for r in records) / n
+    warm = sum(r["warmup_s"] for r in records) / n
+    worst = max(r["startup_s"] for r in records)
+    return (f"⏱ Worker startup: {n} workers, mean {mean:.2f}s "
+            f"(load {load:.2f}s, warm-up {warm:.2f}s), max {worst:.2f}s")
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _init_slot(threads, cpus, workers, initializer, initargs):
+    # TEXTRACT_RATE is account-wide; each worker submits at its share
+    set_rate_share(workers)
+    if threads:
+        configure_threads(threads)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    if initializer is not None:
+        initializer(*initargs)
+    if threads:
+        # torch only exists once the model is loaded
+        configure_threads(threads)
+
+
+def _run_task(fn, *args):
+    """Runs fn in the worker and returns (result, worker snapshot)."""
+    result = fn(*args)
+    _stats["tasks"] = _stats.get("tasks", 0) + 1
+    # every page iter_pages handles is counted in skip_stats
+    skipped = dict(_processor.skip_stats) if _processor is not None else {}
+    return result, {
+        "pid": os.getpid(),
+        "tasks": _stats["tasks"],
+        "pages": sum(skipped.values()),
+        "skipped": skipped,
+        "skip_mode": getattr(_processor, "page_skip_mode", None),
+        "rss_mb": rss_mb(),
+        "peak_mb": peak_rss_mb(),
+    }
+
+
+class RecyclingPool:
+    """
+    Process pool with the submit()/shutdown() surface of ProcessPoolExecutor.
+
+    Each of the max_workers slots is a single-process executor. After every
+    task the slot's worker reports its task and page counts and RSS; if it
+    is over max_tasks, max_pages or max_rss_mb it is shut down and a fresh
+    one (same initializer) takes its place before the slot gets more work.
+
+    threads sizes each worker's native thread pools and cpu_sets (one CPU
+    list per slot) pins them; see cpu_plan. Each worker submits Textract
+    calls at TEXTRACT_RATE / max_workers.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        initializer=None,
+        initargs=(),
+        max_tasks: int = WORKER_MAX_TASKS,
+        max_pages: int = WORKER_MAX_PAGES,
+        max_rss_mb: int = WORKER_MAX_RSS_MB,
+        mp_context=None,
+        threads: int = None,
+        cpu_sets=None,
+    ):
+        self.max_tasks = max_tasks
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._mp_context = mp_context
+        self._init = (threads, cpu_sets, max(1, max_workers), initializer, initargs)
+        self._slot_of = {}
+        # re-entered when a task finishes before add_done_callback returns
+        self._lock = threading.RLock()
+        self._pending = deque()
+        self._idle = [self._new_executor(k) for k in range(max(1, max_workers))]
+        self._all = list(self._idle)
+        self._futures = set()
+        self.workers = {}  # pid -> last snapshot, with the largest peak seen
+        self.recycled = Counter()
+
+    def _new_executor(self, slot_index):
+        threads, cpu_sets, workers, initializer, initargs = self._init
+        cpus = cpu_sets[slot_index] if cpu_sets else None
+        executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=self._mp_context,
+            initializer=_init_slot, initargs=(threads, cpus, workers, initializer, initargs),
+        )
+        self._slot_of[executor] = slot_index
+        return executor
+
+    def submit(self, fn, *args):
+        outer = Future()
+        with self._lock:
+            self._pending.append((fn, args, outer))
+            self._futures.add(outer)
+        outer.add_done_callback(self._futures.discard)
+        self._dispatch()
+        return outer
+
+    def _dispatch(self):
+        with self._lock:
+            while self._pending and self._idle:
+                fn, args, outer = self._pending.popleft()
+                if not outer.set_running_or_notify_cancel():
+                    continue
+                slot = self._idle.pop()
+                inner = slot.submit(_run_task, fn, *args)
+                inner.add_done_callback(partial(self._done, slot, outer))
+
+    def _recycle_reason(self, snap):
+        if self.max_rss_mb and snap["rss_mb"] > self.max_rss_mb:
+            return "rss"
+        if self.max_pages and snap["pages"] >= self.max_pages:
+            return "pages"
+        if self.max_tasks and snap["tasks"] >= self.max_tasks:
+            return "tasks"
+        return None
+
+    def _replace(self, slot, reason):
+        # runs on the old executor's manager thread, so it must not wait
+        slot.shutdown(wait=False)
+        fresh = self._new_executor(self._slot_of.pop(slot))
+        with self._lock:
+            self._all[self._all.index(slot)] = fresh
+        self.recycled[reason] += 1
+        return fresh
+
+    def _done(self, slot, outer, inner):
+        try:
+            result, snap = inner.result()
+        except BrokenProcessPool as e:
+            # the worker died mid-task (OOM kill, segfault)
+            slot = self._replace(slot, "crashed")
+            outer.set_exception(e)
+        except BaseException as e:
+            outer.set_exception(e)
+        else:
+            prev = self.workers.get(snap["pid"])
+            if prev:
+                snap["peak_mb"] = max(snap["peak_mb"], prev["peak_mb"])
+            self.workers[snap["pid"]] = snap
+
+            reason = self._recycle_reason(snap)
+            if reason:
+                print(f"[RECYCLE] pid {snap['pid']} after {snap['tasks']} tasks, "
+                      f"{snap['pages']} pages, {snap['rss_mb']:.0f} MB RSS ({reason})")
+                slot = self._replace(slot, reason)
+            outer.set_result(result)
+
+        with self._lock:
+            self._idle.append(slot)
+        self._dispatch()
+
+    def memory_summary(self) -> str:
+        lines = ["🧠 Worker memory:"]
+        for pid, snap in sorted(self.workers.items()):
+            lines.append(f"   pid {pid:<8} tasks {snap['tasks']:<4} pages {snap['pages']:<6} "
+                         f"peak {snap['peak_mb']:.0f} MB")
+        if self.workers:
+            worst = max(s["peak_mb"] for s in self.workers.values())
+            lines.append(f"   max peak {worst:.0f} MB across {len(self.workers)} workers")
+        recycled = ", ".join(f"{r} {n}" for r, n in sorted(self.recycled.items())) or "none"
+        lines.append(f"   recycled: {recycled}")
+        return "\n".join(lines)
+
+    def page_summary(self) -> str:
+        """Pages per layout-skip reason, summed over every worker seen."""
+        totals = Counter()
+        modes = set()
+        for snap in self.workers.values():
+            totals.update(snap.get("skipped", {}))
+            modes.add(snap.get("skip_mode"))
+        pages = sum(totals.values())
+        lines = [f"📑 Pages: {pages} (PAGE_SKIP_MODE={', '.join(sorted(map(str, modes))) or '-'})"]
+        for reason, n in totals.most_common():
+            label = "layout detection" if reason == "detect" else f"skipped ({reason})"
+            lines.append(f"   {label:<28} {n:<6} {100.0 * n / pages:5.1f}%")
+        return "\n".join(lines)
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            # like ProcessPoolExecutor, let everything already submitted finish
+            wait_futures(list(self._futures))
+        with self._lock:
+            executors = list(self._all)
+            for _, _, outer in self._pending:
+                outer.cancel()
+            self._pending.clear()
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=True)
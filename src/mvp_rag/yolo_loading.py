@@ -1,7 +1,7 @@
-from ultralytics import YOLO
 from huggingface_hub import hf_hub_download
 import threading
 from dotenv import load_dotenv
+from layout_onnx import LAYOUT_BACKEND, LAYOUT_ONNX_PATH, OnnxLayoutModel
 # Thread-safe singleton
 _model = None
 _lock = threading.Lock()
@@ -11,6 +11,14 @@ os.environ["HF_HUB_TIMEOUT"] = "60"
 def get_yolo11m():
     global _model
     if _model is None:
+        if LAYOUT_BACKEND == "onnx":
+            # exported with: python src/mvp_rag/layout_onnx.py export [--int8]
+            _model = OnnxLayoutModel(LAYOUT_ONNX_PATH)
+            print(f"✅ YOLO11m loaded (onnx: {LAYOUT_ONNX_PATH})")
+            return _model
+
+        from ultralytics import YOLO
+
         path = hf_hub_download(
             repo_id="Armaggheddon/yolo11-document-layout",
             filename="yolo11m_doc_layout.pt",
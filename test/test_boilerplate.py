@@ -0,0 +1,85 @@
+import chunker
+from boilerplate import BoilerplateFilter
+
+
+def _page(n, body, header=True):
+    lines = []
+    if header:
+        lines += ["Chapter 1: Synthesis Variables", "Feedback"]
+    lines += body
+    lines += ["Synthesis Variables and Attributes", f"Version T-2022.03 {n}"]
+    return {"page_num": n, "kind": "text", "text": "\n".join(lines), "tables": [], "regions": []}
+
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november".split()
+
+
+def _body(n):
+    # digits are folded in the line keys, so body lines differ in words
+    return [f"{WORDS[n % len(WORDS)]} {WORDS[i]} describes the variable" for i in range(6)]
+
+
+def _pages(n_pages):
+    return [_page(n, _body(n)) for n in range(1, n_pages + 1)]
+
+
+def test_running_header_and_footer_are_removed():
+    boilerplate = BoilerplateFilter(window=8, min_ratio=0.5, min_pages=3, zone_lines=4)
+    out = list(boilerplate.filter(_pages(10)))
+
+    assert [r["page_num"] for r in out] == list(range(1, 11))
+    for record in out:
+        assert record["text"].split("\n") == _body(record["page_num"])
+    assert boilerplate.removed["Feedback"] == 10
+    report = boilerplate.report("doc.pdf", tokens=False)
+    assert report["pages"] == 10 and report["lines"] == 40 and report["share"] > 0
+
+
+def test_lines_repeated_on_few_pages_are_kept():
+    pages = _pages(10)
+    for record in pages[:2]:
+        record["text"] = "Overview\n" + record["text"]
+    boilerplate = BoilerplateFilter(window=8, min_ratio=0.5, min_pages=3, zone_lines=4)
+    out = list(boilerplate.filter(pages))
+    assert out[0]["text"].startswith("Overview\n") and out[1]["text"].startswith("Overview\n")
+
+
+def test_table_rows_are_not_candidates():
+    pages = []
+    for n in range(1, 7):
+        body = ["--- TABLE (Page %d) ---" % n, "Name | Type", "a | b", "closing text %d" % n]
+        pages.append({"page_num": n, "text": "\n".join(body)})
+    out = list(BoilerplateFilter(window=8, min_ratio=0.5, min_pages=3, zone_lines=2).filter(pages))
+    assert all("Name | Type" in r["text"] for r in out)
+
+
+def test_empty_pages_pass_through():
+    pages = _pages(4) + [{"page_num": 5, "text": None}]
+    out = list(BoilerplateFilter(window=4, min_ratio=0.5, min_pages=3).filter(pages))
+    assert out[-1] == {"page_num": 5, "text": None}
+
+
+def test_section_headings_and_entry_names_are_kept():
+    pages = []
+    for n in range(1, 11):
+        name = f"{WORDS[n]}_{WORDS[n + 1]}_mode"
+        pages.append(_page(n, [name, "Data Types", "Description"] + _body(n)))
+    boilerplate = BoilerplateFilter(window=8, min_ratio=0.5, min_pages=3, zone_lines=4)
+    out = list(boilerplate.filter(pages))
+
+    for record in out:
+        lines = record["text"].split("\n")
+        assert lines[1:3] == ["Data Types", "Description"]
+        assert lines[0].endswith("_mode")
+    assert boilerplate.removed["Feedback"] == 10
+    assert "Description" not in boilerplate.removed and "Data Types" not in boilerplate.removed
+
+
+def test_report_estimates_tokens_without_the_tokenizer(monkeypatch):
+    def offline(name=None):
+        raise ConnectionError("no network")
+    monkeypatch.setattr(chunker, "get_encoding", offline)
+    monkeypatch.setattr(chunker, "_encoding_error", None)
+    boilerplate = BoilerplateFilter(window=8, min_ratio=0.5, min_pages=3, zone_lines=4)
+    list(boilerplate.filter(_pages(10)))
+    assert boilerplate.report("doc.pdf")["tokens"] > 0
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+import checkpoint
+from checkpoint import (
+    IngestCheckpoint, embed_batches, is_extracted, join_pages, pack_batches, resume_extract,
+)
+
+
+class FakeExtract:
+    """extract_fn stand-in: n_pages of text, raising before page fail_at on its first call."""
+
+    def __init__(self, n_pages, fail_at=None):
+        self.n_pages = n_pages
+        self.fail_at = fail_at
+        self.calls = []
+
+    def __call__(self, page_range):
+        self.calls.append(page_range)
+        start, stop = page_range
+        for i in range(start, min(stop, self.n_pages)):
+            if self.fail_at is not None and i + 1 == self.fail_at:
+                self.fail_at = None
+                raise RuntimeError(f"Textract gave up on page {i + 1}")
+            yield {"page_num": i + 1, "text": f"text of page {i + 1}"}
+
+
+def _expected(n_pages, start=0, stop=None):
+    return join_pages({"page_num": i + 1, "text": f"text of page {i + 1}"}
+                      for i in range(start, stop or n_pages))
+
+
+@pytest.fixture
+def store(tmp_path):
+    ckpt = IngestCheckpoint(str(tmp_path / "checkpoints.sqlite"))
+    yield ckpt
+    ckpt.close()
+
+
+def test_resume_starts_at_first_missing_page(store):
+    extract = FakeExtract(8, fail_at=4)
+    with pytest.raises(RuntimeError):
+        resume_extract(store, "a.pdf", "h1", extract)
+    assert sorted(store.pages("a.pdf", "h1")) == [1, 2, 3]
+
+    text = resume_extract(store, "a.pdf", "h1", extract)
+    assert extract.calls == [(0, sys.maxsize), (3, sys.maxsize)]
+    assert text == _expected(8)
+    assert store.load("a.pdf", "h1")["page_count"] == 8
+
+
+def test_no_extraction_once_every_page_is_done(store):
+    resume_extract(store, "a.pdf", "h1", FakeExtract(5))
+
+    def must_not_run(page_range):
+        raise AssertionError(f"extract_fn called for {page_range}")
+
+    assert resume_extract(store, "a.pdf", "h1", must_not_run) == _expected(5)
+    assert resume_extract(store, "a.pdf", "h1", must_not_run, page_range=(1, 4)) == _expected(5, 1, 4)
+
+
+def test_shard_resume_stays_in_its_range(store):
+    extract = FakeExtract(10, fail_at=6)
+    with pytest.raises(RuntimeError):
+        resume_extract(store, "a.pdf", "h1", extract, page_range=(3, 7))
+
+    assert resume_extract(store, "a.pdf", "h1", extract, page_range=(3, 7)) == _expected(10, 3, 7)
+    assert extract.calls == [(3, 7), (5, 7)]
+    # a shard does not know the document's page count
+    assert store.load("a.pdf", "h1")["page_count"] is None
+
+
+def test_other_content_hash_starts_over(store):
+    resume_extract(store, "a.pdf", "h1", FakeExtract(3))
+    extract = FakeExtract(3)
+    resume_extract(store, "a.pdf", "h2", extract)
+    assert extract.calls == [(0, sys.maxsize)]
+
+
+def test_is_extracted(store, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_ENABLED", True)
+    monkeypatch.setattr(checkpoint, "_checkpoint", (os.getpid(), store))
+    doc = {"file_name": "a.pdf", "content_hash": "h1"}
+
+    assert not is_extracted(doc)
+    with pytest.raises(RuntimeError):
+        resume_extract(store, "a.pdf", "h1", FakeExtract(4, fail_at=3))
+    store.save("a.pdf", "h1", page_count=4)
+    assert not is_extracted(doc)
+
+    resume_extract(store, "a.pdf", "h1", FakeExtract(4))
+    assert is_extracted(doc)
+
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_ENABLED", False)
+    assert not is_extracted(doc)
+
+
+def test_pack_batches():
+    assert pack_batches([], max_items=2, max_tokens=10) == []
+    assert pack_batches([1, 1, 1, 1, 1], max_items=2, max_tokens=10) == [(0, 2), (2, 4), (4, 5)]
+    assert pack_batches([4, 4, 4, 4], max_items=10, max_tokens=10) == [(0, 2), (2, 4)]
+    # a chunk over the token limit gets a batch of its own
+    assert pack_batches([3, 20, 3], max_items=10, max_tokens=10) == [(0, 1), (1, 2), (2, 3)]
+
+
+class FakeEmbed:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)) % 97)] for t in texts]
+
+
+def test_only_changed_or_missing_batches_are_reembedded(store):
+    chunks = [f"chunk {i}" for i in range(7)]
+    embed = FakeEmbed()
+    first = embed_batches(store, "a.pdf", "h1", chunks, embed, batch_size=3)
+    assert embed.batches == [chunks[0:3], chunks[3:6], chunks[6:7]]
+
+    embed = FakeEmbed()
+    assert embed_batches(store, "a.pdf", "h1", chunks, embed, batch_size=3) == first
+    assert embed.batches == []
+
+    changed = list(chunks)
+    changed[4] = "chunk four, reworded"
+    embed = FakeEmbed()
+    vectors = embed_batches(store, "a.pdf", "h1", changed, embed, batch_size=3)
+    assert embed.batches == [changed[3:6]]
+    assert vectors[:3] == first[:3] and vectors[6:] == first[6:]
+
+    conn = sqlite3.connect(store.path)
+    conn.execute("DELETE FROM embeddings WHERE batch = 0")
+    conn.commit()
+    conn.close()
+    embed = FakeEmbed()
+    embed_batches(store, "a.pdf", "h1", changed, embed, batch_size=3)
+    assert embed.batches == [changed[0:3]]
+
+
+def test_embed_batches_without_a_checkpoint():
+    chunks = ["a", "b", "c", "d"]
+    embed = FakeEmbed()
+    vectors = embed_batches(None, "a.pdf", "h1", chunks, embed, batch_size=3)
+    assert len(vectors) == 4 and embed.batches == [chunks[:3], chunks[3:]]
+
+
+def test_embed_batches_packs_by_tokens(store):
+    chunks = ["a", "b", "c", "d", "e"]
+    embed = FakeEmbed()
+    embed_batches(store, "a.pdf", "h1", chunks, embed, batch_size=10, token_counts=[4] * 5)
+    assert embed.batches == [chunks]
+
+    half = checkpoint.EMBED_BATCH_TOKENS // 2
+    embed = FakeEmbed()
+    embed_batches(store, "a.pdf", "h2", chunks, embed, batch_size=10, token_counts=[half] * 5)
+    assert embed.batches == [chunks[0:2], chunks[2:4], chunks[4:5]]
@@ -0,0 +1,196 @@
+import pytest
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import chunker
+from checkpoint import join_pages
+from chunker import (
+    _blocks, _pack, _table_units, _token_units, chunk_document, chunk_pages, chunk_records,
+    chunk_structure, chunk_tokens, estimate_tokens, split_pages,
+)
+from tables import format_table
+
+# cl100k_base cannot be downloaded here; byte-level ranks with its
+# pre-tokenizer split every multi-byte character across tokens
+CL100K_PATTERN = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*"""
+                  r"""|\s*[\r\n]|\s+(?!\S)|\s+""")
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    enc = tiktoken.Encoding("bytes", pat_str=CL100K_PATTERN,
+                            mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={})
+    monkeypatch.setattr(chunker, "get_encoding", lambda name=None: enc)
+    return enc
+
+
+def _units(lengths, page_num=1):
+    return [(f"l{i}", page_num, n) for i, n in enumerate(lengths)]
+
+
+def _windows(units, size, overlap, min_fill=None):
+    return [([line for line, _, _ in window], total)
+            for window, total in _pack(units, size, overlap, 1, min_fill)]
+
+
+def test_split_pages_inverts_join_pages():
+    records = [{"page_num": 1, "text": "first\npage"}, {"page_num": 2, "text": None},
+               {"page_num": 3, "text": "third"}]
+    pages = list(split_pages(join_pages(records)))
+    assert [p["page_num"] for p in pages] == [1, 2, 3]
+    assert [p["text"] for p in pages] == ["first\npage", "", "third"]
+    assert list(split_pages("no page markers")) == []
+
+
+def test_pack_respects_size_and_overlap():
+    # overlap counts each kept line with its separator
+    windows = _windows(_units([4, 4, 4, 4, 4]), size=9, overlap=5)
+    assert windows == [(["l0", "l1"], 9), (["l1", "l2"], 9), (["l2", "l3"], 9), (["l3", "l4"], 9)]
+    assert _windows(_units([4, 4, 4]), size=9, overlap=4) == [(["l0", "l1"], 9), (["l2"], 4)]
+
+
+def test_pack_without_overlap_and_oversized_unit():
+    windows = _windows(_units([3, 3, 20, 3]), size=10, overlap=0)
+    assert [lines for lines, _ in windows] == [["l0", "l1"], ["l2"], ["l3"]]
+
+
+def test_pack_breaks_before_a_new_block_once_filled():
+    units = _units([3, 3, 3])
+    units[2] = units[2] + (True,)
+    windows = _windows(units, size=100, overlap=50, min_fill=5)
+    # the block starts its own window, with no overlap from the one before
+    assert [lines for lines, _ in windows] == [["l0", "l1"], ["l2"]]
+    # below min_fill the block joins the window
+    assert [lines for lines, _ in _windows(units, size=100, overlap=50, min_fill=10)] == [["l0", "l1", "l2"]]
+
+
+def test_chunk_pages_tracks_pages():
+    records = [{"page_num": n, "text": "\n".join(f"page {n} line {i}" for i in range(5))} for n in (1, 2, 3)]
+    chunks = list(chunk_pages(records, chunk_size=60, chunk_overlap=20))
+    assert chunks[0]["page_start"] == 1 and chunks[-1]["page_end"] == 3
+    assert all(len(c["text"]) <= 60 for c in chunks)
+    assert any(c["page_start"] != c["page_end"] for c in chunks)
+    text = "\n".join(c["text"] for c in chunks)
+    assert all(f"page {n} line {i}" in text for n in (1, 2, 3) for i in range(5))
+
+
+def test_chunk_tokens_stays_within_the_budget(byte_encoding):
+    records = [{"page_num": n, "text": "\n".join(f"page {n} sentence {i} about compile options" for i in range(20))}
+               for n in (1, 2)]
+    chunks = list(chunk_tokens(records, chunk_tokens=60, chunk_overlap=10))
+    assert len(chunks) > 2
+    assert chunks[0]["page_start"] == 1 and chunks[-1]["page_end"] == 2
+    for c in chunks:
+        assert len(byte_encoding.encode_ordinary(c["text"])) <= c["tokens"] <= 60
+
+
+def test_token_estimate_falls_back_when_the_tokenizer_is_offline(monkeypatch):
+    def offline(name=None):
+        raise ConnectionError("no network")
+    monkeypatch.setattr(chunker, "get_encoding", offline)
+    monkeypatch.setattr(chunker, "_encoding_error", None)
+    monkeypatch.setattr(chunker, "TOKEN_ESTIMATE_CHARS", 3)
+    assert estimate_tokens(["abcdef", "abcdefg", ""]) == [2, 3, 0]
+    assert isinstance(chunker._encoding_error, ConnectionError)
+
+
+def test_token_estimate_uses_the_tokenizer_when_it_loads(byte_encoding, monkeypatch):
+    monkeypatch.setattr(chunker, "_encoding_error", None)
+    assert estimate_tokens(["abc", "é"]) == [3, 2]
+
+
+def test_structure_keeps_tables_and_syntax_together():
+    text = "\n".join([
+        "Intro line of text.",
+        "--- TABLE (Page 1) ---", "Name | Value", "a | 1", "b | 2",
+        "Syntax", "compile_ultra [-incremental]", "[-no_autoungroup]",
+        "Description", "Compiles the design.",
+    ])
+    chunks = list(chunk_structure([{"page_num": 1, "text": text}], chunk_size=60, chunk_overlap=0))
+    texts = [c["text"] for c in chunks]
+    assert any("--- TABLE (Page 1) ---\nName | Value\na | 1\nb | 2" in t for t in texts)
+    assert any("Syntax\ncompile_ultra [-incremental]\n[-no_autoungroup]" in t for t in texts)
+    assert all(len(t) <= 60 for t in texts)
+
+
+def test_large_tables_repeat_their_header():
+    marker = "--- TABLE (Page 2) ---"
+    rows = ["Name | Value"] + [f"row{i} | {i}" for i in range(30)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=80, chunk_overlap=0)
+    units = list(_table_units(marker, rows, 80, splitter))
+    assert len(units) > 1
+    assert all(u.startswith(f"{marker}\nName | Value\n") and len(u) <= 80 for u in units)
+    assert all(any(row in u.split("\n") for u in units) for row in rows[1:])
+
+
+@pytest.mark.parametrize("mode", ["text", "pages", "structure"])
+def test_chunk_records_matches_chunk_document(mode):
+    records = [{"page_num": n, "text": "\n".join(f"page {n} line {i} of the manual" for i in range(30))}
+               for n in (1, 2, 3)]
+    raw = join_pages(records)
+    assert list(chunk_records(split_pages(raw), mode, 200, 40)) == list(chunk_document(raw, mode, 200, 40))
+
+
+def test_long_non_ascii_lines_are_cut_between_characters(byte_encoding):
+    line = "Größe: " + "日本語のテキスト、éàü " * 40
+    pieces = list(_token_units(line, 16, byte_encoding))
+
+    assert len(pieces) > 1
+    assert "".join(text for text, _ in pieces) == line
+    for text, n in pieces:
+        assert "\ufffd" not in text
+        assert n == len(byte_encoding.encode_ordinary(text)) <= 16
+
+
+def test_chunk_tokens_keeps_non_ascii_text(byte_encoding):
+    text = "\n".join(["Übersicht der Variablen", "変数 " * 200, "fin"])
+    chunks = list(chunk_tokens([{"page_num": 1, "text": text}], chunk_tokens=50, chunk_overlap=0))
+    assert all("\ufffd" not in c["text"] for c in chunks)
+    assert all(c["tokens"] <= 50 for c in chunks)
+    assert "".join(c["text"].replace("\n", "") for c in chunks) == text.replace("\n", "")
+
+
+def test_table_groups_keep_a_capped_header():
+    marker = "--- TABLE (Page 7) ---"
+    # longer than half a chunk
+    header = " | ".join(f"column heading number {i}" for i in range(10))
+    rows = [header] + [f"row {i} | value {i} | more text for row {i}" for i in range(40)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=0)
+    units = list(_table_units(marker, rows, 400, splitter))
+
+    # the full header row once, then groups behind a shortened copy of it
+    assert units[0] == f"{marker}\n{header}"
+    groups = units[1:]
+    assert len(groups) > 1 and all(len(u) <= 400 for u in units)
+    for unit in groups:
+        marker_line, head, *_ = unit.split("\n")
+        assert marker_line == marker and head.endswith("…") and len(head) < 200
+    assert all(any(row in u for u in groups) for row in rows[1:])
+
+
+def test_one_column_tables_keep_their_rows():
+    lines = format_table({1: {1: "Name"}, 2: {1: "compile_ultra"}, 3: {1: "report_timing"}}, 3)
+    text = "\n".join(lines + ["The commands above are run in dc_shell."])
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+    blocks = list(_blocks(text, 1000, splitter))
+    assert blocks[0] == ("--- TABLE (Page 3) ---\n| Name |\n| compile_ultra |\n| report_timing |", "table")
+    assert blocks[1] == ("The commands above are run in dc_shell.", "line")
+
+
+def test_table_marker_without_pipe_rows_travels_with_the_text_after_it():
+    text = "--- TABLE (Page 3) ---\nName\ncompile_ultra"
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+    assert list(_blocks(text, 1000, splitter))[0] == ("--- TABLE (Page 3) ---", "heading")
+
+
+def test_table_header_over_a_chunk_is_split_once():
+    marker = "--- TABLE (Page 7) ---"
+    header = " | ".join(f"column heading number {i}" for i in range(40))
+    rows = [header] + [f"row {i} | value {i}" for i in range(60)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=0)
+    units = list(_table_units(marker, rows, 400, splitter))
+
+    assert all(len(u) <= 400 for u in units)
+    groups = [u for u in units if "row 0 | value 0" in u or "row 59 | value 59" in u]
+    assert all(u.startswith(marker + "\ncolumn heading number 0") for u in groups)
+    assert all(any(row in u for u in units) for row in rows[1:])
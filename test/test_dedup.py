@@ -0,0 +1,140 @@
+import itertools
+
+import pytest
+
+import dedup
+from chunker import text_chunk
+from dedup import ChunkIndex, dedupe_document, register_document
+
+WORDS = ("set the variable before compile to control how the tool maps sequential cells "
+         "and reports unmapped registers in the final netlist").split()
+
+
+def _text(seed, n=120):
+    return " ".join(WORDS[(seed * 7 + i * (seed + 3)) % len(WORDS)] + str(i % 11) for i in range(n))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = ChunkIndex(str(tmp_path / "chunk_index.sqlite"))
+    monkeypatch.setattr(dedup, "DEDUP_ENABLED", True)
+    monkeypatch.setattr(dedup, "_index", index)
+    yield index
+    index.close()
+
+
+ids = itertools.count(1)
+
+
+def _doc(source, *texts):
+    return {"file_name": source, "chunks": [text_chunk(t) for t in texts]}
+
+
+def _texts(doc):
+    return [c["text"] for c in doc["chunks"]]
+
+
+def _store(doc, collection="c"):
+    register_document(doc, collection, [next(ids) for _ in doc["chunks"]])
+
+
+def test_exact_and_near_repeats_within_a_document(index):
+    base = _text(1)
+    near = base.rsplit(" ", 1)[0] + " changed"
+    chunks = [{"text": text, "page_start": n, "page_end": n + 1, "tokens": 10 * n}
+              for n, text in enumerate([base, _text(2), base, near], start=1)]
+    doc = {"file_name": "a.pdf", "chunks": list(chunks)}
+
+    counts = dedupe_document(doc, "c")
+    assert counts == {"chunks": 4, "exact": 1, "near": 1, "stored": 0}
+    # the surviving records keep their page span and token count
+    assert doc["chunks"] == chunks[:2]
+    assert len(doc["dedup"]["digests"]) == 2
+
+
+def test_chunks_stored_by_another_source_are_dropped(index):
+    first = _doc("a.pdf", _text(1), _text(2))
+    dedupe_document(first, "c")
+    _store(first)
+
+    second = _doc("b.pdf", _text(2), _text(3))
+    counts = dedupe_document(second, "c")
+    assert counts["stored"] == 1
+    assert _texts(second) == [_text(3)]
+    _store(second)
+
+    # b.pdf is recorded on the chunk it shares with a.pdf
+    shared = second["dedup"]["repeats"][0]
+    owner = index.conn.execute("SELECT milvus_id FROM chunks WHERE chunk_id = ?", (shared,)).fetchone()[0]
+    assert index.sources("c", [owner]) == {owner: ["a.pdf", "b.pdf"]}
+
+
+def test_other_collections_do_not_match(index):
+    first = _doc("a.pdf", _text(1))
+    dedupe_document(first, "c")
+    _store(first)
+
+    other = _doc("b.pdf", _text(1))
+    assert dedupe_document(other, "d")["stored"] == 0
+
+
+def test_disabled_keeps_everything(index, monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_ENABLED", False)
+    doc = _doc("a.pdf", _text(1), _text(1))
+    assert dedupe_document(doc, "c")["exact"] == 0
+    assert len(doc["chunks"]) == 2 and "dedup" not in doc
+
+
+def _rows(index, text):
+    return index.conn.execute(
+        "SELECT chunk_id, source, milvus_id FROM chunks WHERE digest = ?", (dedup.digest(text),)
+    ).fetchall()
+
+
+def test_reingested_source_repeats_its_shared_chunks(index):
+    first = _doc("a.pdf", _text(1), _text(2))
+    dedupe_document(first, "c")
+    _store(first)
+    other = _doc("b.pdf", _text(2), _text(3))
+    dedupe_document(other, "c")
+    _store(other)
+
+    # a.pdf changes: _text(2) is still in it, _text(1) (shared with nobody) too
+    again = _doc("a.pdf", _text(1), _text(2), _text(4))
+    counts = dedupe_document(again, "c")
+    assert counts["stored"] == 1
+    assert _texts(again) == [_text(1), _text(4)]
+
+    # what delete_source and the store stage then do
+    for chunk_id, _, new_owner in index.handover("c", "a.pdf"):
+        index.moved(chunk_id, 999, new_owner)
+    index.release("c", "a.pdf")
+    _store(again)
+
+    (chunk_id, owner, milvus_id), = _rows(index, _text(2))
+    assert (owner, milvus_id) == ("b.pdf", 999)
+    assert index.sources("c", [999]) == {999: ["b.pdf", "a.pdf"]}
+    assert [row[1] for row in _rows(index, _text(1))] == ["a.pdf"]
+
+
+class FakeHit:
+    def __init__(self, milvus_id, source):
+        self.id = milvus_id
+        self.entity = {"source": source}
+
+
+def test_search_hits_carry_every_source(index, monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_PATH", index.path)
+    first = _doc("a.pdf", _text(1), _text(2))
+    dedupe_document(first, "c")
+    register_document(first, "c", [101, 102])
+    other = _doc("b.pdf", _text(2))
+    dedupe_document(other, "c")
+    _store(other)
+
+    hits = [FakeHit(102, "a.pdf"), FakeHit(101, "a.pdf"), FakeHit(555, "c.pdf")]
+    assert dedup.hit_sources("c", hits) == {102: ["a.pdf", "b.pdf"], 101: ["a.pdf"], 555: ["c.pdf"]}
+
+    # a query host without the index only knows the owner
+    monkeypatch.setattr(dedup, "DEDUP_PATH", str(index.path) + ".missing")
+    assert dedup.hit_sources("c", hits)[102] == ["a.pdf"]
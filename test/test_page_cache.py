@@ -0,0 +1,127 @@
+import sqlite3
+import time
+
+import page_cache
+from page_cache import PageCache, make_key
+
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.put("a", "layout", {"boxes": [[1, 2, 3, 4]]})
+    assert cache.get("a") == {"boxes": [[1, 2, 3, 4]]}
+    assert cache.get("b") is None
+    cache.close()
+
+
+def test_keys_change_with_every_part():
+    key = make_key("abc", "layout", 1, 150)
+    assert key == make_key("abc", "layout", 1, 150)
+    others = {
+        make_key("abd", "layout", 1, 150),
+        make_key("abc", "textract", 1, 150),
+        make_key("abc", "layout", 2, 150),
+        make_key("abc", "layout", 1, 300),
+    }
+    assert key not in others and len(others) == 4
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.max_bytes = 3200
+    for key in "abc":
+        cache.put(key, "layout", "x" * 900)
+        time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("d", "layout", "x" * 900)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    cache.close()
+
+
+def test_size_limit_holds_for_every_worker_sharing_the_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    caches = [PageCache(path) for _ in range(3)]
+    for cache in caches:
+        cache.max_bytes = 5000
+    for i in range(12):
+        caches[i % 3].put(f"k{i}", "layout", "x" * 900)
+
+    assert caches[1].get("k11") is not None
+    for cache in caches:
+        cache.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT SUM(size) FROM entries").fetchone()[0] <= 5000
+    conn.close()
+
+
+def _counters(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT name, value FROM counters"))
+    finally:
+        conn.close()
+
+
+def _hits(path, key):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT hits FROM entries WHERE key = ?", (key,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_lookups_do_not_write(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PageCache(path)
+    cache.put("a", "layout", [1, 2])
+    changes = cache.conn.total_changes
+
+    assert cache.get("a") == [1, 2]
+    assert cache.get("missing") is None
+    assert cache.conn.total_changes == changes
+    assert cache.hits == 1 and cache.misses == 1
+    cache.close()
+
+
+def test_counters_flushed_on_put_and_close(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = PageCache(path)
+    cache.put("a", "layout", {"boxes": []})
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert _counters(path) == {}
+
+    cache.put("b", "layout", {"boxes": []})
+    assert _counters(path) == {"hits": 2, "misses": 1}
+    assert _hits(path, "a") == 2
+
+    cache.get("b")
+    cache.close()
+    assert _counters(path) == {"hits": 3, "misses": 1}
+    assert _hits(path, "b") == 1
+
+
+def test_counters_flushed_every_n_lookups(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, "PAGE_CACHE_FLUSH_EVERY", 3)
+    path = str(tmp_path / "cache.sqlite")
+    cache = PageCache(path)
+    cache.get("x")
+    cache.get("x")
+    assert _counters(path) == {}
+    cache.get("x")
+    assert _counters(path) == {"misses": 3}
+    cache.close()
+
+
+def test_stats_include_unflushed_lookups(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite"))
+    cache.put("a", "textract", [])
+    cache.get("a")
+    cache.get("z")
+    stats = cache.stats()
+    assert stats["total_hits"] == 1 and stats["total_misses"] == 1
+    assert stats["entries"] == 1
+    cache.close()
@@ -0,0 +1,126 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+import s3_listing
+from manifest import SourceManifest
+from s3_listing import S3Listing, list_pdfs
+
+BUCKET = "manuals"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    m = SourceManifest(str(tmp_path / "manifest.sqlite"))
+    yield m
+    m.close()
+
+
+def _upload(s3, n):
+    keys = [f"docs/doc_{k:05d}.pdf" for k in range(n)]
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=f"%PDF-1.4 {key}".encode())
+    s3.put_object(Bucket=BUCKET, Key="docs/readme.txt", Body=b"not a pdf")
+    return keys
+
+
+def _list_calls(s3):
+    calls = []
+    s3.meta.events.register("provide-client-params.s3.ListObjectsV2",
+                            lambda params, **kw: calls.append(dict(params)))
+    return calls
+
+
+def _run(s3, manifest, fail=()):
+    """One cron pass: claim keys as they are listed, then record or fail them."""
+    listing = S3Listing(s3, BUCKET, manifest)
+    claimed = []
+    for item in listing:
+        manifest.start(item["key"])
+        if item["key"] in fail:
+            manifest.fail(item["key"], "extract: simulated failure")
+        else:
+            manifest.record(item["key"], item["content_hash"], item["size"], item["mtime"], "c", 1)
+        claimed.append(item["key"])
+    return listing, claimed
+
+
+def test_list_pdfs_reads_past_the_first_1000_keys(s3):
+    keys = _upload(s3, 1100)
+    calls = _list_calls(s3)
+
+    assert [obj["Key"] for obj in list_pdfs(s3, BUCKET)] == keys
+    assert len(calls) == 2 and "ContinuationToken" in calls[1]
+
+
+def test_list_pdfs_follows_continuation_tokens(s3, monkeypatch):
+    monkeypatch.setattr(s3_listing, "S3_LIST_PAGE_SIZE", 40)
+    keys = _upload(s3, 100)
+    calls = _list_calls(s3)
+
+    assert [obj["Key"] for obj in list_pdfs(s3, BUCKET, prefix="docs/")] == keys
+    assert len(calls) == 3
+
+
+def test_keys_are_claimed_while_the_listing_runs(s3, manifest, monkeypatch):
+    monkeypatch.setattr(s3_listing, "S3_LIST_PAGE_SIZE", 40)
+    keys = _upload(s3, 100)
+    listing = S3Listing(s3, BUCKET, manifest)
+
+    first = next(iter(listing))
+    assert first["key"] == keys[0]
+    assert len(listing.seen) < len(keys) and not listing.complete
+
+
+def test_unchanged_keys_are_skipped_and_failed_ones_wait(s3, manifest, monkeypatch):
+    monkeypatch.setattr(s3_listing, "S3_LIST_PAGE_SIZE", 40)
+    keys = _upload(s3, 100)
+    failing = set(keys[:3])
+
+    listing, claimed = _run(s3, manifest, fail=failing)
+    assert claimed == keys and listing.complete
+    assert listing.removed() == []
+
+    listing, claimed = _run(s3, manifest)
+    assert claimed == []
+    assert listing.counts["backoff"] == len(failing)
+
+
+def test_retries_changes_and_deletions_are_picked_up(s3, manifest, monkeypatch):
+    monkeypatch.setattr(s3_listing, "S3_LIST_PAGE_SIZE", 40)
+    keys = _upload(s3, 100)
+    failing = set(keys[:3])
+    _run(s3, manifest, fail=failing)
+
+    # past the retry delay
+    manifest.conn.execute("UPDATE sources SET next_attempt_at = 0 WHERE status = 'failed'")
+    manifest.conn.commit()
+    s3.put_object(Bucket=BUCKET, Key=keys[10], Body=b"%PDF-1.4 new revision")
+    s3.delete_object(Bucket=BUCKET, Key=keys[11])
+
+    listing, claimed = _run(s3, manifest)
+    assert sorted(claimed) == sorted(failing | {keys[10]})
+    assert listing.counts["retry"] == len(failing) and listing.counts["changed"] == 1
+    assert [row["source"] for row in listing.removed()] == [keys[11]]
+    assert manifest.get(keys[0])["attempts"] == 0
+
+
+def test_listing_error_removes_nothing(s3, manifest):
+    keys = _upload(s3, 5)
+    _run(s3, manifest)
+
+    listing = S3Listing(s3, "no-such-bucket", manifest)
+    assert list(listing) == []
+    assert listing.error is not None and not listing.complete
+    assert listing.removed() == []
+    assert len(manifest.all()) == len(keys)
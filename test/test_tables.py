@@ -0,0 +1,55 @@
+import fitz
+
+from tables import native_region_tables
+
+
+def _grid_page(cells, xs, ys):
+    """One page with ruling lines at xs/ys and cells[(r, c)] written in them."""
+    doc = fitz.open()
+    page = doc.new_page()
+    for x in xs:
+        page.draw_line((x, ys[0]), (x, ys[-1]))
+    for y in ys:
+        page.draw_line((xs[0], y), (xs[-1], y))
+    for (r, c), text in cells.items():
+        page.insert_text((xs[c] + 4, ys[r + 1] - 6), text, fontsize=10)
+    return doc, page
+
+
+def test_ruled_table_is_read_cell_by_cell():
+    cells = {(0, 0): "Variable", (0, 1): "Default",
+             (1, 0): "infer mux", (1, 1): "default",
+             (2, 0): "mux size limit", (2, 1): "32"}
+    doc, page = _grid_page(cells, [72, 252, 432], [100, 120, 140, 160])
+    ordered = native_region_tables(page, (60, 90, 444, 170))
+
+    assert ordered == [{"type": "table", "content": {
+        1: {1: "Variable", 2: "Default"},
+        2: {1: "infer mux", 2: "default"},
+        3: {1: "mux size limit", 2: "32"},
+    }}]
+    doc.close()
+
+
+def test_cell_edge_through_a_word_falls_back_to_text():
+    # the inner ruling runs through the first column's words
+    cells = {(0, 0): "IMPLIED WARRANTIES", (0, 1): "x",
+             (1, 0): "OF MERCHANTABILITY", (1, 1): "y"}
+    doc, page = _grid_page(cells, [72, 120, 432], [100, 120, 140])
+    ordered = native_region_tables(page, (60, 90, 444, 150))
+
+    assert [item["type"] for item in ordered] == ["text"]
+    assert "IMPLIED WARRANTIES" in ordered[0]["content"]
+    doc.close()
+
+
+def test_framed_paragraph_is_not_a_table():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.draw_rect((72, 100, 432, 160))
+    page.insert_text((76, 115), "Note: the SDC file is read into the tool", fontsize=10)
+    page.insert_text((76, 130), "before the design is linked.", fontsize=10)
+    ordered = native_region_tables(page, (60, 90, 444, 170))
+
+    assert [item["type"] for item in ordered] == ["text"]
+    doc.close()
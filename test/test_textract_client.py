@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import textract_client
+from textract_client import TextractSubmitter, set_rate_share
+
+
+class ThrottlingError(Exception):
+    def __init__(self):
+        super().__init__("Rate exceeded")
+        self.response = {"Error": {"Code": "ThrottlingException"}}
+
+
+class StubTextract:
+    """analyze_document stand-in: sleeps, throttles the first attempts of a page, logs calls."""
+
+    def __init__(self, latency=0.01, throttle_first=0, latencies=None):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.throttle_first = throttle_first
+        self.attempts = {}
+        self.starts = []
+        self.finished = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def analyze_document(self, Document, FeatureTypes):
+        page = Document["Bytes"].decode()
+        with self._lock:
+            self.starts.append(time.monotonic())
+            self.attempts[page] = self.attempts.get(page, 0) + 1
+            attempt = self.attempts[page]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latencies.get(page, self.latency))
+            if attempt <= self.throttle_first:
+                raise ThrottlingError()
+            with self._lock:
+                self.finished.append(page)
+            return {"page": page}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def single_process_share():
+    set_rate_share(1)
+    yield
+    set_rate_share(1)
+
+
+def test_throttled_calls_are_retried_with_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(textract_client.random, "uniform", lambda low, high: delays.append(high) or 0.0)
+    stub = StubTextract(throttle_first=3)
+    submitter = TextractSubmitter(stub, concurrency=2, rate=0, base_delay=0.5, max_delay=20.0)
+
+    assert submitter.submit(b"p1").result(timeout=5) == {"page": "p1"}
+    submitter.shutdown()
+
+    assert stub.attempts["p1"] == 4
+    assert submitter.stats == {"calls": 4, "retries": 3, "failures": 0}
+    # full-jitter upper bound doubles per attempt
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(textract_client.random, "uniform", lambda low, high: 0.0)
+    stub = StubTextract(throttle_first=10)
+    submitter = TextractSubmitter(stub, concurrency=1, rate=0, max_retries=2)
+
+    with pytest.raises(ThrottlingError):
+        submitter.submit(b"p1").result(timeout=5)
+    submitter.shutdown()
+    assert stub.attempts["p1"] == 3
+    assert submitter.stats["failures"] == 1
+
+
+def test_in_flight_calls_never_exceed_concurrency():
+    stub = StubTextract(latency=0.05)
+    submitter = TextractSubmitter(stub, concurrency=3, rate=0)
+
+    futures = [submitter.submit(f"p{i}".encode()) for i in range(15)]
+    for f in futures:
+        f.result(timeout=5)
+    submitter.shutdown()
+
+    assert stub.max_in_flight == 3
+
+
+def test_call_rate_stays_under_rate():
+    rate = 20.0
+    stub = StubTextract(latency=0.0)
+    submitter = TextractSubmitter(stub, concurrency=8, rate=rate)
+
+    futures = [submitter.submit(f"p{i}".encode()) for i in range(30)]
+    for f in futures:
+        f.result(timeout=10)
+    submitter.shutdown()
+
+    # a token bucket of capacity max(1, rate) allows that burst, then rate per second
+    starts = sorted(stub.starts)
+    capacity = max(1.0, rate)
+    for i, t in enumerate(starts):
+        assert i + 1 <= capacity + (t - starts[0]) * rate + 1e-6
+
+
+def test_rate_is_split_across_processes():
+    set_rate_share(4)
+    submitter = TextractSubmitter(StubTextract(), rate=2.0)
+    submitter.shutdown()
+    assert submitter.rate == pytest.approx(0.5)
+
+
+def test_results_come_back_in_page_order():
+    # earlier pages take longest, so calls finish out of submission order
+    pages = [f"p{i}" for i in range(10)]
+    stub = StubTextract(latencies={page: 0.02 * (10 - i) for i, page in enumerate(pages)})
+    submitter = TextractSubmitter(stub, concurrency=4, rate=0)
+
+    futures = [submitter.submit(page.encode()) for page in pages]
+    results = [f.result(timeout=5)["page"] for f in futures]
+    submitter.shutdown()
+
+    assert sorted(stub.finished) == pages
+    assert stub.finished != pages and stub.finished[0] != "p0"
+    assert results == pages